@@ -1,7 +1,8 @@
 import numpy as np
-import math
 
-def bike_model_particle(hybrid_cont, speeds, slopes, vehicle_params):
+from HybridBikeConsumptionModel.particle_kernel import VehicleSpec, potencias_kmh, tabla_para
+
+def bike_model_particle(hybrid_cont, speeds, slopes, vehicle_params, usar_tabla=False):
     """
     Modelo optimizado de consumo de motocicleta eléctrica/híbrida.
     
@@ -17,6 +18,9 @@ def bike_model_particle(hybrid_cont, speeds, slopes, vehicle_params):
         slopes: Lista de pendientes en grados
         vehicle_params: Diccionario con parámetros del vehículo desde config.jsonc
                        Si no se proporciona, se usan los valores optimizados por defecto
+        usar_tabla: Si es True, el término de pendiente sale de una tabla
+                    precalculada por vehículo (motor_particula.tabla) en lugar
+                    de cos/sin; el error queda acotado por tabla.cota_error()
     
     Returns:
         State_bater: Estado final de la batería en Wh
@@ -62,65 +66,31 @@ def bike_model_particle(hybrid_cont, speeds, slopes, vehicle_params):
     eficiencia_tren = params_optimizados['eficiencia_tren']
     factor_correccion = params_optimizados['factor_correccion']
     
-    last_vel = 0
-    State_bater = 3700  # Estado inicial de batería en Wh
-    Energy = []
-    combus = []
-    combus2 = []
-    E_TOTAL = []
+    # Potencias eléctrica y de combustión en W, un punto por segundo
+    spec = VehicleSpec(
+        m=m, a=a, cd=cd, crr=crr, rho=rho, g=g, rw=rw,
+        eficiencia_tren=eficiencia_tren, factor_correccion=factor_correccion,
+    )
+    if usar_tabla:
+        p_eb, p_cn = tabla_para(spec).potencias_kmh(speeds, slopes, hybrid_cont)
+    else:
+        p_eb, p_cn = potencias_kmh(speeds, slopes, hybrid_cont, spec)
 
-    for i in range(len(speeds)):
-        vel = speeds[i] / 3.6  # Convertir km/h a m/s
-        theta = slopes[i] * math.pi / 180  # Convertir grados a radianes
-        
-        # Cálculo de fuerzas (modelo optimizado)
-        faero = 0.5 * rho * a * cd * (vel ** 2)
-        froll = g * m * crr * np.cos(theta)
-        fg = g * m * np.sin(theta)
-        
-        # Fuerza de inercia
-        delta_v = vel - last_vel
-        f_inertia = m * delta_v / 1  # dt = 1 segundo implícito
-        
-        # Fuerza resultante total
-        fres = faero + froll + fg + f_inertia
-        
-        # Potencia mecánica requerida
-        p_m = (fres * rw) * (vel / rw)
-        
-        # Potencia eléctrica (con eficiencia optimizada y factor de corrección)
-        p_eb = p_m * (1 - hybrid_cont) / eficiencia_tren
-        p_eb = p_eb * factor_correccion  # Aplicar factor de corrección optimizado
-        
-        if p_eb < 0:
-            p_eb = 0
-        
-        # Potencia de combustión
-        p_cn = p_m * hybrid_cont / 0.2
-        if p_cn <= 0:
-            p_cn = 0
+    # Convertir potencia a consumo de energía (Wh por segundo)
+    # Dividir por 3600 para convertir de W a Wh/s
+    pow_consumption = p_eb / 3600  # Consumo eléctrico en Wh/s
+    pcn_consumption = p_cn / 3600  # Consumo de combustión en Wh/s
+
+    # Estado de batería: 3700 Wh iniciales menos lo consumido, sin bajar de 0
+    # (el consumo eléctrico nunca es negativo, así que basta el acumulado)
+    State_bater = 3700  # Estado inicial de batería en Wh
+    State_bater = max(State_bater - float(np.sum(pow_consumption)), 0)
 
-        last_vel = vel
-        
-        # Convertir potencia a consumo de energía (Wh por segundo)
-        # Dividir por 3600 para convertir de W a Wh/s
-        pow_consumption = p_eb / 3600  # Consumo eléctrico en Wh/s
-        pcn_consumption = p_cn / 3600   # Consumo de combustión en Wh/s
-        
-        # Actualizar estado de batería
-        result1 = State_bater - pow_consumption
-        if result1 < 0:
-            result1 = 0
-        
-        # Conversión de energía de combustible a galones
-        # Poder calorífico de gasolina (valor calibrado del modelo original)
-        poder_calorifico_wh_galon = 36718.50158230244
-        result2 = pcn_consumption / poder_calorifico_wh_galon
-        
-        Energy.append(result1)
-        combus.append(result2)
-        combus2.append(pcn_consumption)
-        E_TOTAL.append(pow_consumption + pcn_consumption)
-        State_bater = result1
+    # Conversión de energía de combustible a galones
+    # Poder calorífico de gasolina (valor calibrado del modelo original)
+    poder_calorifico_wh_galon = 36718.50158230244
+    combus = (pcn_consumption / poder_calorifico_wh_galon).tolist()
+    combus2 = pcn_consumption.tolist()
+    E_TOTAL = (pow_consumption + pcn_consumption).tolist()
 
     return State_bater, combus, combus2, E_TOTAL
\ No newline at end of file
@@ -0,0 +1,21 @@
+"""
+Acceso al motor de física compartido (server/motor_particula).
+
+Si el paquete no está instalado (pip install server/motor_particula) se
+toma de server/motor_particula/src, sin agregar el resto de server/ al path.
+"""
+import os
+import sys
+
+try:
+    import motor_particula  # noqa: F401
+except ImportError:
+    sys.path.append(os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "..", "..",
+        "server", "motor_particula", "src",
+    ))
+
+from motor_particula import (  # noqa: E402
+    CALIBRACION_TELEMETRIA, SPEC_TELEMETRIA, VehicleSpec, fuerzas_kmh, pasos_tiempo,
+    potencias_kmh, tabla_para,
+)
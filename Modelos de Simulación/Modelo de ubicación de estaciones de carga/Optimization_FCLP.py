@@ -12,12 +12,16 @@ import math
 import pulp
 import geopandas as gpd
 from shapely.geometry import Point
+import numpy as np
 import folium
 from tqdm import tqdm
 import os
 import sys
 import pandas as pd
 
+from access_costs import AccessCosts
+from station_grid import boundary_mask, candidate_station_cells, cell_distances_km
+
 #----------------------------------------UNIVERSAL CONFIGURATION-------------------------
 # 1. Determine Territory (Listens to Main Pipeline)
 locale_info = os.getenv('ANALYSIS_LOCALE', 'Medellin')
@@ -48,10 +52,10 @@ RESULTS = os.path.join(script_dir, "Results")
 CONFIG_FILE = os.path.join(data_folder, 'config.jsonc')
 file_path_shapefile = os.path.join(shapefile_folder, shapefile_name)
 FILE_6_SIM_INPUT = os.path.join(data_folder, "milp_input_data.json")
-FILE_7_ACCESS_COSTS = os.path.join(data_folder, "access_trip_costs.json")
+FILE_7_ACCESS_COSTS = os.path.join(data_folder, "access_trip_costs")
 
 # Output Files
-OUTPUT_MAP = os.path.join(  , f"optimal_locations_map_{locale_info}.html")
+OUTPUT_MAP = os.path.join(RESULTS, f"optimal_locations_map_{locale_info}.html")
 OUTPUT_CSV = os.path.join(RESULTS, f"optimal_solution_{locale_info}.csv")
 
 # Ensure Results folder exists
@@ -102,10 +106,9 @@ with open(FILE_6_SIM_INPUT, 'r') as f:
 if not os.path.exists(FILE_7_ACCESS_COSTS):
     print(f"CRITICAL ERROR: Access costs '{FILE_7_ACCESS_COSTS}' not found.")
     sys.exit(1)
-with open(FILE_7_ACCESS_COSTS, 'r') as f:
-    access_trip_costs_wh = json.load(f)
+access_costs = AccessCosts(FILE_7_ACCESS_COSTS)
 
-print(f"Loaded {len(access_trip_costs_wh)} pre-computed access trip costs.")
+print(f"Loaded {len(access_costs)} pre-computed access trip costs.")
 
 # Grid Setup
 LAT_DEG_TO_KM, LON_DEG_TO_KM = 111, 110
@@ -139,25 +142,15 @@ demand_cells_from_origins = list(demand_by_cell.keys())
 print(f"Found {len(demand_cells_from_origins)} unique cells with trip origins.")
 
 # 2. Filter grid cells by boundary
-all_cells_in_boundary = []
-all_grid_cells = [(r, c) for r in range(GRID_ROWS) for c in range(GRID_COLS)]
-for r, c in tqdm(all_grid_cells, desc="Filtering grid cells by main boundary"):
-    lon, lat = min_lon + (c + 0.5) * CELL_WIDTH_DEG, min_lat + (r + 0.5) * CELL_HEIGHT_DEG
-    if city_polygon.contains(Point(lon, lat)):
-        all_cells_in_boundary.append((r, c))
+in_boundary = boundary_mask(city_polygon, GRID_ROWS, GRID_COLS, min_lat, min_lon, CELL_HEIGHT_DEG, CELL_WIDTH_DEG)
+print(f"{int(in_boundary.sum())} grid cells are inside the main boundary.")
 
 # 3. Generate potential station locations
 print("\nGenerating potential station locations based on proximity to demand...")
-potential_station_cells_set = set()
 search_radius = opt_params['coverage_radius_km']
-
-for demand_cell in tqdm(demand_cells_from_origins, desc="Finding candidate sites near demand"):
-    potential_station_cells_set.add(demand_cell) 
-    for candidate_cell in all_cells_in_boundary:
-        if calculate_distance_km(demand_cell, candidate_cell, grid_cfg['grid_size_km'], grid_cfg['grid_size_km']) <= search_radius:
-            potential_station_cells_set.add(candidate_cell)
-
-potential_station_cells = list(potential_station_cells_set)
+potential_station_cells = candidate_station_cells(
+    demand_cells_from_origins, in_boundary, search_radius, grid_cfg['grid_size_km'], grid_cfg['grid_size_km']
+)
 print(f"Smart Filtering Complete: Reduced search space to {len(potential_station_cells)} potential locations.")
 
 # --- MAPPING, FEASIBILITY, AND FINAL PREP ---
@@ -182,25 +175,49 @@ eligible_stations_per_demand_cell = {}
 start_wh = battery_cfg["total_capacity_wh"] * (battery_cfg["starting_soc_pct"] / 100)
 reserve_wh = battery_cfg["total_capacity_wh"] * (battery_cfg["low_soc_threshold_pct"] / 100)
 
-for route in tqdm(all_routes_results, desc="Processing Routes for Feasibility"):
+# One entry per route with an origin cell and pre-computed access costs
+route_origin_cells, route_dest_rows, route_wh = [], [], []
+for route in all_routes_results:
     origin_cell = get_grid_cell(route['start_coords']['lat'], route['start_coords']['lon'], min_lat, min_lon, CELL_HEIGHT_DEG, CELL_WIDTH_DEG, GRID_ROWS, GRID_COLS)
     if not origin_cell: continue
-
-    eligible_stations_for_this_route = []
-    for station_cell in potential_station_cells:
-        if calculate_distance_km(origin_cell, station_cell, grid_cfg['grid_size_km'], grid_cfg['grid_size_km']) > opt_params['coverage_radius_km']:
-            continue
-
-        key = str((route['end_coords']['lat'], route['end_coords']['lon'], station_cell[0], station_cell[1]))
-        access_trip_wh = access_trip_costs_wh.get(key)
-
-        if access_trip_wh is not None:
-            total_consumed_wh = route['electric_wh_consumed'] + access_trip_wh
-            if (start_wh - total_consumed_wh) >= reserve_wh:
-                eligible_stations_for_this_route.append(station_cell)
-
-    if eligible_stations_for_this_route:
-        eligible_stations_per_demand_cell[origin_cell] = list(set(eligible_stations_per_demand_cell.get(origin_cell, []) + eligible_stations_for_this_route))
+    dest_row = access_costs.destination_row(route['end_coords']['lat'], route['end_coords']['lon'])
+    if dest_row is None: continue
+    route_origin_cells.append(origin_cell)
+    route_dest_rows.append(dest_row)
+    route_wh.append(route['electric_wh_consumed'])
+route_origin_cells = np.array(route_origin_cells, dtype=np.int64).reshape(-1, 2)
+route_dest_rows = np.array(route_dest_rows, dtype=np.int64)
+route_wh = np.array(route_wh, dtype=np.float64)
+
+# Cost matrix column of each potential station (-1: no pre-computed costs)
+station_cols = np.array([
+    -1 if col is None else col for col in map(access_costs.station_column, potential_station_cells)
+], dtype=np.int64).reshape(-1)
+
+# (route, station) pairs, in blocks of routes so the distance mask stays small
+FEASIBILITY_CHUNK = 2048
+eligible_origin_keys, eligible_station_idx = [], []
+for start in tqdm(range(0, len(route_dest_rows), FEASIBILITY_CHUNK), desc="Processing Routes for Feasibility"):
+    stop = start + FEASIBILITY_CHUNK
+    within = cell_distances_km(route_origin_cells[start:stop], potential_station_cells, grid_cfg['grid_size_km'], grid_cfg['grid_size_km']) <= opt_params['coverage_radius_km']
+    within &= station_cols >= 0
+    r, s = np.nonzero(within)
+    r += start
+
+    access_trip_wh = access_costs.pair_costs(route_dest_rows[r], station_cols[s])
+    total_consumed_wh = route_wh[r] + access_trip_wh
+    # NaN (pair not stored) compares False, like a missing cost
+    feasible = (start_wh - total_consumed_wh) >= reserve_wh
+
+    eligible_origin_keys.append(route_origin_cells[r[feasible], 0] * GRID_COLS + route_origin_cells[r[feasible], 1])
+    eligible_station_idx.append(s[feasible])
+
+# Unique (demand cell, station) pairs, grouped by demand cell
+if eligible_origin_keys:
+    eligible_pairs = np.unique(np.stack([np.concatenate(eligible_origin_keys), np.concatenate(eligible_station_idx)], axis=1), axis=0)
+    cell_keys, group_starts = np.unique(eligible_pairs[:, 0], return_index=True)
+    for key, station_idx in zip(cell_keys.tolist(), np.split(eligible_pairs[:, 1], group_starts[1:])):
+        eligible_stations_per_demand_cell[divmod(key, GRID_COLS)] = [potential_station_cells[i] for i in station_idx.tolist()]
 
 demand_cells = list(demand_by_cell.keys())
 print(f"Finished processing. Found {len(demand_cells)} unique demand cells with at least one feasible station.")
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Storage of the access trip costs: energy (Wh) to ride from each trip
+destination to each potential station cell. Written by
+precompute_access_costs.py and read by Optimization_FCLP.py.
+
+The costs are kept as NumPy arrays in one folder, instead of a JSON dict
+keyed by stringified (lat, lon, row, col) tuples:
+
+    destinations.npy   float64 (n_destinations, 2), lat/lon of each row
+    stations.npy       int64   (n_stations, 2), grid row/col of each column
+    costs_wh.npy       dense:  float64 (n_destinations, n_stations)
+                       sparse: float64 (nnz,), the stored costs in CSR order
+    indptr.npy         sparse only: int64 (n_destinations + 1,)
+    indices.npy        sparse only: int64 (nnz,), station column of each cost
+
+The sparse (CSR) layout only holds the (destination, station) pairs the
+optimizer can ask for; pairs that are not stored behave like missing
+costs. costs_wh.npy is opened memory-mapped, so only the rows the
+optimizer touches are read from disk.
+"""
+
+import os
+
+import numpy as np
+
+COSTS_FILE = "costs_wh.npy"
+DESTINATIONS_FILE = "destinations.npy"
+STATIONS_FILE = "stations.npy"
+INDPTR_FILE = "indptr.npy"
+INDICES_FILE = "indices.npy"
+
+
+def _save_tables(folder, destinations, stations):
+    destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    stations = np.asarray(stations, dtype=np.int64).reshape(-1, 2)
+    os.makedirs(folder, exist_ok=True)
+    np.save(os.path.join(folder, DESTINATIONS_FILE), destinations)
+    np.save(os.path.join(folder, STATIONS_FILE), stations)
+    return destinations, stations
+
+
+def save_access_costs(folder, destinations, stations, costs_wh):
+    """
+    Writes the dense cost matrix and its index tables to folder.
+
+    destinations: (n, 2) lat/lon, one per row of costs_wh.
+    stations: (m, 2) grid row/col, one per column of costs_wh.
+    """
+    costs_wh = np.asarray(costs_wh, dtype=np.float64)
+    if costs_wh.shape != (len(destinations), len(stations)):
+        raise ValueError(
+            f"Cost matrix shape {costs_wh.shape} does not match "
+            f"{len(destinations)} destinations x {len(stations)} stations"
+        )
+
+    _save_tables(folder, destinations, stations)
+    # A previous sparse run would otherwise be picked up by AccessCosts
+    for name in (INDPTR_FILE, INDICES_FILE):
+        if os.path.exists(os.path.join(folder, name)):
+            os.remove(os.path.join(folder, name))
+    np.save(os.path.join(folder, COSTS_FILE), costs_wh)
+
+
+def save_sparse_access_costs(folder, destinations, stations, indptr, indices, costs_wh):
+    """
+    Writes the costs in CSR form: the costs of destination i are
+    costs_wh[indptr[i]:indptr[i + 1]], for the station columns
+    indices[indptr[i]:indptr[i + 1]] (sorted within each row).
+    """
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+    costs_wh = np.asarray(costs_wh, dtype=np.float64)
+    if len(indptr) != len(destinations) + 1 or len(indices) != len(costs_wh) or indptr[-1] != len(costs_wh):
+        raise ValueError("Inconsistent CSR arrays for the access trip costs")
+
+    _save_tables(folder, destinations, stations)
+    np.save(os.path.join(folder, INDPTR_FILE), indptr)
+    np.save(os.path.join(folder, INDICES_FILE), indices)
+    np.save(os.path.join(folder, COSTS_FILE), costs_wh)
+
+
+class AccessCosts:
+    """Access trip costs loaded from a folder written by save_access_costs
+    or save_sparse_access_costs."""
+
+    def __init__(self, folder, mmap_mode='r'):
+        self.folder = folder
+        self.destinations = np.load(os.path.join(folder, DESTINATIONS_FILE))
+        self.stations = np.load(os.path.join(folder, STATIONS_FILE))
+        self.costs_wh = np.load(os.path.join(folder, COSTS_FILE), mmap_mode=mmap_mode)
+
+        self.sparse = os.path.exists(os.path.join(folder, INDPTR_FILE))
+        self._entry_keys = None
+        if self.sparse:
+            self.indptr = np.load(os.path.join(folder, INDPTR_FILE))
+            self.indices = np.load(os.path.join(folder, INDICES_FILE), mmap_mode=mmap_mode)
+
+        # (lat, lon) -> row and (row, col) -> column, built once
+        self._destination_rows = {(lat, lon): i for i, (lat, lon) in enumerate(self.destinations.tolist())}
+        self._station_columns = {(r, c): j for j, (r, c) in enumerate(self.stations.tolist())}
+
+    def __len__(self):
+        """Number of (destination, station) costs stored."""
+        return self.costs_wh.size
+
+    def destination_row(self, lat, lon):
+        """Row of the destination (lat, lon), or None if it has no costs."""
+        return self._destination_rows.get((lat, lon))
+
+    def station_column(self, cell):
+        """Column of the station cell (row, col), or None if it has no costs."""
+        return self._station_columns.get((cell[0], cell[1]))
+
+    def row(self, dest_row):
+        """(station columns, costs) stored for one destination row."""
+        if not self.sparse:
+            return np.arange(self.costs_wh.shape[1]), self.costs_wh[dest_row]
+        start, stop = self.indptr[dest_row], self.indptr[dest_row + 1]
+        return self.indices[start:stop], self.costs_wh[start:stop]
+
+    def pair_costs(self, dest_rows, station_cols):
+        """
+        Costs of many (destination row, station column) pairs at once, as a
+        float array with NaN where the pair is not stored.
+        """
+        dest_rows = np.asarray(dest_rows, dtype=np.int64)
+        station_cols = np.asarray(station_cols, dtype=np.int64)
+        if not self.sparse:
+            return np.asarray(self.costs_wh[dest_rows, station_cols], dtype=np.float64)
+
+        # CSR entries are sorted by (row, column), so row * n_stations + column
+        # is increasing and the pairs can be found with one searchsorted
+        n_stations = len(self.stations)
+        if self._entry_keys is None:
+            entry_rows = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+            self._entry_keys = entry_rows * n_stations + np.asarray(self.indices)
+        keys = dest_rows * n_stations + station_cols
+        k = np.searchsorted(self._entry_keys, keys)
+        found = k < len(self._entry_keys)
+        found[found] = self._entry_keys[k[found]] == keys[found]
+        costs = np.full(len(keys), np.nan)
+        costs[found] = self.costs_wh[k[found]]
+        return costs
+
+    def cost(self, dest_row, station_col):
+        """Cost of one (destination, station) pair, or None if it is not stored."""
+        if not self.sparse:
+            return self.costs_wh[dest_row, station_col]
+        columns, costs = self.row(dest_row)
+        k = np.searchsorted(columns, station_col)
+        if k < len(columns) and columns[k] == station_col:
+            return costs[k]
+        return None
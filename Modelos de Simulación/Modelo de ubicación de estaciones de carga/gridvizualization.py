@@ -6,10 +6,11 @@ Created on Thu Jul 24 04:48:08 2025
 import json5
 import geopandas as gpd
 import matplotlib.pyplot as plt
-from shapely.geometry import Point, Polygon
-from tqdm import tqdm
+import shapely
 import os
 
+from station_grid import boundary_mask
+
 #
 #          For analysis please define the correct territory to analyze and trips coords
 #  
@@ -59,23 +60,13 @@ GRID_ROWS = int((max_lat - min_lat) / CELL_HEIGHT_DEG) + 1
 GRID_COLS = int((max_lon - min_lon) / CELL_WIDTH_DEG) + 1
 print(f"Calculated a {GRID_ROWS}x{GRID_COLS} grid to overlay the area.")
 
-all_cells_polygons = []
-for r in tqdm(range(GRID_ROWS), desc="Generating and filtering grid cells"):
-    for c in range(GRID_COLS):
-        # Calculate the four corners of the grid cell
-        bottom_left_lon = min_lon + c * CELL_WIDTH_DEG
-        bottom_left_lat = min_lat + r * CELL_HEIGHT_DEG
-        
-        top_left = (bottom_left_lon, bottom_left_lat + CELL_HEIGHT_DEG)
-        top_right = (bottom_left_lon + CELL_WIDTH_DEG, bottom_left_lat + CELL_HEIGHT_DEG)
-        bottom_right = (bottom_left_lon + CELL_WIDTH_DEG, bottom_left_lat)
-        bottom_left = (bottom_left_lon, bottom_left_lat)
-
-        cell_poly = Polygon([top_left, top_right, bottom_right, bottom_left])
-        
-        # Only include the cell if its center is within the actual city boundary
-        if city_polygon.contains(cell_poly.centroid):
-            all_cells_polygons.append(cell_poly)
+# Only include the cells whose center is within the actual city boundary
+rows, cols = boundary_mask(city_polygon, GRID_ROWS, GRID_COLS, min_lat, min_lon, CELL_HEIGHT_DEG, CELL_WIDTH_DEG).nonzero()
+bottom_left_lon = min_lon + cols * CELL_WIDTH_DEG
+bottom_left_lat = min_lat + rows * CELL_HEIGHT_DEG
+all_cells_polygons = shapely.box(
+    bottom_left_lon, bottom_left_lat, bottom_left_lon + CELL_WIDTH_DEG, bottom_left_lat + CELL_HEIGHT_DEG
+)
 
 # Create a new GeoDataFrame for the grid
 grid_gdf = gpd.GeoDataFrame(geometry=all_cells_polygons, crs="EPSG:4326")
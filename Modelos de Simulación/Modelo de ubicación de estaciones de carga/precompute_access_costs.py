@@ -14,7 +14,9 @@ from tqdm import tqdm
 import json5
 import numpy as np
 import geopandas as gpd
-from shapely.geometry import Point
+
+from access_costs import save_access_costs, save_sparse_access_costs
+from station_grid import boundary_mask, candidate_station_cells, cell_distances_km
 
 #----------------------------------------UNIVERSAL CONFIGURATION-------------------------
 # 1. Determine Territory (Listens to Main Pipeline)
@@ -47,8 +49,8 @@ CONFIG_FILE = os.path.join(data_folder, 'config.jsonc')
 file_path_shapefile = os.path.join(shapefile_folder, shapefile_name)
 FILE_6_SIM_INPUT = os.path.join(data_folder, "milp_input_data.json")
 
-# Output File (Standardized Name for Pipeline - Shared JSON)
-FILE_7_ACCESS_COSTS = os.path.join(data_folder, "access_trip_costs.json")
+# Output Folder (Standardized Name for Pipeline - NPY cost matrix + index tables)
+FILE_7_ACCESS_COSTS = os.path.join(data_folder, "access_trip_costs")
 
 # Ensure Results folder exists
 if not os.path.exists(RESULTS):
@@ -126,23 +128,16 @@ demand_cells_from_origins = list(demand_by_cell.keys())
 print(f"Found {len(demand_cells_from_origins)} unique cells with trip origins.")
 
 # 3.2. Pre-filter all grid cells to only include those inside the city boundary.
-all_cells_in_boundary = []
-all_grid_cells = [(r, c) for r in range(GRID_ROWS) for c in range(GRID_COLS)]
-for r, c in tqdm(all_grid_cells, desc="Filtering grid cells by main boundary"):
-    lon_cell, lat_cell = min_lon + (c + 0.5) * CELL_WIDTH_DEG, min_lat + (r + 0.5) * CELL_HEIGHT_DEG
-    if city_polygon.contains(Point(lon_cell, lat_cell)):
-        all_cells_in_boundary.append((r, c))
+in_boundary = boundary_mask(city_polygon, GRID_ROWS, GRID_COLS, min_lat, min_lon, CELL_HEIGHT_DEG, CELL_WIDTH_DEG)
+print(f"{int(in_boundary.sum())} grid cells are inside the main boundary.")
 
 # 3.3. Generate potential station locations based on proximity to demand.
-potential_station_cells_set = set()
+# Radius query on the grid: every demand cell is dilated by a disk stencil of
+# coverage_radius_km, instead of testing every (demand cell, boundary cell) pair.
 search_radius = opt_params['coverage_radius_km']
-for demand_cell in tqdm(demand_cells_from_origins, desc="Finding candidate sites near demand"):
-    potential_station_cells_set.add(demand_cell)
-    for candidate_cell in all_cells_in_boundary:
-        if calculate_distance_km(demand_cell, candidate_cell, grid_cfg['grid_size_km'], grid_cfg['grid_size_km']) <= search_radius:
-            potential_station_cells_set.add(candidate_cell)
-
-potential_station_cells = list(potential_station_cells_set)
+potential_station_cells = candidate_station_cells(
+    demand_cells_from_origins, in_boundary, search_radius, grid_cfg['grid_size_km'], grid_cfg['grid_size_km']
+)
 print(f"Dynamic Generation Complete: Found {len(potential_station_cells)} potential locations.")
 
 # --- 4. Prepare Data for Vectorization ---
@@ -150,44 +145,83 @@ print("\nStep 3: Preparing data for vectorized calculation...")
 unique_destinations_dict = { (r['end_coords']['lat'], r['end_coords']['lon']): r['end_coords'] for r in all_routes_results }
 print(f"Found {len(unique_destinations_dict)} unique destination points.")
 
-dest_coords_array = np.array([[data['lat'], data['lon']] for data in unique_destinations_dict.values()])
+dest_coords_array = np.array([[data['lat'], data['lon']] for data in unique_destinations_dict.values()]).reshape(-1, 2)
 station_coords_array = np.array([
     [min_lat + (r + 0.5) * CELL_HEIGHT_DEG, min_lon + (c + 0.5) * CELL_WIDTH_DEG]
     for r, c in potential_station_cells
-])
-
-# --- 5. Perform High-Speed Vectorized Calculation ---
-print("\nStep 4: Performing vectorized distance and cost calculation...")
-
-delta_coords = dest_coords_array[:, np.newaxis, :] - station_coords_array[np.newaxis, :, :]
-delta_coords[:, :, 0] *= LAT_DEG_TO_KM
-delta_coords[:, :, 1] *= LON_DEG_TO_KM
-distance_matrix_km = np.sqrt(np.sum(delta_coords**2, axis=2))
+]).reshape(-1, 2)
 
 total_wh = sum(r['electric_wh_consumed'] for r in all_routes_results)
 total_km = sum(r['distance_km'] for r in all_routes_results)
 AVG_WH_PER_KM = (total_wh / total_km) if total_km > 0 else 75
 print(f"Using an average vehicle energy rate of: {AVG_WH_PER_KM:.2f} Wh/km")
 
-cost_matrix_wh = distance_matrix_km * AVG_WH_PER_KM
+def access_costs_wh(dest_coords):
+    """Access trip cost (Wh) from each destination in dest_coords to every potential station."""
+    delta_coords = dest_coords[:, np.newaxis, :] - station_coords_array[np.newaxis, :, :]
+    delta_coords[:, :, 0] *= LAT_DEG_TO_KM
+    delta_coords[:, :, 1] *= LON_DEG_TO_KM
+    distance_matrix_km = np.sqrt(np.sum(delta_coords**2, axis=2))
+    return distance_matrix_km * AVG_WH_PER_KM
 
-# --- 6. Format and Save Results ---
-print("\nStep 5: Formatting and saving results...")
-access_trip_costs_wh = {}
-unique_dest_list = list(unique_destinations_dict.values())
+# Sparse mode: only the (destination, station) pairs the optimizer can ask for,
+# i.e. stations within radius_km of the origin of some route ending at that destination.
+access_cfg = opt_cfg.get('access_cost_settings', {})
+SPARSE_ACCESS_COSTS = access_cfg.get('sparse', False)
 
-for i in tqdm(range(len(unique_dest_list)), desc="Saving Costs"):
-    dest_point = unique_dest_list[i]
-    for j in range(len(potential_station_cells)):
-        station_cell = potential_station_cells[j]
-        
-        final_cost = cost_matrix_wh[i, j]
-
-        key = str((dest_point['lat'], dest_point['lon'], station_cell[0], station_cell[1]))
-        access_trip_costs_wh[key] = final_cost
-
-with open(FILE_7_ACCESS_COSTS, 'w') as f:
-    json.dump(access_trip_costs_wh, f) # Using compact format for speed
+# --- 5. Perform High-Speed Vectorized Calculation ---
+if not SPARSE_ACCESS_COSTS:
+    print("\nStep 4: Performing vectorized distance and cost calculation...")
+    cost_matrix_wh = access_costs_wh(dest_coords_array)
+
+    # --- 6. Save Results ---
+    # Rows follow dest_coords_array and columns follow potential_station_cells;
+    # the optimizer looks both up by index instead of by string keys.
+    print("\nStep 5: Saving results...")
+    save_access_costs(FILE_7_ACCESS_COSTS, dest_coords_array, potential_station_cells, cost_matrix_wh)
+    n_entries = cost_matrix_wh.size
+else:
+    sparse_radius_km = access_cfg.get('radius_km', opt_params['coverage_radius_km'])
+    chunk_size = max(1, int(access_cfg.get('chunk_size', 1024)))
+    print(f"\nStep 4: Computing sparse access costs (stations within {sparse_radius_km} km of the trip origin, "
+          f"{chunk_size} destinations per chunk)...")
+
+    # Unique (destination row, origin cell) pairs, sorted by destination row
+    dest_row_of = {key: i for i, key in enumerate(unique_destinations_dict)}
+    pairs = set()
+    for route in all_routes_results:
+        origin_cell = get_grid_cell(route['start_coords']['lat'], route['start_coords']['lon'], min_lat, min_lon, CELL_HEIGHT_DEG, CELL_WIDTH_DEG, GRID_ROWS, GRID_COLS, max_lat, max_lon)
+        if origin_cell:
+            pairs.add((dest_row_of[(route['end_coords']['lat'], route['end_coords']['lon'])],) + origin_cell)
+    pairs = np.array(sorted(pairs), dtype=np.int64).reshape(-1, 3)
+    pair_dest_rows, pair_origin_cells = pairs[:, 0], pairs[:, 1:]
+
+    n_dest = len(dest_coords_array)
+    row_counts = np.zeros(n_dest, dtype=np.int64)
+    indices_chunks, costs_chunks = [], []
+    for start in tqdm(range(0, n_dest, chunk_size), desc="Computing Sparse Costs"):
+        stop = min(start + chunk_size, n_dest)
+        p0, p1 = np.searchsorted(pair_dest_rows, [start, stop])
+
+        # Stations within the radius of any origin of the routes ending in this chunk
+        needed = np.zeros((stop - start, len(potential_station_cells)), dtype=bool)
+        within = cell_distances_km(pair_origin_cells[p0:p1], potential_station_cells, grid_cfg['grid_size_km'], grid_cfg['grid_size_km']) <= sparse_radius_km
+        np.logical_or.at(needed, pair_dest_rows[p0:p1] - start, within)
+
+        rows, cols = np.nonzero(needed)
+        costs_chunks.append(access_costs_wh(dest_coords_array[start:stop])[rows, cols])
+        indices_chunks.append(cols)
+        row_counts[start:stop] = np.bincount(rows, minlength=stop - start)
+
+    indptr = np.concatenate([[0], np.cumsum(row_counts)])
+    sparse_costs_wh = np.concatenate(costs_chunks) if costs_chunks else np.zeros(0)
+    sparse_indices = np.concatenate(indices_chunks) if indices_chunks else np.zeros(0, dtype=np.int64)
+
+    # --- 6. Save Results ---
+    print("\nStep 5: Saving results...")
+    save_sparse_access_costs(FILE_7_ACCESS_COSTS, dest_coords_array, potential_station_cells, indptr, sparse_indices, sparse_costs_wh)
+    n_entries = len(sparse_costs_wh)
+    print(f"Stored {n_entries} of {n_dest * len(potential_station_cells)} (destination, station) pairs.")
 
 print(f"\nPre-computation complete.")
-print(f"A complete set of access trip costs ({len(access_trip_costs_wh)} entries) has been saved to '{FILE_7_ACCESS_COSTS}'.")
\ No newline at end of file
+print(f"A complete set of access trip costs ({n_entries} entries) has been saved to '{FILE_7_ACCESS_COSTS}'.")
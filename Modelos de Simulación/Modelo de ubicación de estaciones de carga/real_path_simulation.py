@@ -185,6 +185,8 @@ if __name__ == '__main__':
     vehicle_to_use = sim_config['vehicle_model_to_use']
     vehicle_params = sim_config['vehicle_models'][vehicle_to_use]
     api_key = sim_config.get("ors_api_key")
+    # Optional: precomputed slope table instead of cos/sin per point (see motor_particula.tabla)
+    use_power_table = sim_config.get("power_lookup_table", False)
     
     if not api_key or api_key == "PASTE_YOUR_API_KEY_HERE":
         print("FATAL ERROR: Please add your OpenRouteService API key to config.jsonc")
@@ -241,7 +243,8 @@ if __name__ == '__main__':
                     hybrid_cont=sim_config['hybrid_contribution'],
                     speeds=final_speeds,
                     slopes=final_slopes,
-                    vehicle_params=vehicle_params
+                    vehicle_params=vehicle_params,
+                    usar_tabla=use_power_table
                 )
                 
                 result_summary = {
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Grid helpers shared by precompute_access_costs.py, Optimization_FCLP.py
+and gridvizualization.py.
+
+The scripts lay the same regular grid over the territory (cells indexed
+by (row, col), grid_size_km on each side), keep the cells whose center is
+inside the territory boundary and look for candidate charging station
+cells around the cells where trips start. Distances between cells are the
+ones of calculate_distance_km: Euclidean distance between cell centers,
+measured in cells times the cell size.
+"""
+
+import numpy as np
+import shapely
+
+
+def cell_centers(grid_rows, grid_cols, min_lat, min_lon, cell_height_deg, cell_width_deg):
+    """(lon, lat) arrays of shape (grid_rows, grid_cols) with every cell center."""
+    lon = min_lon + (np.arange(grid_cols) + 0.5) * cell_width_deg
+    lat = min_lat + (np.arange(grid_rows) + 0.5) * cell_height_deg
+    return np.broadcast_to(lon, (grid_rows, grid_cols)), np.broadcast_to(lat[:, np.newaxis], (grid_rows, grid_cols))
+
+
+def boundary_mask(polygon, grid_rows, grid_cols, min_lat, min_lon, cell_height_deg, cell_width_deg):
+    """
+    Boolean (grid_rows, grid_cols) array: True where the cell center is
+    inside polygon. Same test as polygon.contains(Point(lon, lat)) for each
+    cell, done in one vectorized call on a prepared geometry.
+    """
+    lon, lat = cell_centers(grid_rows, grid_cols, min_lat, min_lon, cell_height_deg, cell_width_deg)
+    shapely.prepare(polygon)
+    return shapely.contains_xy(polygon, lon, lat)
+
+
+def cell_distances_km(cells_a, cells_b, cell_height_km, cell_width_km):
+    """
+    (len(cells_a), len(cells_b)) matrix of calculate_distance_km between
+    every pair of (row, col) cells, with the same floating-point result.
+    """
+    cells_a = np.asarray(cells_a, dtype=np.int64).reshape(-1, 2)
+    cells_b = np.asarray(cells_b, dtype=np.int64).reshape(-1, 2)
+    delta_x = (cells_a[:, np.newaxis, 1] - cells_b[np.newaxis, :, 1]) * cell_width_km
+    delta_y = (cells_a[:, np.newaxis, 0] - cells_b[np.newaxis, :, 0]) * cell_height_km
+    return np.sqrt(delta_x**2 + delta_y**2)
+
+
+def disk_stencil(radius_km, cell_height_km, cell_width_km):
+    """
+    Integer (row, col) offsets of every cell whose center lies within
+    radius_km of the center of cell (0, 0).
+
+    Returns two arrays (d_rows, d_cols).
+    """
+    # One cell of margin; the distance test below does the exact cut
+    max_dr = int(radius_km / cell_height_km) + 1
+    max_dc = int(radius_km / cell_width_km) + 1
+    d_rows, d_cols = np.meshgrid(
+        np.arange(-max_dr, max_dr + 1), np.arange(-max_dc, max_dc + 1), indexing='ij'
+    )
+    # Same operations as calculate_distance_km, so the cut matches it exactly
+    delta_x = d_cols * cell_width_km
+    delta_y = d_rows * cell_height_km
+    inside = np.sqrt(delta_x**2 + delta_y**2) <= radius_km
+    return d_rows[inside], d_cols[inside]
+
+
+def dilate_cells(cell_mask, radius_km, cell_height_km, cell_width_km):
+    """
+    Boolean grid marking every cell within radius_km of a True cell of
+    cell_mask. Costs one shifted OR over the grid per stencil offset,
+    instead of one distance computation per (cell, cell) pair.
+    """
+    rows, cols = cell_mask.shape
+    near = np.zeros_like(cell_mask, dtype=bool)
+    for dr, dc in zip(*disk_stencil(radius_km, cell_height_km, cell_width_km)):
+        if abs(dr) >= rows or abs(dc) >= cols:
+            continue
+        # near[r + dr, c + dc] |= cell_mask[r, c], clipped to the grid
+        near[max(dr, 0):rows + min(dr, 0), max(dc, 0):cols + min(dc, 0)] |= \
+            cell_mask[max(-dr, 0):rows - max(dr, 0), max(-dc, 0):cols - max(dc, 0)]
+    return near
+
+
+def candidate_station_cells(demand_cells, boundary_mask, radius_km, cell_height_km, cell_width_km):
+    """
+    Potential station locations: every demand cell, plus every cell inside
+    the boundary (boundary_mask, a GRID_ROWS x GRID_COLS boolean array)
+    within radius_km of a demand cell.
+
+    Returns a list of (row, col) tuples in row-major order.
+    """
+    boundary_mask = np.asarray(boundary_mask, dtype=bool)
+    demand_mask = np.zeros_like(boundary_mask)
+    if len(demand_cells):
+        demand_rows, demand_cols = np.asarray(demand_cells, dtype=np.intp).T
+        demand_mask[demand_rows, demand_cols] = True
+
+    candidates = demand_mask | (boundary_mask & dilate_cells(demand_mask, radius_km, cell_height_km, cell_width_km))
+    return [(int(r), int(c)) for r, c in zip(*np.nonzero(candidates))]
@@ -20,6 +20,7 @@ if os.path.exists(ruta_procesar):
     sys.path.append(ruta_procesar)
     try:
         from procesar_rutas import consum, preprocesar_vectores
+        from HybridBikeConsumptionModel.particle_kernel import SPEC_TELEMETRIA, fuerzas_kmh, potencias_kmh
     except ImportError as e:
         print(f"Advertencia: No se pudo importar procesar_rutas: {e}")
         raise
@@ -876,34 +877,17 @@ def calcular_caracteristicas_moto_por_punto(speeds, slopes, tiempos, coordenadas
     """
     Calcula las características de la moto (fuerzas, potencia) para cada punto del recorrido.
     """
-    # Parámetros de la moto
-    m = 140  # kg (masa total)
-    cd = 0.3  # coeficiente de arrastre
-    a = 0.74  # m² (área frontal)
-    crr = 0.01  # coeficiente de rodamiento
-    rho = 1.225  # kg/m³ (densidad del aire)
-    g = 9.81  # m/s² (gravedad)
-    rw = 0.3  # m (radio de la rueda)
-    eficiencia_tren = 0.85
-    factor_correccion = 1.617
-    
-    # Listas para almacenar resultados
-    distancias = []
-    velocidades_ms = []
-    potencias_electricas_kw = []
-    potencias_combustion_kw = []
-    fuerzas_aerodinamica = []
-    fuerzas_rodamiento = []
-    fuerzas_gravitacional = []
-    fuerzas_inercia = []
-    fuerzas_resistencia_total = []
-    altitudes = []
+    # Moto de referencia calibrada con telemetría, con el factor 1.8 de combustión
+    spec = SPEC_TELEMETRIA.con(factor_correccion_cn=1.8)
     
-    distancia_acumulada = 0
-    last_vel = 0
+    faero, froll, fg, f_inertia = fuerzas_kmh(speeds, slopes, spec)
+    fres = faero + froll + fg + f_inertia
+    p_eb, p_cn = potencias_kmh(speeds, slopes, hybrid_cont, spec)
     
+    # Distancia acumulada (km) entre puntos con coordenadas válidas
+    distancias = []
+    distancia_acumulada = 0
     for i in range(len(speeds)):
-        # Calcular distancia acumulada
         if i > 0:
             lat_ant = coordenadas[i-1][0]
             lon_ant = coordenadas[i-1][1]
@@ -912,54 +896,17 @@ def calcular_caracteristicas_moto_por_punto(speeds, slopes, tiempos, coordenadas
             if lat_ant != 0 and lon_ant != 0 and lat_act != 0 and lon_act != 0:
                 dist_segmento = geodesic((lat_ant, lon_ant), (lat_act, lon_act)).kilometers
                 distancia_acumulada += dist_segmento
-        
         distancias.append(distancia_acumulada)
-        
-        # Velocidad en m/s
-        vel_ms = speeds[i] / 3.6
-        velocidades_ms.append(vel_ms)
-        
-        # Ángulo de pendiente
-        theta = slopes[i] * math.pi / 180
-        
-        # Calcular fuerzas
-        faero = 0.5 * rho * a * cd * (vel_ms ** 2)
-        froll = g * m * crr * np.cos(theta)
-        fg = g * m * np.sin(theta)
-        delta_v = vel_ms - last_vel
-        f_inertia = m * delta_v / 1  # Asumiendo dt = 1 segundo
-        
-        fres = faero + froll + fg + f_inertia
-        
-        # Potencia mecánica
-        p_m = (fres * rw) * (vel_ms / rw)
-        
-        # Potencia eléctrica
-        p_eb = p_m * (1 - hybrid_cont) / eficiencia_tren
-        p_eb = p_eb * factor_correccion
-        if p_eb < 0:
-            p_eb = 0
-        potencias_electricas_kw.append(p_eb / 1000)
-        
-        # Potencia de combustión
-        p_cn = p_m * hybrid_cont / 0.2
-        factor_correccion_combustion = 1.8
-        p_cn = p_cn * factor_correccion_combustion
-        if p_cn <= 0:
-            p_cn = 0
-        potencias_combustion_kw.append(p_cn / 1000)
-        
-        # Guardar fuerzas
-        fuerzas_aerodinamica.append(faero)
-        fuerzas_rodamiento.append(froll)
-        fuerzas_gravitacional.append(fg)
-        fuerzas_inercia.append(f_inertia)
-        fuerzas_resistencia_total.append(fres)
-        
-        # Altitud
-        altitudes.append(coordenadas[i][2] if len(coordenadas[i]) > 2 else 1500)
-        
-        last_vel = vel_ms
+    
+    velocidades_ms = (np.asarray(speeds, dtype=float) / 3.6).tolist()
+    potencias_electricas_kw = (p_eb / 1000).tolist()
+    potencias_combustion_kw = (p_cn / 1000).tolist()
+    fuerzas_aerodinamica = faero.tolist()
+    fuerzas_rodamiento = froll.tolist()
+    fuerzas_gravitacional = fg.tolist()
+    fuerzas_inercia = f_inertia.tolist()
+    fuerzas_resistencia_total = fres.tolist()
+    altitudes = [c[2] if len(c) > 2 else 1500 for c in coordenadas[:len(speeds)]]
     
     return {
         'distancias': distancias,
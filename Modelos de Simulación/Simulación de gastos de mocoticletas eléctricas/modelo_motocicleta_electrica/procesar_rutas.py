@@ -1,9 +1,12 @@
 import json
-import math
 import numpy as np
 import folium
 import matplotlib.pyplot as plt
 
+from HybridBikeConsumptionModel.particle_kernel import (
+    CALIBRACION_TELEMETRIA, VehicleSpec, pasos_tiempo, potencias_kmh,
+)
+
 def preprocesar_vectores(velocidades, pendientes, tiempos, coordenadas, puntos_intermedios=2):
     n_original = len(velocidades)
     n_nuevo = n_original + (n_original - 1) * puntos_intermedios
@@ -49,70 +52,37 @@ def consum(speeds,slopes,tiempos,hybrid_cont,distancia_km=None):
                 rw = 0.3
         hev = DummyHEV()
 
-    last_vel = 0
-    pow_consumption_total = 0
-    pcn_consumption_total = 0
-    
-    for i in range(len(speeds)):
-        vel = speeds[i] / 3.6
-        theta = slopes[i] * math.pi / 180
-        faero = 0.5 * hev.Ambient.rho * hev.Chassis.a * hev.Chassis.cd * (vel ** 2)
-        froll = hev.Ambient.g * hev.Chassis.m * hev.Chassis.crr * np.cos(theta)
-        fg = hev.Ambient.g * hev.Chassis.m * np.sin(theta)
-        delta_v = vel - last_vel
-        f_inertia = hev.Chassis.m * delta_v / 1
-        fres = faero + froll + fg + f_inertia
-        p_e = vel * fres
-        p_m = (fres * hev.Wheel.rw) * (vel / hev.Wheel.rw)
-        p_eb = p_m * (1 - hybrid_cont) / 0.85
-        # Factor de corrección empírico (1.617) para ajustar a datos reales de telemetría
-        # Justificación: El modelo simplificado solo considera eficiencia del tren motriz (85%),
-        # pero no incluye pérdidas adicionales del sistema completo:
-        # - Pérdidas en cadena de conversión eléctrica (inversor, controlador, BMS): ~15-20%
-        # - Pérdidas por calentamiento (resistencia interna, cables, histéresis): ~5-10%
-        # - Pérdidas mecánicas adicionales (rodamientos, transmisión, frenos): ~5-9%
-        # - Consumo de sistemas auxiliares (electrónica, ventilación): ~2-5%
-        # Relación matemática: Pérdidas adicionales = (Factor - 1) / Factor
-        # Pérdidas adicionales = (1.617 - 1) / 1.617 = 38.14%
-        # Eficiencia real del sistema = 85% / 1.617 = 52.58%
-        # Validación: Calculado a partir de 1708 puntos de telemetría real
-        # (Potencia real: 268.68 kW / Potencia modelo: 166.21 kW = 1.617)
-        factor_correccion = 1.617
-        p_eb = p_eb * factor_correccion
-        if p_eb < 0:
-            p_eb = 0
-        p_cn = p_m * (hybrid_cont) / 0.2
-        # Factor de corrección empírico (1.8) para ajustar a datos reales de motocicletas a combustión
-        # Justificación: El modelo simplificado solo considera eficiencia del motor (20%),
-        # pero no incluye pérdidas adicionales del sistema completo:
-        # - Pérdidas térmicas (refrigeración, escape): ~30-40%
-        # - Pérdidas en bomba de combustible y sistema de inyección: ~5-10%
-        # - Pérdidas por fricción interna del motor: ~10-15%
-        # - Consumo en ralentí y transiciones: ~5-10%
-        # - Pérdidas en transmisión y embrague: ~5-8%
-        # Relación matemática: Pérdidas adicionales = (Factor - 1) / Factor
-        # Pérdidas adicionales = (1.8 - 1) / 1.8 = 44.44%
-        # Eficiencia real del sistema = 20% / 1.8 = 11.11%
-        # Validación: Ajustado para que el consumo esté en el rango típico de motocicletas
-        # (2-4 litros/100km) en lugar del valor subestimado inicial
-        factor_correccion_combustion = 1.8
-        p_cn = p_cn * factor_correccion_combustion
-        if p_cn <= 0:
-            p_cn = 0
-
-        last_vel = vel
-        
-        if i == 0:
-            delta_t = tiempos[0] if tiempos[0] > 0 else 1.0
-        else:
-            delta_t = max(tiempos[i] - tiempos[i-1], 0.1)
-        
-        tiempo_horas = delta_t / 3600
-        pow_consumption = (p_eb / 1000) * tiempo_horas
-        pcn_consumption = (p_cn / 1000) * tiempo_horas
-        
-        pow_consumption_total += pow_consumption
-        pcn_consumption_total += pcn_consumption
+    # Factor de corrección empírico (1.617) para ajustar a datos reales de telemetría
+    # Justificación: El modelo simplificado solo considera eficiencia del tren motriz (85%),
+    # pero no incluye pérdidas adicionales del sistema completo:
+    # - Pérdidas en cadena de conversión eléctrica (inversor, controlador, BMS): ~15-20%
+    # - Pérdidas por calentamiento (resistencia interna, cables, histéresis): ~5-10%
+    # - Pérdidas mecánicas adicionales (rodamientos, transmisión, frenos): ~5-9%
+    # - Consumo de sistemas auxiliares (electrónica, ventilación): ~2-5%
+    # Relación matemática: Pérdidas adicionales = (Factor - 1) / Factor
+    # Pérdidas adicionales = (1.617 - 1) / 1.617 = 38.14%
+    # Eficiencia real del sistema = 85% / 1.617 = 52.58%
+    # Validación: Calculado a partir de 1708 puntos de telemetría real
+    # (Potencia real: 268.68 kW / Potencia modelo: 166.21 kW = 1.617)
+    #
+    # Factor de corrección empírico (1.8) para ajustar a datos reales de motocicletas a combustión
+    # Justificación: El modelo simplificado solo considera eficiencia del motor (20%),
+    # pero no incluye pérdidas adicionales del sistema completo:
+    # - Pérdidas térmicas (refrigeración, escape): ~30-40%
+    # - Pérdidas en bomba de combustible y sistema de inyección: ~5-10%
+    # - Pérdidas por fricción interna del motor: ~10-15%
+    # - Consumo en ralentí y transiciones: ~5-10%
+    # - Pérdidas en transmisión y embrague: ~5-8%
+    # Relación matemática: Pérdidas adicionales = (Factor - 1) / Factor
+    # Pérdidas adicionales = (1.8 - 1) / 1.8 = 44.44%
+    # Eficiencia real del sistema = 20% / 1.8 = 11.11%
+    # Validación: Ajustado para que el consumo esté en el rango típico de motocicletas
+    # (2-4 litros/100km) en lugar del valor subestimado inicial
+    spec = VehicleSpec.desde_hev(hev, factor_correccion_cn=1.8, **CALIBRACION_TELEMETRIA)
+    p_eb, p_cn = potencias_kmh(speeds, slopes, hybrid_cont, spec)
+    tiempo_horas = pasos_tiempo(tiempos) / 3600
+    pow_consumption_total = float(np.sum((p_eb / 1000) * tiempo_horas))
+    pcn_consumption_total = float(np.sum((p_cn / 1000) * tiempo_horas))
     
     # Conversión de energía de combustible (kWh) a galones de gasolina
     # Poder calorífico de la gasolina: ~33.7 kWh/galón (125,000 BTU/galón)
@@ -127,14 +97,7 @@ def consum(speeds,slopes,tiempos,hybrid_cont,distancia_km=None):
     
     # Cálculo de distancia si no se proporciona
     if distancia_km is None:
-        distancia_total = 0
-        for i in range(len(speeds)):
-            if i == 0:
-                delta_t = tiempos[0] if tiempos[0] > 0 else 1.0
-            else:
-                delta_t = max(tiempos[i] - tiempos[i-1], 0.1)
-            vel_ms = speeds[i] / 3.6
-            distancia_total += vel_ms * delta_t
+        distancia_total = float(np.sum(np.asarray(speeds, dtype=float) / 3.6 * pasos_tiempo(tiempos)))
         distancia_km = distancia_total / 1000
     
     # Cálculo de emisiones de CO2 usando factor de emisión proporcionado (gCO₂/km)
@@ -173,55 +136,11 @@ def calcular_consumo_por_punto(speeds, slopes, tiempos, hybrid_cont):
                 rw = 0.3
         hev = DummyHEV()
 
-    consumo_por_punto = []
-    last_vel = 0
-    
-    for i in range(len(speeds)):
-        vel = speeds[i] / 3.6
-        theta = slopes[i] * math.pi / 180
-        faero = 0.5 * hev.Ambient.rho * hev.Chassis.a * hev.Chassis.cd * (vel ** 2)
-        froll = hev.Ambient.g * hev.Chassis.m * hev.Chassis.crr * np.cos(theta)
-        fg = hev.Ambient.g * hev.Chassis.m * np.sin(theta)
-        delta_v = vel - last_vel
-        f_inertia = hev.Chassis.m * delta_v / 1
-        fres = faero + froll + fg + f_inertia
-        p_e = vel * fres
-        p_m = (fres * hev.Wheel.rw) * (vel / hev.Wheel.rw)
-        p_eb = p_m * (1 - hybrid_cont) / 0.85
-        # Factor de corrección empírico (1.617) para ajustar a datos reales de telemetría
-        # Justificación: El modelo simplificado solo considera eficiencia del tren motriz (85%),
-        # pero no incluye pérdidas adicionales del sistema completo:
-        # - Pérdidas en cadena de conversión eléctrica (inversor, controlador, BMS): ~15-20%
-        # - Pérdidas por calentamiento (resistencia interna, cables, histéresis): ~5-10%
-        # - Pérdidas mecánicas adicionales (rodamientos, transmisión, frenos): ~5-9%
-        # - Consumo de sistemas auxiliares (electrónica, ventilación): ~2-5%
-        # Relación matemática: Pérdidas adicionales = (Factor - 1) / Factor
-        # Pérdidas adicionales = (1.617 - 1) / 1.617 = 38.14%
-        # Eficiencia real del sistema = 85% / 1.617 = 52.58%
-        # Validación: Calculado a partir de 1708 puntos de telemetría real
-        # (Potencia real: 268.68 kW / Potencia modelo: 166.21 kW = 1.617)
-        factor_correccion = 1.617
-        p_eb = p_eb * factor_correccion
-        p_cn = p_m * (hybrid_cont) / 0.2
-        factor_correccion_combustion = 1.8
-        p_cn = p_cn * factor_correccion_combustion
-        if p_cn <= 0:
-            p_cn = 0
-
-        last_vel = vel
-        
-        if i == 0:
-            delta_t = tiempos[0] if tiempos[0] > 0 else 1.0
-        else:
-            delta_t = max(tiempos[i] - tiempos[i-1], 0.1)
-        
-        tiempo_horas = delta_t / 3600
-        if p_eb < 0:
-            p_eb = 0
-        consumo_kwh = (p_eb / 1000) * tiempo_horas
-        consumo_por_punto.append(consumo_kwh)
-    
-    return consumo_por_punto
+    # Mismas potencias que consum (factor de corrección 1.617, ver arriba)
+    spec = VehicleSpec.desde_hev(hev, factor_correccion_cn=1.8, **CALIBRACION_TELEMETRIA)
+    p_eb, _ = potencias_kmh(speeds, slopes, hybrid_cont, spec)
+    consumo_por_punto = (p_eb / 1000) * (pasos_tiempo(tiempos) / 3600)
+    return consumo_por_punto.tolist()
 
 def calcular_potencia_por_punto(speeds, slopes, hybrid_cont):
     try:
@@ -244,48 +163,9 @@ def calcular_potencia_por_punto(speeds, slopes, hybrid_cont):
                 rw = 0.3
         hev = DummyHEV()
 
-    potencia_por_punto = []
-    last_vel = 0
-    
-    for i in range(len(speeds)):
-        vel = speeds[i] / 3.6
-        theta = slopes[i] * math.pi / 180
-        faero = 0.5 * hev.Ambient.rho * hev.Chassis.a * hev.Chassis.cd * (vel ** 2)
-        froll = hev.Ambient.g * hev.Chassis.m * hev.Chassis.crr * np.cos(theta)
-        fg = hev.Ambient.g * hev.Chassis.m * np.sin(theta)
-        delta_v = vel - last_vel
-        f_inertia = hev.Chassis.m * delta_v / 1
-        fres = faero + froll + fg + f_inertia
-        p_e = vel * fres
-        p_m = (fres * hev.Wheel.rw) * (vel / hev.Wheel.rw)
-        p_eb = p_m * (1 - hybrid_cont) / 0.85
-        # Factor de corrección empírico (1.617) para ajustar a datos reales de telemetría
-        # Justificación: El modelo simplificado solo considera eficiencia del tren motriz (85%),
-        # pero no incluye pérdidas adicionales del sistema completo:
-        # - Pérdidas en cadena de conversión eléctrica (inversor, controlador, BMS): ~15-20%
-        # - Pérdidas por calentamiento (resistencia interna, cables, histéresis): ~5-10%
-        # - Pérdidas mecánicas adicionales (rodamientos, transmisión, frenos): ~5-9%
-        # - Consumo de sistemas auxiliares (electrónica, ventilación): ~2-5%
-        # Relación matemática: Pérdidas adicionales = (Factor - 1) / Factor
-        # Pérdidas adicionales = (1.617 - 1) / 1.617 = 38.14%
-        # Eficiencia real del sistema = 85% / 1.617 = 52.58%
-        # Validación: Calculado a partir de 1708 puntos de telemetría real
-        # (Potencia real: 268.68 kW / Potencia modelo: 166.21 kW = 1.617)
-        factor_correccion = 1.617
-        p_eb = p_eb * factor_correccion
-        if p_eb < 0:
-            p_eb = 0
-        p_cn = p_m * (hybrid_cont) / 0.2
-        factor_correccion_combustion = 1.8
-        p_cn = p_cn * factor_correccion_combustion
-        if p_cn <= 0:
-            p_cn = 0
-
-        last_vel = vel
-        potencia_kw = p_eb / 1000
-        potencia_por_punto.append(potencia_kw)
-    
-    return potencia_por_punto
+    spec = VehicleSpec.desde_hev(hev, factor_correccion_cn=1.8, **CALIBRACION_TELEMETRIA)
+    p_eb, _ = potencias_kmh(speeds, slopes, hybrid_cont, spec)
+    return (p_eb / 1000).tolist()
 
 def graficar_descenso_bateria(tiempos, consumo_por_punto, capacidad_bateria=2.5, nombre_archivo='descenso_bateria.png'):
     consumo_acumulado = np.cumsum(consumo_por_punto)
@@ -6,6 +6,8 @@ from geopy.distance import geodesic
 from scipy.optimize import minimize
 import folium
 
+from HybridBikeConsumptionModel.particle_kernel import VehicleSpec, pasos_tiempo, potencias_kmh
+
 # Paleta de colores EAFIT
 COLOR_AZUL = (0/255, 75/255, 133/255)  # EAFIT Blue RGB(0, 75, 133)
 COLOR_AMARILLO = (255/255, 200/255, 0/255)  # Amarillo complementario
@@ -125,71 +127,26 @@ def calcular_potencia_por_punto(speeds, slopes, hybrid_cont, params=None):
             'eficiencia_tren': 0.85
         }
     
-    rho = 1.225
-    g = 9.81
-    rw = 0.3
-    
-    potencia_por_punto = []
-    potencia_combustion_por_punto = []
-    last_vel = 0
-    
-    for i in range(len(speeds)):
-        vel = speeds[i] / 3.6
-        theta = slopes[i] * math.pi / 180
-        faero = 0.5 * rho * params['a'] * params['cd'] * (vel ** 2)
-        froll = g * params['m'] * params['crr'] * np.cos(theta)
-        fg = g * params['m'] * np.sin(theta)
-        delta_v = vel - last_vel
-        f_inertia = params['m'] * delta_v / 1
-        fres = faero + froll + fg + f_inertia
-        p_e = vel * fres
-        p_m = (fres * rw) * (vel / rw)
-        p_eb = p_m * (1 - hybrid_cont) / params['eficiencia_tren']
-        p_eb = p_eb * params['factor_correccion']
-        if p_eb < 0:
-            p_eb = 0
-        
-        # Potencia de combustión
-        p_cn = p_m * hybrid_cont / 0.2
-        #factor_correccion_combustion = 1.8
-        #p_cn = p_cn * factor_correccion_combustion
-        if p_cn <= 0:
-            p_cn = 0
-
-        last_vel = vel
-        potencia_kw = p_eb / 1000
-        potencia_por_punto.append(potencia_kw)
-        potencia_combustion_por_punto.append(p_cn / 1000)
-    
-    return potencia_por_punto, potencia_combustion_por_punto
+    spec = VehicleSpec(
+        m=params['m'], a=params['a'], cd=params['cd'], crr=params['crr'],
+        eficiencia_tren=params['eficiencia_tren'],
+        factor_correccion=params['factor_correccion'],
+    )
+    p_eb, p_cn = potencias_kmh(speeds, slopes, hybrid_cont, spec)
+    return (p_eb / 1000).tolist(), (p_cn / 1000).tolist()
 
 def calcular_consumo_y_emisiones(potencia_electrica_w, potencia_combustion_kw, tiempos, speeds):
     """
     Calcula el consumo total y las emisiones equivalentes de ciclo de vida
     """
     # Calcular consumo eléctrico total (kWh)
-    consumo_electrico_total = 0
-    consumo_combustion_total = 0
-    
-    for i in range(len(potencia_electrica_w)):
-        if i == 0:
-            delta_t = tiempos[0] if tiempos[0] > 0 else 1.0
-        else:
-            delta_t = max(tiempos[i] - tiempos[i-1], 0.1)
-        
-        tiempo_horas = delta_t / 3600
-        consumo_electrico_total += (potencia_electrica_w[i] / 1000) * tiempo_horas
-        consumo_combustion_total += potencia_combustion_kw[i] * tiempo_horas
+    delta_t = pasos_tiempo(tiempos)
+    tiempo_horas = delta_t / 3600
+    consumo_electrico_total = float(np.sum((np.asarray(potencia_electrica_w, dtype=float) / 1000) * tiempo_horas))
+    consumo_combustion_total = float(np.sum(np.asarray(potencia_combustion_kw, dtype=float) * tiempo_horas))
     
     # Calcular distancia total (km)
-    distancia_total = 0
-    for i in range(len(speeds)):
-        if i == 0:
-            delta_t = tiempos[0] if tiempos[0] > 0 else 1.0
-        else:
-            delta_t = max(tiempos[i] - tiempos[i-1], 0.1)
-        vel_ms = speeds[i] / 3.6
-        distancia_total += vel_ms * delta_t
+    distancia_total = float(np.sum(np.asarray(speeds, dtype=float) / 3.6 * delta_t))
     distancia_km = distancia_total / 1000
     
     # Factores de emisión equivalentes de ciclo de vida (gCO₂/km)
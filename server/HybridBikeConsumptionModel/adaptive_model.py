@@ -0,0 +1,501 @@
+"""
+Integración de paso adaptativo (Dormand–Prince RK45) del modelo de bike_model.
+
+bike_model integra con dt = 0.01 fijo: 100 pasos RK4 por segundo de viaje
+aunque la moto vaya en crucero. Aquí se integra con control de error una
+versión continua del mismo modelo cuya energía coincide con la de
+bike_model dentro de tol. Los tramos de integración cortan en cada punto
+del perfil (uno por segundo), donde la referencia de velocidad/pendiente
+cambia de pendiente. El paso lo limita el convertidor buck (un LC de
+~13 rad/s): unos 5 pasos por segundo en lugar de 100, y en un trayecto con
+cruceros y paradas unas 20 veces menos pasos.
+
+El modelo continuo es el límite del de paso fijo cuando dt -> 0:
+  - el error integral del controlador es un estado más (en lugar de
+    acumular error * dt por paso),
+  - la inercia m * (v - last_vel) / dt no desaparece al achicar dt: en
+    cada etapa RK4 vale m * (a + c_s * k_{s-1}), con a la aceleración del
+    paso anterior. Resolviendo las cuatro etapas con aceleración estable
+    la moto acelera con fuerza * LAM / mhev y en fres la inercia pesa
+    K_E * m * dv/dt (_coeficientes).
+
+Con eso la energía de bike_model es E(dt) ≈ E0 + c * dt: entre 1e-4 y 2e-3
+relativo por encima del límite continuo E0 con dt = 0.01, más que
+cualquier tolerancia razonable. Por eso se integra la ecuación modificada:
+el modelo continuo más su término de orden dt, que reproduce el esquema de
+bike_model hasta O(dt²):
+  - el controlador mide v al inicio del paso (v - dt * a / 2), la
+    referencia al final (vreq + dt * vreq' / 2) y acumula el error con los
+    extremos del paso (cumerror + dt * vreq - dt * vreq(0) / 2),
+  - las etapas RK4 evalúan fuerzas con otra velocidad (y otro wice en la
+    híbrida) que la del centro del paso,
+  - last_vel es la aceleración del paso anterior, con retraso dt.
+Los cambios de marcha no son continuos: bike_model elige la marcha con v
+al inicio de cada paso, así que cambia justo en un punto de la grilla de
+dt y la inercia tarda unos pasos en pasar a la nueva aceleración. Aquí
+son eventos en ese mismo punto de la grilla, con el salto que deja ese
+transitorio (y el del arranque, con last_vel = 0).
+
+La diferencia que queda con bike_model es O(dt²), alrededor de 1e-5
+relativo en los perfiles de benchmark.py; por encima de TOL_MIN la
+tolerancia de cada paso acota la diferencia de energía. Con tol < TOL_MIN
+se integra con paso fijo (fast_model), igual que cuando la moto queda
+frenada en una bajada: el freno solo actúa con v >= 0, así que bike_model
+oscila alrededor de v = 0 con una velocidad media de orden dt que el
+modelo continuo no tiene. error_energia mide la diferencia para un perfil
+dado.
+
+Uso:
+    from HybridBikeConsumptionModel.adaptive_model import bike_model_adaptive
+    energia_wh, segundos = bike_model_adaptive(init_soc, hybrid_cont, speeds, slopes, tol=1e-3)
+"""
+import math
+
+import numpy as np
+
+from HybridBikeConsumptionModel.fast_model import (
+    DT, P_C_AERO, P_C_R1, P_CN, P_CP, P_CP_RP, P_CRR, P_F_SFT, P_G_M, P_HU_NU,
+    P_JE, P_KIT, P_KIW, P_LA, P_LP, P_M, P_M_CARB, P_MF_MIN, P_N, P_Q, P_R0,
+    P_R1, P_RA, P_RW, bike_model_fast, cargar_parametros, estado_inicial,
+)
+
+# Estado: los 9 de bike_model + error integral del controlador
+N_ESTADOS = 10
+
+# Tolerancia relativa más fina que se resuelve con paso adaptativo: debajo
+# de ella manda la diferencia O(dt²) con bike_model
+TOL_MIN = 1e-4
+
+# Tolerancia absoluta por estado, en sus unidades: v [m/s], posición [m],
+# corrientes [A], voltaje [V], SOC, wice [rad/s], energía [J], error
+# integral [m]. Sin ella, las corrientes del buck cerca de 0 (frenando)
+# exigen pasos diminutos para un error que no cambia la energía.
+ATOL = np.array([1e-4, 1e-2, 1e-3, 1e-3, 1e-3, 1e-8, 1e-3, 1e-3, 1e-1, 1e-4])
+
+# Tablero de Dormand–Prince 5(4)
+C = (0.0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1.0, 1.0)
+A = [np.array(fila) for fila in (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)]
+# Diferencia entre los pesos de orden 5 y de orden 4 (estimación del error)
+E = np.array([
+    71 / 57600, 0.0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40,
+])
+
+# Control PI del paso (Hairer, DOPRI5): h *= SEGURIDAD * err^-EXP_1 * err_previo^BETA
+SEGURIDAD = 0.9
+BETA = 0.04
+EXP_1 = 0.2 - 0.75 * BETA
+
+# Pesos y nodos del RK4 de bike_model
+B_RK4 = (1 / 6, 1 / 3, 1 / 3, 1 / 6)
+C_RK4 = (0.0, 0.5, 0.5, 1.0)
+
+
+class _FrenadaEnBajada(Exception):
+    """La moto volvió a avanzar con el freno pedido (ver el docstring del módulo)."""
+
+
+def _inercias(q, a_previa, fuerzas):
+    """
+    Aceleración de inercia (v - last_vel) / dt de cada etapa RK4 de
+    bike_model, con a_previa la del paso anterior y fuerzas / mhev sin la
+    inercia en cada etapa.
+    """
+    i1 = a_previa
+    i2 = a_previa + (fuerzas[0] - q * i1) / 2
+    i3 = a_previa + (fuerzas[1] - q * i2) / 2
+    i4 = a_previa + (fuerzas[2] - q * i3)
+    return (i1, i2, i3, i4)
+
+
+def _coeficientes(q):
+    """
+    Coeficientes del esquema de bike_model para una marcha (q = m / mhev),
+    en el orden en que los desempaca _derivada.
+
+    La inercia media del paso (pesos B_RK4) es alpha * a_previa +
+    sum(gammas * fuerzas): la aceleración estable es LAM * fuerza / mhev y
+    la inercia media K_E veces la aceleración. El resto son los pesos de
+    los términos de orden dt.
+    """
+    def media(valores):
+        return sum(b * x for b, x in zip(B_RK4, valores))
+
+    alpha = media(_inercias(q, 1.0, (0.0, 0.0, 0.0, 0.0)))
+    gammas = [media(_inercias(q, 0.0, tuple(float(j == s) for j in range(4)))) for s in range(4)]
+    gamma = sum(gammas)
+    lam = (1 - q * gamma) / (1 + q * alpha)
+    # Inercia de cada etapa relativa a la aceleración estable
+    rho = [i / lam for i in _inercias(q, lam, (1.0, 1.0, 1.0, 1.0))]
+    k_e = media(rho)
+    # Desvío de wice en cada etapa (por la inercia en tload) relativo a a * dt
+    sigma = (0.0, rho[0] / 2, rho[1] / 2, rho[2])
+    g_c = sum(g * c for g, c in zip(gammas, C_RK4))
+    g_rho = sum(g * (r - 1) for g, r in zip(gammas, rho))
+    g_sigma = sum(g * s for g, s in zip(gammas, sigma))
+    c_ws = media(sigma) - k_e / 2
+    return (
+        lam, alpha, gamma, k_e,
+        g_rho - gamma / 2 - gamma * (k_e - 1.5),
+        g_c - gamma / 2,
+        media([r * (r - 1) for r in rho]) - k_e / 2,
+        c_ws,
+        g_sigma - k_e * g_c - gamma * c_ws,
+    )
+
+
+def _marcha(vhev, hybrid_cont):
+    """gamma de bike_model para la velocidad al inicio del paso."""
+    if hybrid_cont == 0 or vhev >= 41 / 3.6:
+        return 5
+    if vhev < 10 / 3.6:
+        return 1
+    if vhev < 15 / 3.6:
+        return 2
+    if vhev < 25 / 3.6:
+        return 3
+    return 4
+
+
+def _fuerza(vhev, v_control, cumerror, vreq, theta, wice, im, hybrid_cont, beta_t, p, gear):
+    """
+    Controlador PI + fuerzas de functions.model sin la inercia. v_control
+    es la velocidad que mide el controlador. Devuelve (fuerza, fres0, tem,
+    tice_comb, fbrake, delta_t, mf_dot, ycontrol sin saturar).
+    """
+    # Controlador (mismas ganancias que bike_model)
+    error = vreq - v_control
+    ycontrol = 0.05 * vreq / 100 + 15 * error / 100 + 1.5 * cumerror / 100
+    u = min(max(ycontrol, -1.0), 1.0)
+    if u >= 0:
+        alpha_t = hybrid_cont * u
+        delta_t = (1 - hybrid_cont) * u
+        brake = 0.0
+    else:
+        alpha_t = delta_t = 0.0
+        brake = -u
+
+    rw = p[P_RW]
+    fres0 = (p[P_C_AERO] * vhev ** 2 + p[P_G_M] * p[P_CRR] * math.cos(theta)
+             + p[P_G_M] * math.sin(theta))
+    tem = im * p[P_KIT]
+    mf_dot = p[P_MF_MIN] + alpha_t * p[P_M_CARB]
+    tice_comb = 0.0 if wice == 0 else p[P_HU_NU] * mf_dot / wice
+    fbrake = 0.0 if vhev < 0 else brake * p[P_CN]
+
+    fuerza = tem / rw + fbrake - fres0
+    if beta_t != 0:
+        fuerza += (tice_comb - p[P_F_SFT] * wice) * gear / rw
+    return fuerza, fres0, tem, tice_comb, fbrake, delta_t, mf_dot, ycontrol
+
+
+def _derivada(y, vreq, dvreq, theta, dtheta, vreq0, hybrid_cont, beta_t, p, gear, coef):
+    """
+    Ecuación modificada: controlador PI + functions.model con la inercia y
+    los términos de orden DT del esquema de bike_model. dvreq y dtheta son
+    las derivadas de la referencia y vreq0 la referencia en t = 0.
+    """
+    # Floats de Python: la aritmética escalar es varias veces más rápida
+    # que con escalares de numpy
+    vhev, _, iind, im, um, _, wice, i_r1, _, cumerror = y.tolist()
+    lam, alpha, gamma, k_e, c_v, c_o, c_e, c_ws, c_wp = coef
+    h = DT
+
+    rw = p[P_RW]
+    m = p[P_M]
+    je = p[P_JE]
+    mhev = m + je * (gear ** 2 / rw ** 2)
+    q = m / mhev
+
+    # Aceleración del modelo continuo, para los términos de orden DT
+    a = lam * _fuerza(vhev, vhev, cumerror, vreq, theta, wice, im,
+                      hybrid_cont, beta_t, p, gear)[0] / mhev
+
+    # Velocidad (y wice) de las etapas y controlador muestreado en el paso
+    v_etapa = vhev + h * (k_e - 1.5) * a
+    phi_w = -m * rw / (gear * je)
+    w_etapa = wice + h * phi_w * a * c_ws if beta_t != 0 else wice
+    fuerza, fres0, tem, tice_comb, fbrake, delta_t, mf_dot, ycontrol = _fuerza(
+        v_etapa, vhev - h * a / 2, cumerror + h * vreq - h * vreq0 / 2,
+        vreq + h * dvreq / 2, theta + h * dtheta / 2, w_etapa, im,
+        hybrid_cont, beta_t, p, gear,
+    )
+
+    ib = im * delta_t
+    ub = 74.0 - p[P_R1] * i_r1 - p[P_R0] * ib
+    im_dot = -um / p[P_LP] + (ub / p[P_LP]) * delta_t
+    if beta_t == 0:
+        wice_dot = (tice_comb - p[P_F_SFT] * w_etapa) / je
+    else:
+        wice_dot = (tice_comb + (tem - (fres0 + k_e * m * a) * rw + fbrake * rw) / gear
+                    - p[P_F_SFT] * w_etapa) / je
+
+    # Derivadas de la fuerza: por v, por los demás estados y en el tiempo
+    df_v = -2 * p[P_C_AERO] * vhev / mhev
+    df_w = 0.0
+    if beta_t != 0:
+        df_w = -p[P_F_SFT] if w_etapa == 0 else -p[P_HU_NU] * mf_dot / w_etapa ** 2 - p[P_F_SFT]
+        df_w *= gear / rw / mhev
+    df_estados = p[P_KIT] / rw * im_dot / mhev + df_w * wice_dot
+    dycontrol = 0.0
+    if abs(ycontrol) <= 1:
+        dycontrol = (0.05 * dvreq + 15 * (dvreq - a) + 1.5 * (vreq - vhev)) / 100
+    df_t = (df_v * a + df_estados
+            - p[P_G_M] * (math.cos(theta) - p[P_CRR] * math.sin(theta)) * dtheta / mhev)
+    if ycontrol < 0 and v_etapa >= 0:
+        df_t -= p[P_CN] * dycontrol / mhev
+    elif ycontrol >= 0 and beta_t != 0 and w_etapa != 0:
+        df_t += gear / rw * p[P_HU_NU] * hybrid_cont * p[P_M_CARB] * dycontrol / w_etapa / mhev
+    da = lam * df_t
+
+    # Aceleración del paso e inercia media de sus etapas, con last_vel
+    # una aceleración atrás (a - dt * da)
+    orden_1 = df_v * a * c_v + df_estados * c_o + df_w * phi_w * a * c_wp
+    vhev_dot = ((1 - q * gamma) * fuerza / mhev + h * q * (alpha * da - orden_1)) / (1 + q * alpha)
+    inercia = alpha * (vhev_dot - h * da) + gamma * fuerza / mhev + h * orden_1
+    fres = fres0 + m * inercia
+
+    if beta_t == 0:
+        ttot = tice_comb - p[P_F_SFT] * w_etapa
+    else:
+        ttot = (tice_comb + (tem - fres * rw + fbrake * rw) / gear
+                - p[P_F_SFT] * w_etapa)
+
+    return np.array([
+        vhev_dot,
+        v_etapa,
+        (um - p[P_RA] * iind - v_etapa / rw * p[P_KIW]) / p[P_LA],
+        im_dot,
+        im / p[P_CP] - um / p[P_CP_RP],
+        -p[P_N] * im * abs(delta_t) / p[P_Q],
+        ttot / je,
+        -p[P_C_R1] * i_r1 + p[P_C_R1] * ib,
+        (fres0 * v_etapa + m * vhev * inercia + m * h * c_e * a * a) * (1 - hybrid_cont) / 0.7,
+        vreq - vhev,
+    ])
+
+
+def _salto_inercia(y, a_previa, a_nueva, gear, coef, hybrid_cont, beta_t, p):
+    """
+    Estado después del transitorio de la inercia de bike_model cuando la
+    aceleración estable pasa de a_previa a a_nueva en un punto de la
+    grilla (arranque o cambio de marcha). La diferencia decae como
+    (-q * alpha)^n; su suma deja un salto de orden DT en v, wice y energía.
+    """
+    _, alpha, _, _, _, _, _, _, _ = coef
+    m = p[P_M]
+    q = m / (m + p[P_JE] * (gear ** 2 / p[P_RW] ** 2))
+    salto = DT * alpha * (a_previa - a_nueva) / (1 + q * alpha)
+    y = y.copy()
+    y[0] -= q * salto
+    y[8] += m * y[0] * salto * (1 - hybrid_cont) / 0.7
+    if beta_t != 0:
+        y[6] -= m * p[P_RW] / (gear * p[P_JE]) * salto
+    return y
+
+
+def _hermite(tau, h, y0, y1, d0, d1):
+    """Interpolación cúbica en tau in [0, h] con valores y derivadas en los extremos."""
+    s = tau / h
+    return ((2 * s ** 3 - 3 * s ** 2 + 1) * y0 + (s ** 3 - 2 * s ** 2 + s) * h * d0
+            + (3 * s ** 2 - 2 * s ** 3) * y1 + (s ** 3 - s ** 2) * h * d1)
+
+
+def _tramo(y, h, err_previo, gamma, cambio, t0, t1, ref0, ref1, modelo, tol, atol, h_min, h_max):
+    """
+    Integra y de t0 a t1 con la referencia lineal entre ref0 y ref1, en la
+    marcha gamma. cambio es el punto de la grilla de dt con un cambio de
+    marcha pendiente (o None). Devuelve (y, h propuesto, error del último
+    paso aceptado, gamma, cambio, pasos aceptados, rechazados).
+    """
+    hybrid_cont, beta_t, p, marchas, coefs, vreq0 = modelo
+    largo = t1 - t0
+    pendiente_v = (ref1[0] - ref0[0]) / largo
+    pendiente_s = (ref1[1] - ref0[1]) / largo
+
+    def f(t, y, gamma):
+        tau = t - t0
+        return _derivada(y, ref0[0] + pendiente_v * tau, pendiente_v,
+                         ref0[1] + pendiente_s * tau, pendiente_s, vreq0,
+                         hybrid_cont, beta_t, p, marchas[gamma], coefs[gamma])
+
+    t = t0
+    k = np.empty((7, N_ESTADOS))
+    # La referencia cambia de pendiente en t0: la derivada no es la del final del tramo anterior
+    k[0] = f(t, y, gamma)
+    aceptados = rechazados = 0
+    rechazo_previo = False
+    while t < t1 - 1e-12:
+        fin = t1 if cambio is None or cambio > t1 else cambio
+        h = min(max(h, h_min), h_max)
+        ultimo = t + h >= fin - 1e-12
+        if ultimo:
+            h = fin - t
+
+        for s in range(1, 7):
+            k[s] = f(t + C[s] * h, y + h * A[s].dot(k[:s]), gamma)
+        y_nuevo = y + h * A[6].dot(k[:6])
+        # FSAL: la última etapa es la derivada en el punto nuevo
+        k[6] = f(t + h, y_nuevo, gamma)
+
+        escala = atol + tol * np.maximum(np.abs(y), np.abs(y_nuevo))
+        relativo = h * E.dot(k) / escala
+        error = math.sqrt(relativo.dot(relativo) / N_ESTADOS)
+
+        if error <= 1.0 or h <= h_min:
+            t_nuevo = fin if ultimo else t + h
+            if y[0] < 0 <= y_nuevo[0]:
+                tau = t_nuevo - t0
+                ycontrol = _fuerza(y_nuevo[0], y_nuevo[0], y_nuevo[9], ref0[0] + pendiente_v * tau,
+                                   ref0[1] + pendiente_s * tau, y_nuevo[6], y_nuevo[3],
+                                   hybrid_cont, beta_t, p, marchas[gamma])[7]
+                if ycontrol < 0:
+                    raise _FrenadaEnBajada
+            if cambio is None and _marcha(y_nuevo[0], hybrid_cont) != gamma:
+                # bike_model cambia de marcha en el primer punto de la
+                # grilla con v del otro lado del umbral
+                j = math.floor(t / DT + 1e-9) + 1
+                while j * DT <= t_nuevo + 1e-9:
+                    v = _hermite(j * DT - t, h, y[0], y_nuevo[0], k[0, 0], k[6, 0])
+                    if _marcha(v, hybrid_cont) != gamma:
+                        break
+                    j += 1
+                cambio = j * DT
+                if cambio < t_nuevo - 1e-9:
+                    # Se repite el paso hasta el cambio
+                    rechazados += 1
+                    h = cambio - t
+                    continue
+
+            t = t_nuevo
+            y = y_nuevo
+            k[0] = k[6]
+            aceptados += 1
+            factor = 5.0 if error == 0 else SEGURIDAD * error ** -EXP_1 * err_previo ** BETA
+            factor = min(5.0, max(0.2, factor))
+            if rechazo_previo:
+                # Justo después de un rechazo no se agranda el paso
+                factor = min(1.0, factor)
+            err_previo = max(error, 1e-4)
+            rechazo_previo = False
+
+            if cambio is not None and abs(t - cambio) < 1e-9:
+                nueva = _marcha(y[0], hybrid_cont)
+                if nueva != gamma:
+                    k_nueva = f(t, y, nueva)
+                    y = _salto_inercia(y, k[0, 0], k_nueva[0], marchas[nueva], coefs[nueva],
+                                       hybrid_cont, beta_t, p)
+                    gamma = nueva
+                    k[0] = f(t, y, gamma)
+                cambio = None
+        else:
+            rechazados += 1
+            factor = max(0.2, SEGURIDAD * error ** -EXP_1)
+            rechazo_previo = True
+        h = h * factor
+    return y, h, err_previo, gamma, cambio, aceptados, rechazados
+
+
+def bike_model_adaptive(init_soc, hybrid_cont, speeds, slopes, tol=1e-3, atol=ATOL,
+                        h_min=DT, h_max=1.0, stats=False):
+    """
+    Modelo de bike_model con paso adaptativo: devuelve (energía eléctrica
+    [Wh], duración [s]), con la energía dentro de tol (relativa) de la de
+    bike_model (ver el docstring del módulo y error_energia).
+
+    tol también es la tolerancia relativa del error local de cada paso y
+    atol la absoluta, por estado. h_min es el paso más fino permitido (el
+    dt de bike_model), donde el error se acepta aunque supere la
+    tolerancia, por ejemplo con la moto detenida, donde el freno y la
+    rodadura cambian de signo alrededor de v = 0. Con tol < TOL_MIN, o si
+    la moto queda frenada en una bajada, se integra con paso fijo
+    (bike_model_fast). Con stats=True se agrega un dict con los pasos
+    aceptados y rechazados.
+    """
+    if tol < TOL_MIN:
+        return _paso_fijo(init_soc, hybrid_cont, speeds, slopes, stats)
+
+    p, marchas = cargar_parametros(hybrid_cont)
+    p, marchas = p.tolist(), marchas.tolist()
+    beta_t = 0 if hybrid_cont == 0 else 1
+    hybrid_cont = float(hybrid_cont)
+    m, je, rw = p[P_M], p[P_JE], p[P_RW]
+    coefs = [_coeficientes(m / (m + je * (gear ** 2 / rw ** 2))) for gear in marchas]
+
+    v_ref = np.asarray(speeds, dtype=float) / 3.60
+    s_ref = np.asarray(slopes, dtype=float) * math.pi / 180
+    modelo = (hybrid_cont, beta_t, p, marchas, coefs, float(v_ref[0]))
+
+    # Mismo horizonte que bike_model: hasta el último instante de np.arange(0, tf, dt)
+    n_pasos = len(np.arange(0, len(speeds), DT))
+    t_fin = (n_pasos - 1) * DT
+
+    y = np.zeros(N_ESTADOS)
+    y[:9] = estado_inicial(float(init_soc))
+
+    # Puntos de quiebre de la referencia: cada segundo del perfil
+    quiebres = [float(t) for t in range(int(math.floor(t_fin)) + 1)]
+    if quiebres[-1] < t_fin:
+        quiebres.append(t_fin)
+
+    def referencia(t):
+        return (float(np.interp(t, np.arange(len(v_ref)), v_ref)),
+                float(np.interp(t, np.arange(len(s_ref)), s_ref)))
+
+    # Arranque: last_vel = 0, la inercia parte de aceleración 0
+    gamma = _marcha(y[0], hybrid_cont)
+    ref0 = referencia(0.0)
+    ref1 = referencia(min(1.0, t_fin))
+    pendientes = [(b - a) / min(1.0, t_fin) for a, b in zip(ref0, ref1)]
+    a0 = _derivada(y, ref0[0], pendientes[0], ref0[1], pendientes[1], modelo[5],
+                   hybrid_cont, beta_t, p, marchas[gamma], coefs[gamma])[0]
+    y = _salto_inercia(y, 0.0, a0, marchas[gamma], coefs[gamma], hybrid_cont, beta_t, p)
+
+    h = 0.01
+    err_previo = 1e-4
+    cambio = None
+    aceptados = rechazados = 0
+    try:
+        for t0, t1 in zip(quiebres[:-1], quiebres[1:]):
+            ref1 = referencia(t1)
+            y, h, err_previo, gamma, cambio, a, r = _tramo(
+                y, h, err_previo, gamma, cambio, t0, t1, ref0, ref1, modelo,
+                tol, atol, h_min, h_max,
+            )
+            aceptados += a
+            rechazados += r
+            ref0 = ref1
+    except _FrenadaEnBajada:
+        return _paso_fijo(init_soc, hybrid_cont, speeds, slopes, stats)
+
+    resultado = (y[8] / 3600, n_pasos / 100)
+    if stats:
+        return resultado + ({"aceptados": aceptados, "rechazados": rechazados},)
+    return resultado
+
+
+def _paso_fijo(init_soc, hybrid_cont, speeds, slopes, stats):
+    """bike_model con fast_model, con los pasos de dt como aceptados."""
+    resultado = bike_model_fast(init_soc, hybrid_cont, speeds, slopes)
+    if stats:
+        n_pasos = len(np.arange(0, len(speeds), DT))
+        return resultado + ({"aceptados": n_pasos - 1, "rechazados": 0},)
+    return resultado
+
+
+def error_energia(init_soc, hybrid_cont, speeds, slopes, **kwargs):
+    """
+    Error relativo de la energía de bike_model_adaptive (con kwargs) contra
+    la de paso fijo de bike_model, calculada con fast_model (mismo
+    resultado, más rápido).
+    """
+    referencia, _ = bike_model_fast(init_soc, hybrid_cont, speeds, slopes)
+    energia, _ = bike_model_adaptive(init_soc, hybrid_cont, speeds, slopes, **kwargs)
+    return abs(energia - referencia) / max(abs(referencia), 1e-12)
@@ -0,0 +1,98 @@
+"""
+Compara model.bike_model (RK4 original) contra fast_model.bike_model_fast
+y adaptive_model.bike_model_adaptive sobre un perfil sintético de
+velocidad/pendiente: una caminata aleatoria (--perfil aleatorio) o un
+trayecto de cruceros, rampas y paradas (--perfil trayecto).
+
+    cd server
+    python -m HybridBikeConsumptionModel.benchmark --segundos 600 --perfil trayecto
+"""
+import argparse
+import time
+
+import numpy as np
+
+from HybridBikeConsumptionModel.adaptive_model import bike_model_adaptive
+from HybridBikeConsumptionModel.fast_model import NUMBA_DISPONIBLE, bike_model_fast
+from HybridBikeConsumptionModel.model import bike_model
+
+
+def perfil_sintetico(segundos, seed=0):
+    """Velocidad [km/h] tipo ciclo urbano y pendiente [grados]."""
+    rng = np.random.default_rng(seed)
+    speeds = np.clip(np.cumsum(rng.normal(0, 2.5, segundos)) + 30, 0, 80)
+    slopes = np.clip(np.cumsum(rng.normal(0, 0.3, segundos)), -8, 8)
+    return speeds, slopes
+
+
+def perfil_trayecto(segundos, seed=0):
+    """
+    Velocidad [km/h] y pendiente [grados] de un trayecto urbano: cruceros
+    de 20 a 60 km/h y paradas, unidos por rampas de ~1.5 m/s², con la
+    pendiente constante en cada tramo.
+    """
+    rng = np.random.default_rng(seed)
+    speeds, slopes = [], []
+    actual = 0.0
+    while len(speeds) < segundos:
+        if rng.random() < 0.25:
+            objetivo, duracion = 0.0, int(rng.integers(10, 40))
+        else:
+            objetivo, duracion = float(rng.uniform(20, 60)), int(rng.integers(20, 90))
+        rampa = max(1, int(abs(objetivo - actual) / 5.4))
+        speeds += list(np.linspace(actual, objetivo, rampa + 1)[1:]) + [objetivo] * duracion
+        slopes += [float(rng.uniform(-4, 4))] * (rampa + duracion)
+        actual = objetivo
+    return np.array(speeds[:segundos]), np.array(slopes[:segundos])
+
+
+PERFILES = {"aleatorio": perfil_sintetico, "trayecto": perfil_trayecto}
+
+
+def cronometrar(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    resultado = fn(*args, **kwargs)
+    return resultado, time.perf_counter() - t0
+
+
+def main(segundos, hybrid_cont, init_soc, perfil="aleatorio"):
+    speeds, slopes = PERFILES[perfil](segundos)
+    print(f"Perfil {perfil} de {segundos} s ({segundos * 100} pasos RK4), hybrid_cont={hybrid_cont}")
+
+    (ref, _), t_ref = cronometrar(bike_model, init_soc, hybrid_cont, speeds, slopes)
+    print(f"  bike_model         {ref:14.6f} Wh  {t_ref:9.3f} s")
+
+    backends = ["python"] + (["numba"] if NUMBA_DISPONIBLE else [])
+    for backend in backends:
+        # La primera llamada con Numba incluye la compilación
+        bike_model_fast(init_soc, hybrid_cont, speeds[:2], slopes[:2], backend=backend)
+        (energia, _), t = cronometrar(
+            bike_model_fast, init_soc, hybrid_cont, speeds, slopes, backend=backend
+        )
+        error = abs(energia - ref) / max(abs(ref), 1e-12)
+        print(f"  fast[{backend:6s}]     {energia:14.6f} Wh  {t:9.3f} s"
+              f"  x{t_ref / t:7.1f}  error rel {error:.1e}")
+
+    # El error contra bike_model queda dentro de tol
+    for tol in (1e-2, 1e-3, 1e-4):
+        (energia, _, pasos), t = cronometrar(
+            bike_model_adaptive, init_soc, hybrid_cont, speeds, slopes,
+            tol=tol, stats=True,
+        )
+        error = abs(energia - ref) / max(abs(ref), 1e-12)
+        print(f"  rk45[tol={tol:.0e}]  {energia:14.6f} Wh  {t:9.3f} s"
+              f"  x{t_ref / t:7.1f}  error rel {error:.1e}"
+              f"  {pasos['aceptados']} pasos ({pasos['rechazados']} rechazados)")
+
+    if not NUMBA_DISPONIBLE:
+        print("  (numba no está instalado: pip install numba)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del integrador RK4 de bike_model")
+    parser.add_argument("--segundos", type=int, default=600)
+    parser.add_argument("--hybrid", type=float, default=0, help="hybrid_cont (0 = eléctrica)")
+    parser.add_argument("--soc", type=float, default=0.8)
+    parser.add_argument("--perfil", choices=sorted(PERFILES), default="aleatorio")
+    args = parser.parse_args()
+    main(args.segundos, args.hybrid, args.soc, args.perfil)
@@ -0,0 +1,480 @@
+"""
+Integrador RK4 optimizado para el modelo dinámico de model.bike_model.
+
+Reproduce el mismo modelo (functions.model) y el mismo controlador de
+velocidad, pero:
+  - los parámetros del HEV se resuelven una sola vez a escalares,
+  - los vectores de estado y las derivadas viven en buffers preasignados,
+  - el ciclo se compila con Numba si está instalado; si no, corre el
+    mismo código en Python sobre escalares float (sin arreglos de 9
+    elementos por llamada).
+
+Uso:
+    from HybridBikeConsumptionModel.fast_model import bike_model_fast
+    energia_wh, segundos = bike_model_fast(init_soc, hybrid_cont, speeds, slopes)
+
+Varias trayectorias a la vez (eléctrica vs. híbrida, barridos de init_soc):
+    energias, duraciones = bike_model_batch([0.8, 0.8], [0, 1], [speeds, speeds], [slopes, slopes])
+
+Comparación contra bike_model: python -m HybridBikeConsumptionModel.benchmark
+"""
+import math
+
+import numpy as np
+
+from HybridBikeConsumptionModel.functions import wmtc_profile
+
+try:
+    from numba import njit
+    NUMBA_DISPONIBLE = True
+except ImportError:
+    NUMBA_DISPONIBLE = False
+
+DT = 0.01
+
+# Posiciones en el vector de parámetros
+P_RW, P_KIW, P_KIT, P_RA, P_LA = 0, 1, 2, 3, 4
+P_C_AERO, P_G_M, P_CRR, P_M = 5, 6, 7, 8
+P_R0, P_R1, P_C_R1 = 9, 10, 11
+P_N, P_Q, P_LP, P_CP, P_CP_RP = 12, 13, 14, 15, 16
+P_MF_MIN, P_M_CARB, P_HU_NU, P_F_SFT, P_JE, P_CN = 17, 18, 19, 20, 21, 22
+N_PARAMS = 23
+
+# Relación de cada marcha (índice = gamma), incluida la cadena
+N_MARCHAS = 6
+
+
+def cargar_parametros(hybrid_cont):
+    """
+    Parámetros del HEV (eléctrico o híbrido) aplanados a un arreglo de
+    float64, con las mismas agrupaciones de operaciones que functions.model.
+    Devuelve (params, marchas).
+    """
+    if hybrid_cont == 0:
+        from HybridBikeConsumptionModel.parameters_electric import HEV
+    else:
+        from HybridBikeConsumptionModel.parameters_hybrid import HEV
+    hev = HEV()
+
+    p = np.zeros(N_PARAMS)
+    p[P_RW] = hev.Wheel.rw
+    p[P_KIW] = hev.EM.kiw
+    p[P_KIT] = hev.EM.kit
+    p[P_RA] = hev.EM.ra
+    p[P_LA] = hev.EM.la
+    p[P_C_AERO] = 0.5 * hev.Ambient.rho * hev.Chassis.a * hev.Chassis.cd
+    p[P_G_M] = hev.Ambient.g * hev.Chassis.m
+    p[P_CRR] = hev.Chassis.crr
+    p[P_M] = hev.Chassis.m
+    p[P_R0] = hev.Battery.r_0
+    p[P_R1] = hev.Battery.r_1
+    p[P_C_R1] = 1 / (hev.Battery.r_1 * hev.Battery.c_1)
+    p[P_N] = hev.Battery.n
+    p[P_Q] = hev.Battery.q * 3600
+    p[P_LP] = hev.Buck.lp
+    p[P_CP] = hev.Buck.cp
+    p[P_CP_RP] = hev.Buck.cp * hev.Buck.rp
+    p[P_MF_MIN] = hev.Carburator.mf_min
+    p[P_M_CARB] = 1 / hev.Carburator.m
+    p[P_HU_NU] = hev.Engine.hu * hev.Engine.nu
+    p[P_F_SFT] = hev.Engine.f_sft
+    p[P_JE] = hev.Engine.je
+    p[P_CN] = hev.Brake.cn
+
+    rc = hev.Chain.rc
+    r1 = hev.Trans.r1 * rc
+    # gamma fuera de 1..5 usa la primera marcha, como en functions.model
+    marchas = np.array([
+        r1, r1, hev.Trans.r2 * rc, hev.Trans.r3 * rc, hev.Trans.r4 * rc, hev.Trans.r5 * rc,
+    ])
+    return p, marchas
+
+
+# =================== NÚCLEO ===================
+def _derivada(x, k, alpha_t, gear, delta_t, theta, beta_t, brake, hybrid_cont, last_vel, dt, p):
+    """functions.model escrito sobre escalares; escribe la derivada en k."""
+    vhev = x[0]
+    iind = x[2]
+    im = x[3]
+    um = x[4]
+    wice = x[6]
+    i_r1 = x[7]
+
+    rw = p[P_RW]
+    m = p[P_M]
+
+    ui = vhev / rw * p[P_KIW]
+
+    faero = p[P_C_AERO] * (vhev ** 2)
+    froll = p[P_G_M] * p[P_CRR] * math.cos(theta)
+    fg = p[P_G_M] * math.sin(theta)
+    f_inertia = m * (vhev - last_vel) / dt
+    fres = faero + froll + fg + f_inertia
+
+    p_m = (fres * rw) * (vhev / rw)
+    p_eb = p_m * (1 - hybrid_cont) / 0.7
+
+    ib = im * delta_t
+    ub = 74.0 - p[P_R1] * i_r1 - p[P_R0] * ib
+
+    tem = im * p[P_KIT]
+
+    mf_dot = p[P_MF_MIN] + alpha_t * p[P_M_CARB]
+    if wice == 0:
+        tice_comb = 0.0
+    else:
+        tice_comb = p[P_HU_NU] * mf_dot / wice
+
+    tload = fres * rw
+    if vhev < 0:
+        fbrake = 0.0
+    else:
+        fbrake = brake * p[P_CN]
+
+    if beta_t == 0:
+        ttot = tice_comb - p[P_F_SFT] * wice
+        ftot = tem / rw + fbrake - fres
+    else:
+        ttot = (tice_comb + (1 / gear) * tem - (1 / gear) * tload
+                - p[P_F_SFT] * wice + (1 / gear) * fbrake * rw)
+        fice = (tice_comb - p[P_F_SFT] * wice) * gear / rw
+        ftot = fice + tem / rw + fbrake - fres
+
+    mhev = m + p[P_JE] * (gear ** 2 / rw ** 2)
+
+    k[0] = ftot / mhev
+    k[1] = vhev
+    k[2] = (um - p[P_RA] * iind - ui) / p[P_LA]
+    k[3] = -um / p[P_LP] + (ub / p[P_LP]) * delta_t
+    k[4] = (im / p[P_CP]) - um / p[P_CP_RP]
+    k[5] = -p[P_N] * im * abs(delta_t) / p[P_Q]
+    k[6] = (1 / p[P_JE]) * ttot
+    k[7] = -p[P_C_R1] * i_r1 + p[P_C_R1] * ib
+    k[8] = p_eb
+
+
+def _construir_kernel(derivada):
+    def integrar(x, k1, k2, k3, k4, tmp, v_profile, s_profile, hybrid_cont, beta_t, dt, p, marchas):
+        """
+        Integra el controlador + RK4 de bike_model sobre todo el perfil.
+        x entra con las condiciones iniciales y sale con el estado final;
+        k1..k4 y tmp son buffers del mismo tamaño que x.
+        """
+        n = len(x)
+
+        K_ff = 0.05
+        K_P = 15.0
+        K_i = 1.5
+        v_nom = 100.0
+
+        cumerror = 0.0
+        last_vel = 0.0
+        gamma = 1
+        h = dt
+
+        for i in range(1, len(v_profile)):
+            vreq = v_profile[i]
+            theta_i = s_profile[i]
+
+            error = vreq - x[0]
+            cumerror = cumerror + error * dt
+            ycontrol = K_ff * vreq / v_nom + K_P * error / v_nom + K_i * cumerror / v_nom + 0
+
+            if ycontrol > 1:
+                ycontrol = 1.0
+            elif ycontrol < -1:
+                ycontrol = -1.0
+
+            # Control híbrido: acelerador/ciclo de trabajo o freno
+            if ycontrol >= 0:
+                alpha_t = hybrid_cont * ycontrol
+                delta_t = (1 - hybrid_cont) * ycontrol
+            else:
+                alpha_t = 0.0
+                delta_t = 0.0
+            if ycontrol <= 0:
+                brake = -ycontrol
+            else:
+                brake = 0.0
+
+            v0 = x[0]
+            if hybrid_cont == 0:
+                gamma = 5
+            elif v0 < 10 / 3.6:
+                gamma = 1
+            elif v0 >= 10 / 3.6 and v0 < 15 / 3.6:
+                gamma = 2
+            elif v0 >= 15 / 3.6 and v0 < 25 / 3.6:
+                gamma = 3
+            elif v0 >= 25 / 3.6 and v0 < 41 / 3.6:
+                gamma = 4
+            elif v0 >= 41 / 3.6:
+                gamma = 5
+            gear = marchas[gamma]
+
+            derivada(x, k1, alpha_t, gear, delta_t, theta_i, beta_t, brake, hybrid_cont, last_vel, dt, p)
+            for j in range(n):
+                tmp[j] = x[j] + 0.5 * h * k1[j]
+            derivada(tmp, k2, alpha_t, gear, delta_t, theta_i, beta_t, brake, hybrid_cont, last_vel, dt, p)
+            for j in range(n):
+                tmp[j] = x[j] + 0.5 * h * k2[j]
+            derivada(tmp, k3, alpha_t, gear, delta_t, theta_i, beta_t, brake, hybrid_cont, last_vel, dt, p)
+            for j in range(n):
+                tmp[j] = x[j] + k3[j] * h
+            derivada(tmp, k4, alpha_t, gear, delta_t, theta_i, beta_t, brake, hybrid_cont, last_vel, dt, p)
+
+            last_vel = x[0]
+            for j in range(n):
+                x[j] = x[j] + (1 / 6) * (k1[j] + 2 * k2[j] + 2 * k3[j] + k4[j]) * h
+
+        return x
+
+    return integrar
+
+
+_kernels = {}
+
+
+def _kernel(backend):
+    if backend not in _kernels:
+        if backend == "numba":
+            derivada = njit(cache=True)(_derivada)
+            _kernels[backend] = njit(cache=True)(_construir_kernel(derivada))
+        else:
+            _kernels[backend] = _construir_kernel(_derivada)
+    return _kernels[backend]
+
+
+def _resolver_backend(backend):
+    if backend == "auto":
+        return "numba" if NUMBA_DISPONIBLE else "python"
+    if backend == "numba" and not NUMBA_DISPONIBLE:
+        raise ImportError("backend='numba' requiere el paquete numba")
+    if backend not in ("numba", "python"):
+        raise ValueError(f"Backend desconocido: {backend}")
+    return backend
+
+
+# =================== API ===================
+def estado_inicial(init_soc):
+    """Condiciones iniciales de bike_model (delta_t = 0, wice = 1000 RPM)."""
+    return np.array([0.0, 0.0, 0.0, 0.0, 0.0, init_soc, 1000 / 9.5493, 0.0, 0.0])
+
+
+def perfiles(speeds, slopes, dt=DT):
+    """Perfiles de velocidad (m/s) y pendiente (rad) remuestreados a dt."""
+    tf = len(speeds)
+    v_profile = wmtc_profile(dt, 0, tf, speeds) / 3.60
+    s_profile = wmtc_profile(dt, 0, tf, slopes) * math.pi / 180
+    return v_profile, s_profile
+
+
+def bike_model_fast(init_soc, hybrid_cont, speeds, slopes, backend="auto"):
+    """
+    Igual que model.bike_model: devuelve (energía eléctrica [Wh], duración [s]).
+    backend: "auto" (Numba si está instalado), "numba" o "python".
+    """
+    backend = _resolver_backend(backend)
+    kernel = _kernel(backend)
+    p, marchas = cargar_parametros(hybrid_cont)
+    v_profile, s_profile = perfiles(speeds, slopes)
+    beta_t = 0 if hybrid_cont == 0 else 1
+
+    x = estado_inicial(float(init_soc))
+    buffers = [np.empty(len(x)) for _ in range(5)]
+    if backend == "python":
+        # En Python puro indexar listas de float es mucho más barato que arreglos
+        x, p, marchas = x.tolist(), p.tolist(), marchas.tolist()
+        v_profile, s_profile = v_profile.tolist(), s_profile.tolist()
+        buffers = [b.tolist() for b in buffers]
+
+    x = kernel(
+        x, *buffers, v_profile, s_profile,
+        float(hybrid_cont), beta_t, DT, p, marchas,
+    )
+    return (x[8] / 3600, len(v_profile) / 100)
+
+
+# =================== LOTES ===================
+def _derivada_lote(x, k, alpha_t, gear, delta_t, theta, beta_t, brake, hybrid_cont, last_vel, dt, p):
+    """
+    _derivada para N trayectorias a la vez: x y k son (N, 9), p es
+    (N_PARAMS, N) y los controles son arreglos de tamaño N.
+    """
+    vhev = x[:, 0]
+    iind = x[:, 2]
+    im = x[:, 3]
+    um = x[:, 4]
+    wice = x[:, 6]
+    i_r1 = x[:, 7]
+
+    rw = p[P_RW]
+    m = p[P_M]
+
+    ui = vhev / rw * p[P_KIW]
+
+    faero = p[P_C_AERO] * (vhev ** 2)
+    froll = p[P_G_M] * p[P_CRR] * np.cos(theta)
+    fg = p[P_G_M] * np.sin(theta)
+    f_inertia = m * (vhev - last_vel) / dt
+    fres = faero + froll + fg + f_inertia
+
+    p_m = (fres * rw) * (vhev / rw)
+    p_eb = p_m * (1 - hybrid_cont) / 0.7
+
+    ib = im * delta_t
+    ub = 74.0 - p[P_R1] * i_r1 - p[P_R0] * ib
+
+    tem = im * p[P_KIT]
+
+    mf_dot = p[P_MF_MIN] + alpha_t * p[P_M_CARB]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tice_comb = np.where(wice == 0, 0.0, p[P_HU_NU] * mf_dot / wice)
+
+    tload = fres * rw
+    fbrake = np.where(vhev < 0, 0.0, brake * p[P_CN])
+
+    libre = beta_t == 0
+    ttot = np.where(
+        libre,
+        tice_comb - p[P_F_SFT] * wice,
+        tice_comb + (1 / gear) * tem - (1 / gear) * tload
+        - p[P_F_SFT] * wice + (1 / gear) * fbrake * rw,
+    )
+    fice = (tice_comb - p[P_F_SFT] * wice) * gear / rw
+    ftot = np.where(libre, tem / rw + fbrake - fres, fice + tem / rw + fbrake - fres)
+
+    mhev = m + p[P_JE] * (gear ** 2 / rw ** 2)
+
+    k[:, 0] = ftot / mhev
+    k[:, 1] = vhev
+    k[:, 2] = (um - p[P_RA] * iind - ui) / p[P_LA]
+    k[:, 3] = -um / p[P_LP] + (ub / p[P_LP]) * delta_t
+    k[:, 4] = (im / p[P_CP]) - um / p[P_CP_RP]
+    k[:, 5] = -p[P_N] * im * np.abs(delta_t) / p[P_Q]
+    k[:, 6] = (1 / p[P_JE]) * ttot
+    k[:, 7] = -p[P_C_R1] * i_r1 + p[P_C_R1] * ib
+    k[:, 8] = p_eb
+
+
+def _integrar_lote(x, v_profile, s_profile, largos, hybrid_cont, beta_t, dt, p, marchas):
+    """
+    Controlador + RK4 de bike_model sobre N trayectorias con el estado
+    en un arreglo (N, 9). Cada trayectoria i avanza solo mientras el paso
+    sea menor que largos[i]; después su estado queda congelado.
+    """
+    N, n = x.shape
+    k1, k2, k3, k4 = (np.empty((N, n)) for _ in range(4))
+    tmp = np.empty((N, n))
+    h = dt
+
+    K_ff, K_P, K_i, v_nom = 0.05, 15.0, 1.5, 100.0
+    limites = np.array([10, 15, 25, 41]) / 3.6
+
+    cumerror = np.zeros(N)
+    last_vel = np.zeros(N)
+    gamma = np.ones(N, dtype=int)
+    filas = np.arange(N)
+
+    for i in range(1, v_profile.shape[1]):
+        activo = i < largos
+        vreq = v_profile[:, i]
+        theta_i = s_profile[:, i]
+
+        error = vreq - x[:, 0]
+        cumerror = np.where(activo, cumerror + error * dt, cumerror)
+        ycontrol = K_ff * vreq / v_nom + K_P * error / v_nom + K_i * cumerror / v_nom + 0
+        ycontrol = np.clip(ycontrol, -1.0, 1.0)
+
+        acelera = ycontrol >= 0
+        alpha_t = np.where(acelera, hybrid_cont * ycontrol, 0.0)
+        delta_t = np.where(acelera, (1 - hybrid_cont) * ycontrol, 0.0)
+        brake = np.where(ycontrol <= 0, -ycontrol, 0.0)
+
+        # Caja de cambios: la eléctrica siempre va en 5ta
+        v0 = x[:, 0]
+        gamma = np.where(
+            hybrid_cont == 0, 5,
+            np.where(np.isnan(v0), gamma, np.searchsorted(limites, v0, side="right") + 1),
+        )
+        gear = marchas[filas, gamma]
+
+        args = (alpha_t, gear, delta_t, theta_i, beta_t, brake, hybrid_cont, last_vel, dt, p)
+        _derivada_lote(x, k1, *args)
+        np.add(x, 0.5 * h * k1, out=tmp)
+        _derivada_lote(tmp, k2, *args)
+        np.add(x, 0.5 * h * k2, out=tmp)
+        _derivada_lote(tmp, k3, *args)
+        np.add(x, k3 * h, out=tmp)
+        _derivada_lote(tmp, k4, *args)
+
+        last_vel = np.where(activo, x[:, 0], last_vel)
+        x_nuevo = x + (1 / 6) * (k1 + 2 * k2 + 2 * k3 + k4) * h
+        x[activo] = x_nuevo[activo]
+
+    return x
+
+
+def _como_lote(valor, N):
+    return np.broadcast_to(np.asarray(valor, dtype=float), (N,)).copy()
+
+
+def bike_model_batch(init_soc, hybrid_cont, speeds, slopes, backend="auto"):
+    """
+    bike_model para N trayectorias simultáneas.
+
+    speeds y slopes son listas de N perfiles (pueden tener largos distintos);
+    init_soc e hybrid_cont pueden ser escalares o arreglos de tamaño N, así
+    que sirve tanto para comparar eléctrica vs. combustión sobre la misma
+    ruta como para barrer init_soc.
+
+    Devuelve (energía [Wh], duración [s]) como arreglos de tamaño N.
+    backend: "numpy" integra el lote con el estado en un arreglo (N, 9);
+    "numba" corre el kernel compilado fila por fila sobre ese mismo
+    arreglo; "auto" elige Numba si está instalado.
+    """
+    N = len(speeds)
+    if len(slopes) != N:
+        raise ValueError("speeds y slopes deben tener el mismo número de perfiles")
+    if backend == "auto":
+        backend = "numba" if NUMBA_DISPONIBLE else "numpy"
+    elif backend not in ("numpy", "numba"):
+        raise ValueError(f"Backend desconocido: {backend}")
+
+    socs = _como_lote(init_soc, N)
+    hybrids = _como_lote(hybrid_cont, N)
+    beta = (hybrids != 0).astype(float)
+
+    # Los parámetros se cargan una vez por tipo de vehículo
+    cache = {}
+    p = np.empty((N_PARAMS, N))
+    marchas = np.empty((N, N_MARCHAS))
+    for i, h in enumerate(hybrids):
+        electrica = h == 0
+        if electrica not in cache:
+            cache[electrica] = cargar_parametros(h)
+        p[:, i], marchas[i] = cache[electrica]
+
+    perfiles_lote = [perfiles(s, t) for s, t in zip(speeds, slopes)]
+    largos = np.array([len(v) for v, _ in perfiles_lote])
+
+    x = np.stack([estado_inicial(s) for s in socs]) if N else np.empty((0, 9))
+    if backend == "numba":
+        kernel = _kernel(_resolver_backend("numba"))
+        buffers = [np.empty(x.shape[1]) for _ in range(5)]
+        for i, (v_profile, s_profile) in enumerate(perfiles_lote):
+            kernel(x[i], *buffers, v_profile, s_profile,
+                   hybrids[i], int(beta[i]), DT, np.ascontiguousarray(p[:, i]), marchas[i])
+    elif N:
+        largo_max = largos.max()
+        # Se rellena con el último valor para no propagar NaN en las filas ya terminadas
+        v_lote = np.empty((N, largo_max))
+        s_lote = np.empty((N, largo_max))
+        for i, (v_profile, s_profile) in enumerate(perfiles_lote):
+            v_lote[i, :len(v_profile)] = v_profile
+            v_lote[i, len(v_profile):] = v_profile[-1] if len(v_profile) else 0.0
+            s_lote[i, :len(s_profile)] = s_profile
+            s_lote[i, len(s_profile):] = s_profile[-1] if len(s_profile) else 0.0
+        _integrar_lote(x, v_lote, s_lote, largos, hybrids, beta, DT, p, marchas)
+
+    return x[:, 8] / 3600, largos / 100
@@ -1,6 +1,16 @@
 # ============ Main code ===========================
 # This code execute the dynamic model for HEM
-def bike_model(init_soc, hybrid_cont, speeds, slopes):
+def bike_model(init_soc, hybrid_cont, speeds, slopes, fast=False, adaptive=False, tol=1e-3):
+    # fast=True usa el integrador optimizado de fast_model (mismo resultado)
+    # adaptive=True integra con paso adaptativo RK45 (adaptive_model); la
+    # energía queda dentro de tol (relativa) de la de este modelo
+    if adaptive:
+        from HybridBikeConsumptionModel.adaptive_model import bike_model_adaptive
+        return bike_model_adaptive(init_soc, hybrid_cont, speeds, slopes, tol=tol)
+    if fast:
+        from HybridBikeConsumptionModel.fast_model import bike_model_fast
+        return bike_model_fast(init_soc, hybrid_cont, speeds, slopes)
+
     if hybrid_cont == 0:
         from HybridBikeConsumptionModel.parameters_electric import HEV
     else:
@@ -0,0 +1,138 @@
+"""
+Captura de peticiones para depuración.
+
+Guarda una fracción muestreada de las peticiones a /routes en
+<dir>/<timestamp>-<id>.json con la entrada, las respuestas de los
+upstreams (ORS, Azure, elevación) y la salida de cada vehículo. La
+escritura se hace en un hilo aparte, fuera del ciclo de la petición, y
+solo se conservan los últimos CAPTURE_MAX_FILES archivos.
+
+Se activa con CAPTURE_ENABLED=true o en caliente con PUT /capture.
+Las capturas se re-ejecutan sin red con replay.py.
+"""
+import asyncio
+import copy
+import json
+import os
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Set
+
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "resources/cache/captures")
+CAPTURE_ENABLED = os.getenv("CAPTURE_ENABLED", "false").lower() == "true"
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "1.0"))
+CAPTURE_MAX_FILES = int(os.getenv("CAPTURE_MAX_FILES", "200"))
+
+# Captura de la petición en curso; las tareas de cada vehículo la heredan
+_captura_actual: ContextVar[Optional["Captura"]] = ContextVar("captura_actual", default=None)
+
+
+class Captura:
+    """Datos de una petición capturada, acumulados mientras se atiende."""
+
+    def __init__(self, endpoint: str, entrada: Any):
+        ahora = time.time()
+        self.nombre = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(ahora))}-{uuid.uuid4().hex[:8]}"
+        self.datos: Dict[str, Any] = {
+            "id": self.nombre,
+            "endpoint": endpoint,
+            "timestamp": ahora,
+            "input": entrada,
+            "upstream": [],
+            "output": [],
+        }
+
+    def registrar_upstream(self, provider: str, key: str, respuesta: Any) -> None:
+        # Copia: el simulador puede modificar la respuesta después
+        self.datos["upstream"].append(
+            {"provider": provider, "key": key, "response": copy.deepcopy(respuesta)}
+        )
+
+    def registrar_salida(self, resultado: Dict[str, Any]) -> None:
+        self.datos["output"].append(resultado)
+
+
+class RequestCapture:
+    """Muestreo, activación en caliente y escritura con rotación de capturas."""
+
+    def __init__(
+        self,
+        directorio: str = CAPTURE_DIR,
+        enabled: bool = CAPTURE_ENABLED,
+        sample_rate: float = CAPTURE_SAMPLE_RATE,
+        max_files: int = CAPTURE_MAX_FILES,
+    ):
+        self.directorio = directorio
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self._pendientes: Set[asyncio.Task] = set()
+
+    def estado(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "max_files": self.max_files,
+            "dir": self.directorio,
+        }
+
+    def configurar(
+        self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None
+    ) -> Dict[str, Any]:
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        return self.estado()
+
+    def iniciar(self, endpoint: str, entrada: Any) -> Optional[Captura]:
+        """
+        Decide si la petición actual se captura. Si es así, la deja como
+        captura activa del contexto para que los upstreams se registren solos.
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        captura = Captura(endpoint, entrada)
+        _captura_actual.set(captura)
+        return captura
+
+    def terminar(self, captura: Optional[Captura]) -> None:
+        """Programa la escritura en disco sin bloquear la respuesta."""
+        if captura is None:
+            return
+        tarea = asyncio.ensure_future(asyncio.to_thread(self._escribir, captura))
+        self._pendientes.add(tarea)
+        tarea.add_done_callback(self._pendientes.discard)
+
+    def _escribir(self, captura: Captura) -> None:
+        ruta = os.path.join(self.directorio, f"{captura.nombre}.json")
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            tmp = f"{ruta}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(captura.datos, f)
+            os.replace(tmp, ruta)
+            self._rotar()
+        except OSError as e:
+            print("CAPTURE: no se pudo escribir en disco:", e)
+
+    def _rotar(self) -> None:
+        # Los nombres empiezan con el timestamp: orden alfabético = cronológico
+        archivos = sorted(n for n in os.listdir(self.directorio) if n.endswith(".json"))
+        for nombre in archivos[: max(len(archivos) - self.max_files, 0)]:
+            try:
+                os.remove(os.path.join(self.directorio, nombre))
+            except OSError:
+                pass
+
+
+def registrar_upstream(provider: str, key: str, respuesta: Any) -> None:
+    """Anota la respuesta de un upstream si la petición actual se está capturando."""
+    captura = _captura_actual.get()
+    if captura is not None:
+        captura.registrar_upstream(provider, key, respuesta)
+
+
+request_capture = RequestCapture()
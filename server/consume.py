@@ -1,87 +1,237 @@
+import asyncio
 from moto import Moto
 from utils import manage_segments
+from metrics import Acumulador, etapa
 from petitions import _fetch_ors_route, _fetch_azure_route, _fecth_alt
 import numpy as np
 
-async def enrutar(coords, traffic, ors_token, azure_token, client):
-    rutas_moto = []
-    if traffic:
-        for i in range(len(coords)-1):
-            ruta_azure = await _fetch_azure_route(
-                client=client,
-                token=azure_token,
-                coords=[coords[i], coords[i+1]]
-            )
+# Modo predictivo: estaciones candidatas por cada cruce estimado y
+# escenarios del consumo del tramo estación -> destino mientras no llega,
+# como múltiplos del consumo que le faltaba al tramo original
+PREDICCION_ESTACIONES = 3
+ESCENARIOS_PREDICCION = (0.5, 1.0, 2.0)
 
-            ruta_alt = await _fecth_alt(
-                client=client,
-                token=ors_token,
-                coords=ruta_azure["features"][-1]["geometry"]["coordinates"][0]
-            )
+async def _tramo_trafico(origen, destino, ors_token, azure_token, http):
+    """Ruta Azure de un tramo y, en cuanto llega, su perfil de elevación."""
+    ruta_azure = await _fetch_azure_route(
+        client=http.client("azure"),
+        token=azure_token,
+        coords=[origen, destino]
+    )
 
-            rutas = manage_segments(
-                rutas=ruta_azure,
-                traffic=traffic,
-                elevation=ruta_alt
-            )
+    ruta_alt = await _fecth_alt(
+        client=http.client("ors"),
+        token=ors_token,
+        coords=ruta_azure["features"][-1]["geometry"]["coordinates"][0]
+    )
 
-            rutas_moto.append(rutas)
+    with etapa("segments"):
+        return manage_segments(
+            rutas=ruta_azure,
+            traffic=True,
+            elevation=ruta_alt
+        )
+
+async def enrutar(coords, traffic, ors_token, azure_token, http):
+    with etapa("route"):
+        return await _enrutar(coords, traffic, ors_token, azure_token, http)
+
+async def _enrutar(coords, traffic, ors_token, azure_token, http):
+    rutas_moto = []
+    if traffic:
+        # Todos los tramos en paralelo; gather conserva el orden de los tramos
+        rutas_moto = list(await asyncio.gather(*(
+            _tramo_trafico(coords[i], coords[i+1], ors_token, azure_token, http)
+            for i in range(len(coords)-1)
+        )))
 
     else:
         ors_route = await _fetch_ors_route(
-                client, ors_token, "driving", coords,
+                http.client("ors"), ors_token, "driving", coords,
                 steps=True, geometries="geojson", exclude=[]
             )
         
-        rutas_moto = manage_segments(
-            rutas= ors_route,
-            traffic=traffic,
-        )
+        with etapa("segments"):
+            rutas_moto = manage_segments(
+                rutas= ors_route,
+                traffic=traffic,
+            )
         
     return rutas_moto
 
-async def moto_consume(coords, estaciones, nombre, client, ors_token, azure_token, profile, city = "med", traffic=False):
+def _listo(tarea):
+    return tarea.done() and not tarea.cancelled() and tarea.exception() is None
+
+class _Anticipador:
+    """
+    Desvíos a recarga pedidos por adelantado (modo predictivo).
+
+    Cada desvío actual -> estación -> destino se pide como dos rutas: el
+    acceso (actual -> estación) y el tramo (estación -> destino). Al llegar
+    a la estación la batería queda llena, así que el cruce siguiente solo
+    depende del tramo y del resto del plan, no del acceso. Entonces:
+
+    - si el tramo ya llegó, el cruce siguiente se calcula exacto y se piden
+      de una vez su acceso y su tramo, sin esperar a que la moto llegue;
+    - si no, se estima el consumo del tramo en varios escenarios y se
+      piden los tramos de las PREDICCION_ESTACIONES estaciones más
+      probables para cada cruce estimado.
+
+    Los accesos se reconocen por (posición, estación) y los tramos por
+    (estación, destino): solo se usan rutas idénticas a las que se
+    pedirían al cruzar de verdad.
+    """
+
+    def __init__(self, moto, pedir):
+        self.moto = moto
+        self.pedir = pedir
+        self.accesos = {}
+        self.tramos = {}
+
+    def acceso(self, pos, idx_est):
+        return self._pedir(self.accesos, (tuple(pos), idx_est), [pos, self.moto.stations["coords"][idx_est]])
+
+    def tramo(self, idx_est, destino):
+        return self._pedir(self.tramos, (idx_est, tuple(destino)), [self.moto.stations["coords"][idx_est], destino])
+
+    def tareas(self):
+        return list(self.accesos.values()) + list(self.tramos.values())
+
+    def _pedir(self, tabla, clave, coords):
+        if clave not in tabla:
+            tabla[clave] = self.pedir(coords)
+        return tabla[clave]
+
+    def planear(self, segmentos, soc, sin_revisar=0):
+        """
+        Recorre `segmentos` (el plan que sigue a la última estación) y pide
+        los desvíos de los cruces siguientes mientras sus tramos ya estén
+        disponibles.
+        """
+        moto = self.moto
+        while True:
+            cruce = moto.estimar_cruce(segmentos, soc, sin_revisar)
+            if cruce is None:
+                return
+            s, i = cruce
+            pos = segmentos[s].coords[i, :2].tolist()
+            destino = segmentos[s].coords[-1, :2].tolist()
+            idx_est = moto.station_index.mejor_desvio(pos, destino)
+            self.acceso(pos, idx_est)
+            tramo = self.tramo(idx_est, destino)
+            if not _listo(tramo):
+                self._adivinar(segmentos[s], i, segmentos[s + 1:])
+                return
+            segmentos = tramo.result() + segmentos[s + 1:]
+            soc = moto.capacidad_bateria
+            sin_revisar = 1
+
+    def _adivinar(self, segmento, i, resto):
+        """Pide los tramos probables del cruce que sigue a un tramo aún desconocido."""
+        moto = self.moto
+        faltante = 0.0
+        if i + 1 < len(segmento):
+            _, consumo, _ = moto._consumo(segmento, i + 1, len(segmento))
+            faltante = float(consumo.sum())
+
+        for factor in ESCENARIOS_PREDICCION:
+            cruce = moto.estimar_cruce(resto, moto.capacidad_bateria - factor * faltante)
+            if cruce is None:
+                continue
+            s, j = cruce
+            pos = resto[s].coords[j, :2].tolist()
+            destino = resto[s].coords[-1, :2].tolist()
+            for idx_est in moto.station_index.mejores_desvios(pos, destino, PREDICCION_ESTACIONES):
+                self.tramo(idx_est, destino)
+
+def _descartar(tarea):
+    # Marca la excepción como leída para que asyncio no la reporte
+    if not tarea.cancelled():
+        tarea.exception()
+
+async def moto_consume(coords, estaciones, nombre, http, ors_token, azure_token, profile, city = "med", traffic=False, station_index=None, predictive=False):
 
     rutas = await enrutar(
         coords=coords,
         traffic=traffic,
         ors_token=ors_token,
         azure_token=azure_token,
-        client=client
+        http=http
     )
 
-    moto = Moto(nombre, rutas, estaciones, hybrid_cont=0)
-    step_result = moto.avanzar_paso()
+    # Tiempo de simulación sin contar las esperas de los desvíos
+    simulacion = Acumulador("simulation")
+    with simulacion:
+        moto = Moto(nombre, rutas, estaciones, hybrid_cont=0, station_index=station_index)
 
-    while step_result != 0:
-        if step_result == 3:
-            # Batería baja
-            current_pos = moto.route_data[moto.idx]["coords"][moto.idx_ruta][:2]
+    def pedir_desvio(coords_desvio):
+        return asyncio.ensure_future(enrutar(
+            coords=coords_desvio,
+            traffic=traffic,
+            ors_token=ors_token,
+            azure_token=azure_token,
+            http=http
+        ))
 
-            # Computar cual es la mejor estación para enrutar
-            idx_est = moto.estacion_cercana(current_pos)
-            station_coord = estaciones["coords"][idx_est]
-            destiny = moto.route_data[moto.idx]["coords"][-1][:2]
+    anticipador = None
+    if predictive:
+        # Primera pasada: el primer cruce se conoce antes de simular
+        anticipador = _Anticipador(moto, pedir_desvio)
+        with simulacion:
+            anticipador.planear(moto.route_data, moto.estado_bateria)
 
+    try:
+        with simulacion:
+            step_result = moto.avanzar_paso()
 
-            moto.añadir_punto_carga(idx_est, current_pos)
+        while step_result != 0:
+            if step_result == 3:
+                # Batería baja
+                current_pos = moto.route_data[moto.idx].coords[moto.idx_ruta, :2].tolist()
 
-            # Enrutar desde la posicion actual, hacia la estación, y luego al destino original
-            nueva_ruta = await enrutar(
-                coords=[current_pos, station_coord, destiny],
-                traffic=traffic,
-                ors_token=ors_token,
-                azure_token=azure_token,
-                client=client
-            )
+                # Computar cual es la mejor estación para enrutar
+                idx_est = moto.estacion_cercana(current_pos)
+                station_coord = estaciones["coords"][idx_est]
+                destiny = moto.route_data[moto.idx].coords[-1, :2].tolist()
 
-            moto.cambiar_ruta(nueva_ruta)
 
-        step_result = moto.avanzar_paso()
-        
+                moto.añadir_punto_carga(idx_est, current_pos)
+
+                # Enrutar desde la posicion actual, hacia la estación, y luego al destino original.
+                # Acceso y tramo van en peticiones separadas, como en el modo predictivo
+                if anticipador is None:
+                    acceso = pedir_desvio([current_pos, station_coord])
+                    tramo = pedir_desvio([station_coord, destiny])
+                    with etapa("detour"):
+                        nueva_ruta = await acceso + await tramo
+                else:
+                    acceso = anticipador.acceso(current_pos, idx_est)
+                    with etapa("detour"):
+                        tramo = await anticipador.tramo(idx_est, destiny)
+
+                    # Con el tramo se piden los desvíos siguientes mientras llega el acceso
+                    with simulacion:
+                        anticipador.planear(tramo + moto.route_data[moto.idx + 1:], moto.capacidad_bateria, 1)
+
+                    with etapa("detour"):
+                        nueva_ruta = await acceso + tramo
+
+                with simulacion:
+                    moto.cambiar_ruta(nueva_ruta)
+
+            with simulacion:
+                step_result = moto.avanzar_paso()
+    finally:
+        simulacion.registrar()
+        # Desvíos adelantados que no se usaron
+        if anticipador is not None:
+            for tarea in anticipador.tareas():
+                tarea.cancel()
+                tarea.add_done_callback(_descartar)
+
     speeds = []
-    for ruta in moto.route_data:
-        speeds.extend(ruta["speeds"])
+    if moto.route_data:
+        speeds = np.concatenate([ruta.speeds for ruta in moto.route_data]).tolist()
 
         # Factores de emisión equivalentes de ciclo de vida (gCO₂/km)
     factor_emision_electrico_gco2_km = 35  # Motocicleta eléctrica
@@ -93,12 +243,12 @@ async def moto_consume(coords, estaciones, nombre, client, ors_token, azure_toke
 
     return {
         "geometry": {
-            "coordinates": [[lon, lat] for lon, lat, _ in moto.positions],
+            "coordinates": moto.positions[:, :2].tolist(),
             "type": "LineString"
         },
         "properties": {
-            "potencia": moto.power,
-            "soc": moto.soc_history,
+            "potencia": moto.power.tolist(),
+            "soc": moto.soc_history.tolist(),
             "speeds": speeds,
             "map_city": city,
             "total_electric_kwh": moto.total_electric_kwh,
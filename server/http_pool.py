@@ -0,0 +1,76 @@
+import os
+from typing import Dict
+
+import httpx
+from fastapi import Request
+
+# Timeout (s) de cada upstream; el ruteo tarda más que un tile
+UPSTREAM_TIMEOUTS = {
+    "ors": 30,
+    "azure": 30,
+    "carto": 20,
+    "osm": 20,
+}
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2 = os.getenv("HTTP2", "false").lower() == "true"
+
+
+def _http2_disponible() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HttpPool:
+    """
+    Clientes httpx compartidos durante toda la vida de la aplicación,
+    uno por upstream, para reutilizar conexiones (keep-alive / HTTP/2)
+    en vez de pagar un handshake TLS en cada petición.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2,
+    ):
+        if http2 and not _http2_disponible():
+            print("HTTP2=true pero el paquete 'h2' no está instalado, se usa HTTP/1.1")
+            http2 = False
+
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def client(self, upstream: str) -> httpx.AsyncClient:
+        """
+        Devuelve el cliente del upstream ("ors", "azure", "carto", "osm"),
+        creándolo la primera vez que se pide.
+        """
+        if upstream not in self._clients:
+            self._clients[upstream] = httpx.AsyncClient(
+                timeout=UPSTREAM_TIMEOUTS.get(upstream, 30),
+                limits=self.limits,
+                http2=self.http2,
+            )
+        return self._clients[upstream]
+
+    async def aclose(self) -> None:
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+def get_http(request: Request) -> HttpPool:
+    """Dependencia de FastAPI que entrega el pool creado en el lifespan."""
+    return request.app.state.http
@@ -0,0 +1,275 @@
+"""
+Trabajos por lotes sobre el simulador (/jobs).
+
+Un trabajo es una petición de /routes que se encola y se atiende en
+segundo plano: un grupo fijo de workers toma los trabajos en orden de
+llegada, y cada vehículo simulado se guarda apenas termina, así que el
+progreso se puede consultar mientras corre. Los trabajos y sus
+resultados viven en SQLite (JOBS_DB); al reiniciar el servidor, los que
+quedaron en cola o a medias se vuelven a encolar desde cero.
+
+La cola está acotada (JOBS_QUEUE_MAX trabajos esperando); si está
+llena, enviar() lanza ColaLlena y el endpoint responde 429.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import Request
+
+JOBS_DB = os.getenv("JOBS_DB", "resources/cache/jobs.sqlite3")
+JOBS_WORKERS = max(1, int(os.getenv("JOBS_WORKERS", "2")))
+JOBS_QUEUE_MAX = max(1, int(os.getenv("JOBS_QUEUE_MAX", "20")))
+
+# Estados de un trabajo
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINADOS = (DONE, FAILED, CANCELLED)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    input TEXT NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+# Recibe la entrada del trabajo y una función para guardar cada resultado
+# (índice del vehículo, resultado); devuelve cuando todos terminaron.
+Ejecutor = Callable[[Dict[str, Any], Callable[[int, Dict[str, Any]], Awaitable[None]]], Awaitable[None]]
+
+
+class ColaLlena(Exception):
+    pass
+
+
+class JobStore:
+    """Trabajos y resultados en SQLite. Todas las llamadas son bloqueantes."""
+
+    def __init__(self, ruta: str = JOBS_DB):
+        self.ruta = ruta
+        if ruta != ":memory:":
+            os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_ESQUEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def crear(self, job_id: str, entrada: Dict[str, Any], total: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, created_at, total, input) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, time.time(), total, json.dumps(entrada)),
+            )
+
+    def iniciar(self, job_id: str) -> None:
+        """Marca el trabajo como en curso y borra resultados de un intento anterior."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, completed = 0, failed = 0 WHERE id = ?",
+                (RUNNING, time.time(), job_id),
+            )
+
+    def guardar_resultado(self, job_id: str, idx: int, resultado: Dict[str, Any]) -> None:
+        columna = "failed" if "error" in resultado else "completed"
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_results (job_id, idx, result) VALUES (?, ?, ?)",
+                (job_id, idx, json.dumps(resultado)),
+            )
+            self._conn.execute(
+                f"UPDATE jobs SET {columna} = {columna} + 1 WHERE id = ?", (job_id,)
+            )
+
+    def terminar(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                (status, time.time(), error, job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            fila = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if fila is None else _resumen(fila)
+
+    def entrada(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            fila = self._conn.execute("SELECT input FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if fila is None else json.loads(fila["input"])
+
+    def listar(self, limit: int = 50, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        consulta = "SELECT * FROM jobs"
+        params: tuple = ()
+        if status:
+            consulta += " WHERE status = ?"
+            params = (status,)
+        consulta += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            filas = self._conn.execute(consulta, params + (limit,)).fetchall()
+        return [_resumen(f) for f in filas]
+
+    def resultados(self, job_id: str) -> List[Dict[str, Any]]:
+        """Resultados guardados, en el orden de los vehículos en la entrada."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT idx, result FROM job_results WHERE job_id = ? ORDER BY idx", (job_id,)
+            ).fetchall()
+        return [{"index": f["idx"], **json.loads(f["result"])} for f in filas]
+
+    def pendientes(self) -> List[str]:
+        """Trabajos que no terminaron (en cola o a medias), del más antiguo al más nuevo."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING),
+            ).fetchall()
+        return [f["id"] for f in filas]
+
+
+def _resumen(fila: sqlite3.Row) -> Dict[str, Any]:
+    total = fila["total"]
+    hechos = fila["completed"] + fila["failed"]
+    return {
+        "job_id": fila["id"],
+        "status": fila["status"],
+        "total": total,
+        "completed": fila["completed"],
+        "failed": fila["failed"],
+        "progress": hechos / total if total else 1.0,
+        "created_at": fila["created_at"],
+        "started_at": fila["started_at"],
+        "finished_at": fila["finished_at"],
+        "error": fila["error"],
+    }
+
+
+class JobQueue:
+    """Cola acotada de trabajos atendida por un grupo fijo de workers."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        ejecutor: Ejecutor,
+        workers: int = JOBS_WORKERS,
+        max_cola: int = JOBS_QUEUE_MAX,
+    ):
+        self.store = store
+        self.ejecutor = ejecutor
+        self.n_workers = workers
+        self.max_cola = max_cola
+        self._cola: "asyncio.Queue[str]" = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._en_curso: Dict[str, asyncio.Task] = {}
+        self._cancelados: set = set()
+
+    async def iniciar(self) -> None:
+        # Lo que quedó sin terminar en la ejecución anterior vuelve a la cola,
+        # aunque supere max_cola: ya había sido aceptado
+        for job_id in await asyncio.to_thread(self.store.pendientes):
+            self._cola.put_nowait(job_id)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.n_workers)]
+
+    async def cerrar(self) -> None:
+        for tarea in self._workers + list(self._en_curso.values()):
+            tarea.cancel()
+        await asyncio.gather(*self._workers, *self._en_curso.values(), return_exceptions=True)
+        self._workers = []
+
+    def en_cola(self) -> int:
+        return self._cola.qsize()
+
+    async def enviar(self, entrada: Dict[str, Any], total: int) -> Dict[str, Any]:
+        if self._cola.qsize() >= self.max_cola:
+            raise ColaLlena(f"Hay {self._cola.qsize()} trabajos en cola (máximo {self.max_cola})")
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self.store.crear, job_id, entrada, total)
+        self._cola.put_nowait(job_id)
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def cancelar(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancela un trabajo en cola o en curso. Devuelve None si no existe."""
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] in TERMINADOS:
+            return job
+        # Si sigue en la cola, el worker lo descarta al sacarlo
+        self._cancelados.add(job_id)
+        tarea = self._en_curso.get(job_id)
+        if tarea is not None:
+            tarea.cancel()
+        await asyncio.to_thread(self.store.terminar, job_id, CANCELLED)
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._cola.get()
+            try:
+                if job_id in self._cancelados:
+                    continue
+                # Tarea propia por trabajo: el contexto (p. ej. la captura de
+                # la petición) no pasa de un trabajo al siguiente
+                tarea = asyncio.create_task(self._ejecutar(job_id))
+                self._en_curso[job_id] = tarea
+                try:
+                    await tarea
+                except asyncio.CancelledError:
+                    if job_id not in self._cancelados:
+                        raise  # se está cerrando el servidor
+            finally:
+                self._cancelados.discard(job_id)
+                self._en_curso.pop(job_id, None)
+                self._cola.task_done()
+
+    async def _ejecutar(self, job_id: str) -> None:
+        entrada = await asyncio.to_thread(self.store.entrada, job_id)
+        if entrada is None:
+            return
+        await asyncio.to_thread(self.store.iniciar, job_id)
+
+        async def guardar(idx: int, resultado: Dict[str, Any]) -> None:
+            await asyncio.to_thread(self.store.guardar_resultado, job_id, idx, resultado)
+
+        try:
+            await self.ejecutor(entrada, guardar)
+        except asyncio.CancelledError:
+            # Cancelado con DELETE (ya marcado) o por cierre del servidor
+            # (queda en "running" y se reencola al arrancar)
+            raise
+        except Exception as e:
+            print(f"JOBS: el trabajo {job_id} falló:", repr(e))
+            await asyncio.to_thread(self.store.terminar, job_id, FAILED, f"{e!s}")
+            return
+        await asyncio.to_thread(self.store.terminar, job_id, DONE)
+
+
+def get_jobs(request: Request) -> JobQueue:
+    """Dependencia de FastAPI que entrega la cola creada en el lifespan."""
+    return request.app.state.jobs
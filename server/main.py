@@ -1,12 +1,26 @@
 import os
-from typing import List, Dict, Any
-from fastapi import FastAPI, HTTPException, Path, Response, Request
+from contextlib import aclosing, asynccontextmanager
+from typing import List, Dict, Any, Optional
+from fastapi import Depends, FastAPI, HTTPException, Path, Query, Response, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from petitions import _fetch_ors_route, _to2d
+from route_cache import route_cache
+from capture import Captura, request_capture
+from jobs import ColaLlena, JobQueue, JobStore, get_jobs
+from metrics import ETAPAS, PETICIONES, TimingMiddleware, etapa, metrica
+from profiler import PROFILE_ENABLED, perfilador
+from http_pool import HttpPool, get_http
+from stations import StationIndex, StationRegistry, get_stations
+from tile_cache import (
+    TILE_CACHE_DIR, TILE_CACHE_MAX_AGE, TILE_CACHE_MAX_MB, TileCache, get_tiles
+)
 
 from dotenv import load_dotenv
 from consume import moto_consume
+import asyncio
 import httpx
 import json
 
@@ -20,7 +34,36 @@ AZURE_TOKEN = os.getenv("AZURE_TOKEN","")
 
 PORT = int(os.getenv("PORT", "8000"))
 
-app = FastAPI(title="Multi rutas ORS")
+# Máximo de vehículos simulados en paralelo dentro de una petición /routes
+ROUTES_CONCURRENCY = max(1, int(os.getenv("ROUTES_CONCURRENCY", "8")))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un solo pool de clientes HTTP para toda la vida del servidor
+    app.state.http = HttpPool()
+    app.state.stations = StationRegistry()
+    app.state.stations.cargar_todas()
+    app.state.tiles = TileCache(
+        TILE_CACHE_DIR, TILE_CACHE_MAX_MB * 1024 * 1024, TILE_CACHE_MAX_AGE
+    )
+    # Trabajos por lotes (/jobs), atendidos en segundo plano
+    app.state.jobs = JobQueue(
+        JobStore(), lambda entrada, guardar: _ejecutar_job(app, entrada, guardar)
+    )
+    await app.state.jobs.iniciar()
+    if PROFILE_ENABLED:
+        # Se muestrea el hilo del ciclo de eventos, que es el que corre aquí
+        perfilador.iniciar()
+    try:
+        yield
+    finally:
+        perfilador.detener()
+        await app.state.jobs.cerrar()
+        app.state.jobs.store.close()
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="Multi rutas ORS", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,7 +71,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(TimingMiddleware)
 
 # =================== MODELOS (JSON simple) ===================
 class Waypoint(BaseModel):
@@ -57,32 +102,34 @@ class Options(BaseModel):
 
     traffic: bool = False
 
+    # Pedir por adelantado los desvíos a recarga probables
+    predictive: bool = False
+
 class RoutesRequest(BaseModel):
     options: Options
     vehicles: List[VehicleInput]
 
 
-def get_estaciones(ubicacion: str = "amva"):
-    estaciones = {}
-    ruta_archivo = "resources/data/estaciones"
-    if ubicacion == "amva":
-        with open(f"{ruta_archivo}/estaciones_amva.json", "r") as f:
-            estaciones = json.load(f)
-    elif ubicacion == "bog":
-        with open(f"{ruta_archivo}/estaciones_bog.json", "r") as f:
-            estaciones = json.load(f)
-    elif ubicacion == "med":
-        with open(f"{ruta_archivo}/estaciones_med.json", "r") as f:
-            estaciones = json.load(f)
-    else:
-        raise Exception("Imposible cargar las estaciones")
-    return estaciones
+class CaptureConfig(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = Field(None, ge=0, le=1)
+
+
+class ProfileConfig(BaseModel):
+    enabled: Optional[bool] = None
+    interval_ms: Optional[float] = Field(None, gt=0)
+    reset: bool = False
 
 
 # =================== SALUD ===================
 @app.get("/health")
 def health():
-    return {"ok": True, "provider": "ors", "has_token": bool(ORS_TOKEN)}
+    return {
+        "ok": True,
+        "provider": "ors",
+        "has_token": bool(ORS_TOKEN),
+        "route_cache": route_cache.stats(),
+    }
 
 
 @app.get("/telemetria")
@@ -90,9 +137,67 @@ def health():
     with open("resources/data/telemetry/telemetry_example.json","r") as f:
         return json.load(f)
 
+# =================== CAPTURA (depuración) ===================
+@app.get("/capture")
+def capture_estado():
+    return request_capture.estado()
+
+
+@app.put("/capture")
+def capture_configurar(config: CaptureConfig):
+    """Activa/desactiva la captura de peticiones o cambia su muestreo en caliente."""
+    return request_capture.configurar(enabled=config.enabled, sample_rate=config.sample_rate)
+
+# =================== MÉTRICAS Y PERFILADO ===================
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(jobs: JobQueue = Depends(get_jobs)):
+    """Métricas en el formato de texto de Prometheus."""
+    cache = route_cache.stats()["providers"]
+    lineas = ETAPAS.texto() + PETICIONES.texto()
+    lineas += metrica(
+        "route_cache_lookups_total", "counter", "Búsquedas en route_cache por resultado",
+        (
+            ({"provider": p, "result": r}, n)
+            for p, conteos in sorted(cache.items())
+            for r, n in sorted(conteos.items())
+        ),
+    )
+    lineas += metrica(
+        "jobs_queued", "gauge", "Trabajos esperando en la cola de /jobs", [({}, jobs.en_cola())]
+    )
+    return "\n".join(lineas) + "\n"
+
+
+@app.get("/profile", response_class=PlainTextResponse)
+def profile_muestras(min_samples: int = Query(1, ge=1)):
+    """Pilas muestreadas en formato collapsed (flamegraph.pl, speedscope)."""
+    return perfilador.colapsado(min_samples)
+
+
+@app.put("/profile")
+async def profile_configurar(config: ProfileConfig):
+    """
+    Enciende/apaga el perfilador o cambia su intervalo en caliente. Es
+    async para correr en el hilo del ciclo de eventos, que es el que se
+    muestrea.
+    """
+    if config.reset:
+        perfilador.reiniciar()
+    if config.interval_ms is not None and config.interval_ms != perfilador.intervalo_ms:
+        activo = perfilador.activo
+        perfilador.detener()
+        perfilador.intervalo_ms = config.interval_ms
+        if activo:
+            perfilador.iniciar()
+    if config.enabled is True:
+        perfilador.iniciar()
+    elif config.enabled is False:
+        perfilador.detener()
+    return perfilador.estado()
+
 # =================== ESTACIONES ===================
 @app.get("/estaciones")
-async def estaciones(city: str = "amva"):
+async def estaciones(city: str = "amva", stations: StationRegistry = Depends(get_stations)):
     """
     Devuelve estaciones dependiendo de la ciudad:
     - "amva" (default)
@@ -100,74 +205,267 @@ async def estaciones(city: str = "amva"):
     - "bog"
     """
     try:
-        return get_estaciones(city)
+        return stations.get(city).estaciones
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Error: {e}")
 
 
 # =================== RUTAS: JSON simple ===================
-@app.post("/routes")
-async def routes(body: RoutesRequest):
-    idx = 1
+def _error_vehiculo(v: VehicleInput, status_code: int, detail: Any) -> Dict[str, Any]:
+    return {"vehicle_id": v.vehicle_id, "error": {"status_code": status_code, "detail": detail}}
+
+
+async def _simular_vehiculo(
+    v: VehicleInput,
+    coords: List[List[float]],
+    nombre: str,
+    semaforo: asyncio.Semaphore,
+    http: HttpPool,
+    station_index: StationIndex,
+    options: Options,
+) -> Dict[str, Any]:
+    """
+    Enruta y simula un vehículo. Los errores se devuelven como dict
+    en vez de propagarse, para que un fallo no tumbe toda la flota.
+    """
+    async with semaforo:
+        try:
+            data = await moto_consume(
+                coords=coords,
+                estaciones=station_index.estaciones,
+                station_index=station_index,
+                nombre=nombre,
+                http=http,
+                ors_token=ORS_TOKEN,
+                azure_token=AZURE_TOKEN,
+                profile=options.profile,
+                city=options.city,
+                traffic=options.traffic,
+                predictive=options.predictive
+            )
+        except HTTPException as e:
+            return _error_vehiculo(v, e.status_code, e.detail)
+        except httpx.HTTPStatusError as e:
+            return _error_vehiculo(v, e.response.status_code, f"Error del proveedor de rutas: {e!s}")
+        except httpx.RequestError as e:
+            return _error_vehiculo(v, 502, f"Error de red ORS: {e!s}")
+        except Exception as e:
+            print(f"Error simulando {v.vehicle_id}:", repr(e))
+            return _error_vehiculo(v, 502, f"Error: {e!s}")
+
+    return {"vehicle_id": v.vehicle_id, **data}
+
+
+def _vehiculos_validos(body: RoutesRequest) -> List[tuple]:
+    """(vehículo, coordenadas 2D) de los vehículos con al menos dos waypoints."""
+    validos = []
+    for v in body.vehicles:
+        if len(v.waypoints) < 2:
+            continue
+
+        coords = _to2d([wp.coordinates for wp in v.waypoints])
+        if len(coords) < 2:
+            continue
+
+        validos.append((v, coords))
+    return validos
+
+
+def _tareas_flota(
+    body: RoutesRequest, http: HttpPool, station_index: StationIndex
+) -> List:
+    """Una corrutina de simulación por cada vehículo válido de la petición."""
+    semaforo = asyncio.Semaphore(ROUTES_CONCURRENCY)
+    return [
+        _simular_vehiculo(
+            v=v,
+            coords=coords,
+            nombre=f"moto-{idx}",
+            semaforo=semaforo,
+            http=http,
+            station_index=station_index,
+            options=body.options,
+        )
+        for idx, (v, coords) in enumerate(_vehiculos_validos(body), start=1)
+    ]
 
+
+def _indice_estaciones(body: RoutesRequest, stations: StationRegistry) -> StationIndex:
+    """Valida la configuración de la petición y entrega las estaciones de su ciudad."""
     city = body.options.city
     if not city:
         raise HTTPException(
             status_code=500, detail="NO hay ciudad"
         )
 
-    traffic = body.options.traffic  
-
     if not ORS_TOKEN and not AZURE_TOKEN:
         raise HTTPException(
             status_code=500, detail="Tokens no configurados"
         )
 
-    with open("resources/examples/ej_in.json", "w") as f:
-        json.dump(body.model_dump(), f, indent=2)
+    try:
+        return stations.get(city)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error: {e}")
 
-    out: List[Dict[str, Any]] = []
-    async with httpx.AsyncClient(timeout=30) as client:
-        for v in body.vehicles:
-            if len(v.waypoints) < 2:
-                continue
-
-            coords = _to2d([wp.coordinates for wp in v.waypoints])
-            if len(coords) < 2:
-                continue
-
-            try:
-                estaciones = get_estaciones(city)
-
-                data = await moto_consume(
-                    coords=coords,
-                    estaciones=estaciones,
-                    nombre=f"moto-{idx}",
-                    client=client,
-                    ors_token=ORS_TOKEN,
-                    azure_token=AZURE_TOKEN,
-                    profile=body.options.profile,
-                    city=city,
-                    traffic=traffic
-                )
-
-                # Guardar salida de ejemplo sin cambios (data ya es dict)
-                with open("resources/examples/ej_out.json", "w") as f:
-                    json.dump(data, f, indent=2)
-
-            except httpx.RequestError as e:
-                raise HTTPException(
-                    status_code=502, detail=f"Error de red ORS: {e!s}"
-                )
-
-            idx += 1
-            out.append({"vehicle_id": v.vehicle_id, **data})
 
-    return {"routes": out}
+async def _a_medida_que_terminan(tareas: List[asyncio.Task]):
+    """
+    (índice, resultado) de cada tarea en cuanto termina. Al cerrar el
+    generador antes de tiempo se cancelan las que sigan pendientes.
+    """
+    indices = {tarea: i for i, tarea in enumerate(tareas)}
+    pendientes = set(tareas)
+    try:
+        while pendientes:
+            listas, pendientes = await asyncio.wait(
+                pendientes, return_when=asyncio.FIRST_COMPLETED
+            )
+            for tarea in sorted(listas, key=indices.get):
+                yield indices[tarea], tarea.result()
+    finally:
+        for tarea in pendientes:
+            tarea.cancel()
+
+
+async def _stream_ndjson(tareas: List[asyncio.Task], captura: Optional[Captura]):
+    """
+    Emite una línea JSON por vehículo en cuanto termina su simulación.
+    "index" es la posición del vehículo en la petición, para que el
+    cliente pueda reordenar si lo necesita.
+    """
+    try:
+        # Si el cliente se desconecta no seguimos simulando
+        async with aclosing(_a_medida_que_terminan(tareas)) as resultados:
+            async for i, resultado in resultados:
+                linea = {"index": i, **resultado}
+                if captura is not None:
+                    captura.registrar_salida(linea)
+                with etapa("serialization"):
+                    texto = json.dumps(linea) + "\n"
+                yield texto
+    finally:
+        request_capture.terminar(captura)
+
+
+@app.post("/routes")
+async def routes(
+    body: RoutesRequest,
+    request: Request,
+    stream: bool = Query(False, description="Responder en NDJSON, un vehículo por línea"),
+    http: HttpPool = Depends(get_http),
+    stations: StationRegistry = Depends(get_stations),
+):
+    station_index = _indice_estaciones(body, stations)
+
+    captura = request_capture.iniciar("/routes", body.model_dump())
+    tareas = _tareas_flota(body, http, station_index)
+
+    if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _stream_ndjson([asyncio.ensure_future(t) for t in tareas], captura),
+            media_type="application/x-ndjson",
+        )
+
+    # gather conserva el orden de entrada de los vehículos
+    resultados = await asyncio.gather(*tareas)
+    if captura is not None:
+        for resultado in resultados:
+            captura.registrar_salida(resultado)
+    request_capture.terminar(captura)
+
+    out: List[Dict[str, Any]] = [r for r in resultados if "error" not in r]
+    errors: List[Dict[str, Any]] = [r for r in resultados if "error" in r]
+
+    # Si ningún vehículo se pudo simular se conserva el error original
+    if errors and not out:
+        raise HTTPException(**errors[0]["error"])
+
+    # Lo mismo que haría FastAPI con el dict, pero medido
+    with etapa("serialization"):
+        return JSONResponse(jsonable_encoder({"routes": out, "errors": errors}))
+
+# =================== TRABAJOS POR LOTES ===================
+async def _ejecutar_job(app: FastAPI, entrada: Dict[str, Any], guardar) -> None:
+    """Simula la flota de un trabajo guardando cada vehículo apenas termina."""
+    body = RoutesRequest(**entrada)
+    station_index = app.state.stations.get(body.options.city)
+
+    captura = request_capture.iniciar("/jobs", entrada)
+    tareas = [asyncio.ensure_future(t) for t in _tareas_flota(body, app.state.http, station_index)]
+    try:
+        async with aclosing(_a_medida_que_terminan(tareas)) as resultados:
+            async for i, resultado in resultados:
+                if captura is not None:
+                    captura.registrar_salida({"index": i, **resultado})
+                await guardar(i, resultado)
+    finally:
+        request_capture.terminar(captura)
+
+
+def _job_o_404(job: Optional[Dict[str, Any]], job_id: str) -> Dict[str, Any]:
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No existe el trabajo {job_id}")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+async def crear_job(
+    body: RoutesRequest,
+    jobs: JobQueue = Depends(get_jobs),
+    stations: StationRegistry = Depends(get_stations),
+):
+    """Encola la simulación de una flota y devuelve el id para consultarla."""
+    _indice_estaciones(body, stations)
+    total = len(_vehiculos_validos(body))
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Ningún vehículo tiene al menos dos waypoints")
+
+    try:
+        return await jobs.enviar(body.model_dump(), total)
+    except ColaLlena as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+@app.get("/jobs")
+async def listar_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    status: Optional[str] = None,
+    jobs: JobQueue = Depends(get_jobs),
+):
+    return {
+        "queued": jobs.en_cola(),
+        "jobs": await asyncio.to_thread(jobs.store.listar, limit, status),
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def estado_job(job_id: str, jobs: JobQueue = Depends(get_jobs)):
+    return _job_o_404(await asyncio.to_thread(jobs.store.get, job_id), job_id)
+
+
+@app.get("/jobs/{job_id}/results")
+async def resultados_job(job_id: str, jobs: JobQueue = Depends(get_jobs)):
+    """
+    Resultados en el orden de la petición, con el mismo formato que /routes.
+    Mientras el trabajo corre devuelve los vehículos que ya terminaron.
+    """
+    job = _job_o_404(await asyncio.to_thread(jobs.store.get, job_id), job_id)
+    resultados = await asyncio.to_thread(jobs.store.resultados, job_id)
+    return {
+        "job": job,
+        "routes": [r for r in resultados if "error" not in r],
+        "errors": [r for r in resultados if "error" in r],
+    }
+
+
+@app.delete("/jobs/{job_id}")
+async def cancelar_job(job_id: str, jobs: JobQueue = Depends(get_jobs)):
+    return _job_o_404(await jobs.cancelar(job_id), job_id)
 
 # =================== RUTAS: GeoJSON FeatureCollection ===================
 @app.post("/routes/geojson")
-async def routes_geojson(request: Request):
+async def routes_geojson(request: Request, http: HttpPool = Depends(get_http)):
     if not ORS_TOKEN:
         raise HTTPException(
             status_code=500, detail="ORS_TOKEN no configurado en .env"
@@ -193,41 +491,40 @@ async def routes_geojson(request: Request):
 
     features = body["features"]
     out: List[Dict[str, Any]] = []
-    async with httpx.AsyncClient(timeout=30) as client:
-        idx = 1
-        for feat in features:
-            geom = (feat or {}).get("geometry") or {}
-            if geom.get("type") != "LineString":
-                continue
-            coords = _to2d(geom.get("coordinates") or [])
-            if len(coords) < 2:
-                continue
-
-            vehicle_id = (
-                (feat.get("properties") or {}).get("vehicle_id")
-            ) or f"moto-{idx}"
-            idx += 1
-
-            try:
-                r = await _fetch_ors_route(
-                    client=client,
-                    token=ORS_TOKEN,
-                    profile_key=profile,
-                    coords=coords,
-                    steps=steps,
-                    geometries=geometries,
-                    exclude=exclude,
-                    want_alternatives=want_alts,
-                    alt_count=alt_count,
-                    alt_share=alt_share,
-                    alt_weight=alt_weight,
-                )
-            except httpx.RequestError as e:
-                raise HTTPException(
-                    status_code=502, detail=f"Error de red ORS: {e!s}"
-                )
-
-            out.append({"vehicle_id": vehicle_id, **r})
+    idx = 1
+    for feat in features:
+        geom = (feat or {}).get("geometry") or {}
+        if geom.get("type") != "LineString":
+            continue
+        coords = _to2d(geom.get("coordinates") or [])
+        if len(coords) < 2:
+            continue
+
+        vehicle_id = (
+            (feat.get("properties") or {}).get("vehicle_id")
+        ) or f"moto-{idx}"
+        idx += 1
+
+        try:
+            r = await _fetch_ors_route(
+                client=http.client("ors"),
+                token=ORS_TOKEN,
+                profile_key=profile,
+                coords=coords,
+                steps=steps,
+                geometries=geometries,
+                exclude=exclude,
+                want_alternatives=want_alts,
+                alt_count=alt_count,
+                alt_share=alt_share,
+                alt_weight=alt_weight,
+            )
+        except httpx.RequestError as e:
+            raise HTTPException(
+                status_code=502, detail=f"Error de red ORS: {e!s}"
+            )
+
+        out.append({"vehicle_id": vehicle_id, **r})
 
     return {"routes": out}
 
@@ -242,11 +539,19 @@ async def geojson_echo(req: Request):
 
 
 # =================== TILE PROXY ===================
+TILE_HEADERS = {
+    "Content-Type": "image/png",
+    "Cache-Control": "public, max-age=86400",
+}
+
+
 @app.get("/tiles/carto/{z}/{x}/{y}.png")
 async def tile_carto(
     z: int = Path(..., ge=0, le=22),
     x: int = Path(..., ge=0),
     y: str = Path(...),
+    http: HttpPool = Depends(get_http),
+    tiles: TileCache = Depends(get_tiles),
 ):
     retina_suffix = ""
     if "@2x" in y:
@@ -255,29 +560,21 @@ async def tile_carto(
     else:
         y_clean = y
 
-    url = f"https://{{s}}.basemaps.cartocdn.com/light_all/{z}/{x}/{y_clean}{retina_suffix}.png"
-    subdomains = ["a", "b", "c", "d"]
-    s = subdomains[(x + z) % len(subdomains)]
-    url = url.replace("{s}", s)
-
-    async with httpx.AsyncClient(timeout=20) as client:
-        try:
-            r = await client.get(url)
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=502, detail=f"Error trayendo tile Carto: {e!s}"
-            )
+    try:
+        status, content = await tiles.get(
+            "carto", z, x, f"{y_clean}{retina_suffix}", http.client("carto")
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=502, detail=f"Error trayendo tile Carto: {e!s}"
+        )
 
-    if r.status_code != 200:
+    if status != 200:
         raise HTTPException(
-            status_code=r.status_code, detail=f"Carto devolvió {r.status_code}"
+            status_code=status, detail=f"Carto devolvió {status}"
         )
 
-    headers = {
-        "Content-Type": "image/png",
-        "Cache-Control": "public, max-age=86400",
-    }
-    return Response(content=r.content, headers=headers, media_type="image/png")
+    return Response(content=content, headers=TILE_HEADERS, media_type="image/png")
 
 
 @app.get("/tiles/osm/{z}/{x}/{y}.png")
@@ -285,23 +582,19 @@ async def tile_osm(
     z: int = Path(..., ge=0, le=22),
     x: int = Path(..., ge=0),
     y: int = Path(..., ge=0),
+    http: HttpPool = Depends(get_http),
+    tiles: TileCache = Depends(get_tiles),
 ):
-    url = f"https://tile.openstreetmap.org/{z}/{x}/{y}.png"
-    async with httpx.AsyncClient(timeout=20) as client:
-        try:
-            r = await client.get(url)
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=502, detail=f"Error trayendo tile OSM: {e!s}"
-            )
+    try:
+        status, content = await tiles.get("osm", z, x, str(y), http.client("osm"))
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=502, detail=f"Error trayendo tile OSM: {e!s}"
+        )
 
-    if r.status_code != 200:
+    if status != 200:
         raise HTTPException(
-            status_code=r.status_code, detail=f"OSM devolvió {r.status_code}"
+            status_code=status, detail=f"OSM devolvió {status}"
         )
 
-    headers = {
-        "Content-Type": "image/png",
-        "Cache-Control": "public, max-age=86400",
-    }
-    return Response(content=r.content, headers=headers, media_type="image/png")
+    return Response(content=content, headers=TILE_HEADERS, media_type="image/png")
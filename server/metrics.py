@@ -0,0 +1,214 @@
+"""
+Tiempos por etapa de las peticiones y métricas en formato Prometheus.
+
+Cada etapa del camino de /routes se mide con etapa(nombre) (o con un
+Acumulador cuando son muchos tramos cortos, como los pasos de la moto):
+
+    route          cada llamada a enrutar (upstreams + manage_segments)
+    ors, azure,
+    elevation      espera de la respuesta HTTP del upstream (sin los
+                   aciertos de route_cache)
+    segments       manage_segments
+    detour         espera del desvío a recarga pedido por la moto
+    simulation     ciclo de pasos de Moto de un vehículo
+    serialization  paso de la respuesta a JSON
+
+Cada medición va al histograma global (GET /metrics) y, si la etapa
+corre dentro de una petición HTTP, a los tiempos de esa petición, que
+con SERVER_TIMING=true se devuelven en el header Server-Timing. Los
+vehículos se simulan en paralelo, así que en el header cada etapa es la
+suma de sus duraciones y puede superar al total.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+# Límites [s] de los histogramas: de un acierto de caché a una flota grande
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histograma:
+    """Histograma acumulado al estilo Prometheus, con una serie por etiquetas."""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...], buckets=BUCKETS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = tuple(buckets)
+        # etiquetas -> [conteos por bucket (no acumulados), suma, cantidad]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valores: Tuple[str, ...], segundos: float) -> None:
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if segundos <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += segundos
+            serie[2] += 1
+
+    def texto(self) -> List[str]:
+        lineas = [
+            f"# HELP {self.nombre} {self.ayuda}",
+            f"# TYPE {self.nombre} histogram",
+        ]
+        with self._lock:
+            series = sorted((k, [list(s[0]), s[1], s[2]]) for k, s in self._series.items())
+        for valores, (conteos, suma, cantidad) in series:
+            pares = list(zip(self.etiquetas, valores))
+            base = _etiquetas(pares)
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                le = _etiquetas(pares + [("le", f"{limite:g}")])
+                lineas.append(f"{self.nombre}_bucket{le} {acumulado}")
+            le = _etiquetas(pares + [("le", "+Inf")])
+            lineas.append(f"{self.nombre}_bucket{le} {cantidad}")
+            lineas.append(f"{self.nombre}_sum{base} {suma:.6f}")
+            lineas.append(f"{self.nombre}_count{base} {cantidad}")
+        return lineas
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(pares: Iterable[Tuple[str, str]]) -> str:
+    pares = list(pares)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def metrica(nombre: str, tipo: str, ayuda: str, muestras: Iterable[Tuple[dict, float]]) -> List[str]:
+    """Líneas de una métrica simple (counter / gauge) con sus muestras."""
+    lineas = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+    for etiquetas, valor in muestras:
+        lineas.append(f"{nombre}{_etiquetas(etiquetas.items())} {valor:g}")
+    return lineas
+
+
+ETAPAS = Histograma(
+    "routes_stage_seconds", "Duración de cada etapa del cálculo de rutas", ("stage",)
+)
+PETICIONES = Histograma(
+    "http_request_duration_seconds", "Duración de las peticiones HTTP",
+    ("method", "route", "status"),
+)
+
+
+class Tiempos:
+    """Duraciones acumuladas por etapa durante una petición."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas: Dict[str, List[float]] = {}
+
+    def agregar(self, nombre: str, segundos: float) -> None:
+        acumulado = self.etapas.setdefault(nombre, [0.0, 0])
+        acumulado[0] += segundos
+        acumulado[1] += 1
+
+    def server_timing(self) -> str:
+        partes = [
+            f'{nombre};dur={total * 1000:.1f};desc="{n}x"'
+            for nombre, (total, n) in self.etapas.items()
+        ]
+        partes.append(f"total;dur={(time.perf_counter() - self.inicio) * 1000:.1f}")
+        return ", ".join(partes)
+
+
+# Tiempos de la petición en curso; las tareas de cada vehículo los heredan
+_tiempos_actuales: ContextVar[Optional[Tiempos]] = ContextVar("tiempos_actuales", default=None)
+
+
+def registrar(nombre: str, segundos: float) -> None:
+    """Registra una duración ya medida de la etapa nombre."""
+    ETAPAS.observar((nombre,), segundos)
+    tiempos = _tiempos_actuales.get()
+    if tiempos is not None:
+        tiempos.agregar(nombre, segundos)
+
+
+@contextmanager
+def etapa(nombre: str):
+    """Mide el bloque como una ejecución de la etapa (sirve con await adentro)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(nombre, time.perf_counter() - inicio)
+
+
+class Acumulador:
+    """
+    Suma varios bloques cortos de una misma etapa y los registra como una
+    sola ejecución, para no llenar el histograma con un dato por paso.
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.segundos = 0.0
+        self._inicio = 0.0
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.segundos += time.perf_counter() - self._inicio
+        return False
+
+    def registrar(self) -> None:
+        registrar(self.nombre, self.segundos)
+
+
+class TimingMiddleware:
+    """
+    Middleware ASGI: mide cada petición HTTP y le asocia sus Tiempos. Con
+    server_timing=True agrega el header Server-Timing a la respuesta; en
+    respuestas en streaming el header sale antes del cuerpo, con lo medido
+    hasta ese momento.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tiempos = Tiempos()
+        token = _tiempos_actuales.set(tiempos)
+        status = 500
+
+        async def enviar(mensaje):
+            nonlocal status
+            if mensaje["type"] == "http.response.start":
+                status = mensaje["status"]
+                if self.server_timing:
+                    headers = list(mensaje.get("headers", []))
+                    headers.append((b"server-timing", tiempos.server_timing().encode("latin-1")))
+                    mensaje = {**mensaje, "headers": headers}
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _tiempos_actuales.reset(token)
+            # Plantilla de la ruta y no la URL, para no crear una serie por tile
+            ruta = getattr(scope.get("route"), "path", "sin_ruta")
+            PETICIONES.observar(
+                (scope["method"], ruta, str(status)), time.perf_counter() - tiempos.inicio
+            )
@@ -1,13 +1,15 @@
 import math
 import numpy as np
-from geopy.distance import geodesic
+from motor_particula import CALIBRACION_SERVIDOR, VehicleSpec, potencias
+from stations import StationIndex
 
 class Moto:
-    def __init__(self, name, route_data, stations, hybrid_cont):
+    def __init__(self, name, route_data, stations, hybrid_cont, station_index=None):
         self.name = name
         self.route_data = route_data
         self.stations = stations
-        self.positions = []
+        # Índice espacial para buscar la estación de desvío
+        self.station_index = station_index if station_index is not None else StationIndex(stations)
 
         # Capacidad total de batería (kWh)
         self.capacidad_bateria = 2.5
@@ -21,8 +23,9 @@ class Moto:
 
         # Estos factores de corrección se usan para calibrar el consumo en el modelo,
         # Se computaron usando el consumo real de la telemetría de una moto elécttrica 
-        self.factor_correccion = 0.959
-        self.eficiencia_tren = 0.95
+        # (ver motor_particula.spec)
+        self.factor_correccion = CALIBRACION_SERVIDOR["factor_correccion"]
+        self.eficiencia_tren = CALIBRACION_SERVIDOR["eficiencia_tren"]
 
         # Índices de recorrido
         self.idx = 0          # segmento (tramo)
@@ -46,10 +49,11 @@ class Moto:
         self.distance = 0.0
         self.duration = 0.0
 
-        # Históricos
+        # Históricos, guardados como bloques de arreglos (uno por tramo consumido)
         self.puntos_recarga_realizados = []  # se llenará con dicts
-        self.soc_history = []                # historial de estado de batería
-        self.power = []                      # historial de potencia (kW)
+        self._soc_chunks = []                # historial de estado de batería
+        self._power_chunks = []              # historial de potencia (kW)
+        self._position_chunks = []           # posiciones [lng, lat, alt]
 
         # Modelo HEV según tipo
         if hybrid_cont == 0:
@@ -57,18 +61,27 @@ class Moto:
         else:
             from HybridBikeConsumptionModel.parameters_hybrid import HEV
         self.hev = HEV()
+        self.spec = VehicleSpec.desde_hev(
+            self.hev,
+            eficiencia_tren=self.eficiencia_tren,
+            factor_correccion=self.factor_correccion,
+        )
 
-    def estacion_cercana(self, current_pos):
-        destiny = self.route_data[self.idx]["coords"][-1][:2]
+    @property
+    def soc_history(self):
+        return np.concatenate(self._soc_chunks) if self._soc_chunks else np.empty(0)
+
+    @property
+    def power(self):
+        return np.concatenate(self._power_chunks) if self._power_chunks else np.empty(0)
 
-        distancias = [
-            geodesic(current_pos[::-1], coords[::-1]).meters
-            + geodesic(coords[::-1], destiny[::-1]).meters
-            for coords in self.stations["coords"]
-        ]
+    @property
+    def positions(self):
+        return np.concatenate(self._position_chunks) if self._position_chunks else np.empty((0, 3))
 
-        idx_est = distancias.index(min(distancias))
-        return idx_est
+    def estacion_cercana(self, current_pos):
+        destiny = self.route_data[self.idx].coords[-1, :2]
+        return self.station_index.mejor_desvio(current_pos, destiny)
 
     def añadir_punto_carga(self, station_idx, current_pos):
         """
@@ -88,9 +101,8 @@ class Moto:
         Inserta una nueva ruta (por ejemplo hacia estación) en el plan actual,
         cortando el segmento actual en el punto donde se va a desviar.
         """
-        self.route_data[self.idx]["coords"] = self.route_data[self.idx]["coords"][:self.idx_ruta + 1]
-        self.route_data[self.idx]["speeds"] = self.route_data[self.idx]["speeds"][:self.idx_ruta + 1]
-        self.route_data[self.idx]["slopes"] = self.route_data[self.idx]["slopes"][:self.idx_ruta + 1]
+        # Vista sobre el mismo tramo, sin copiar los arreglos
+        self.route_data[self.idx] = self.route_data[self.idx].truncar(self.idx_ruta + 1)
 
         self.route_data = self.route_data[:self.idx + 1] + new_route + self.route_data[self.idx + 1:]
 
@@ -123,144 +135,181 @@ class Moto:
         last_cp["charger_power_kw"] = self.charger_power_kw  # potencia del cargador
 
         # Log del SoC después de cargar
-        self.soc_history.append(self.estado_bateria)
+        self._soc_chunks.append(np.array([self.estado_bateria]))
         self.en_carga = False
 
-    def consume_step(self):
-        
-        # Calcula fuerzas, potencias y consumos en un "paso" de la simulación
-        # y actualiza la batería y los acumulados de consumo.
-        # Sincronizado con calcular_soc, calcular_potencia_por_punto y calcular_consumo_y_emisiones
-        
-        hev = self.hev
-        segment = self.route_data[self.idx]
+    def _delta_t_horas(self, segment, inicio, fin):
+        """
+        Duración (h) de cada paso entre los índices [inicio, fin) del segmento.
+        Usa los timestamps ts (ms) si existen y si no los tiempos times (s).
+        """
+        n = fin - inicio
+        dt_h = np.empty(n)
+        if n == 0:
+            return dt_h
+
+        ts = segment.ts
+        if ts is not None and len(ts) > 0:
+            idx = np.arange(max(inicio, 1), fin)
+            con_ts = idx < len(ts)
+            idx_ts = idx[con_ts]
+            delta_ms = ts[idx_ts] - ts[idx_ts - 1]
+            dt_ts = np.where(delta_ms > 0, delta_ms / 1000.0 / 3600.0, 1.0 / 3600.0)
+
+            dt_resto = np.empty(len(idx))
+            dt_resto[con_ts] = dt_ts
+            if not con_ts.all():
+                # Puntos sin timestamp: se usan los tiempos como respaldo
+                times = segment.times
+                idx_t = idx[~con_ts]
+                dt_resto[~con_ts] = np.maximum(times[idx_t] - times[idx_t - 1], 0.1) / 3600.0
+
+            if inicio == 0:
+                # Primer punto con timestamps: 1/3600 horas como en calcular_soc
+                dt_h[0] = 1.0 / 3600.0
+                dt_h[1:] = dt_resto
+            else:
+                dt_h[:] = dt_resto
+            return dt_h
+
+        times = segment.times[max(inicio - 1, 0):fin]
+        if inicio == 0:
+            # Primer punto: usar el primer valor o 1 segundo
+            dt_h[0] = (times[0] if times[0] > 0 else 1.0) / 3600.0
+            dt_h[1:] = np.maximum(np.diff(times), 0.1) / 3600.0
+        else:
+            dt_h[:] = np.maximum(np.diff(times), 0.1) / 3600.0
+        return dt_h
 
-        if self.idx_ruta >= len(segment["coords"]):
-            return False  # fin de este segmento
+    def _consumo(self, segment, inicio, fin):
+        """
+        Potencia eléctrica (kW) y consumos eléctrico y de combustión (kWh)
+        de cada punto entre los índices [inicio, fin) del segmento.
+        """
+        # Velocidad en m/s; la inercia del primer punto usa la velocidad
+        # del punto anterior del segmento (0 al inicio)
+        vel = segment.speeds[inicio:fin]
+        v_previa = segment.speeds[inicio - 1] if inicio > 0 else 0.0
+        theta = segment.slopes[inicio:fin] * math.pi / 180
 
-        # Velocidad en m/s 
-        vel = segment["speeds"][self.idx_ruta]
-        theta = segment["slopes"][self.idx_ruta] * math.pi / 180
-
-        # Parámetros del modelo
-        rho = self.hev.Ambient.rho  # densidad del aire
-        g = self.hev.Ambient.g     # gravedad
-        rw = self.hev.Wheel.rw     # radio de rueda
-
-        # Fuerzas
-        faero = 0.5 * rho * hev.Chassis.a * hev.Chassis.cd * (vel ** 2)
-        froll = g * hev.Chassis.m * hev.Chassis.crr * np.cos(theta)
-        fg = g * hev.Chassis.m * np.sin(theta)
-        
-        # Velocidad anterior para calcular inercia
-        if self.idx_ruta > 0:
-            v_prev = segment["speeds"][self.idx_ruta - 1]
-        else:
-            v_prev = 0
-        
-        delta_v = vel - v_prev
-        f_inertia = hev.Chassis.m * delta_v  # delta_t = 1 segundo
+        p_eb, p_cn = potencias(vel, theta, self.hybrid_cont, self.spec, v_previa)
 
-        fres = faero + froll + fg + f_inertia
+        delta_t_horas = self._delta_t_horas(segment, inicio, fin)
 
-        # Potencias en el tren motriz 
-        p_e = vel * fres
-        p_m = (fres * rw) * (vel / rw)
+        # Consumos por paso (kWh)
+        potencia_kw = p_eb / 1000.0
+        consumo_kwh = potencia_kw * delta_t_horas * 1000 / 1000
+        pcn_kwh = (p_cn / 1000.0) * delta_t_horas
+        return potencia_kw, consumo_kwh, pcn_kwh
 
-        # Parte eléctrica
-        p_eb = p_m * (1 - self.hybrid_cont) / self.eficiencia_tren
+    def estimar_cruce(self, segmentos, soc_inicial, sin_revisar=0):
+        """
+        Primer punto (segmento, índice) en el que la batería cruzaría el
+        umbral recorriendo la lista `segmentos` con `soc_inicial` kWh, sin
+        revisar el umbral en los primeros `sin_revisar` segmentos (como el
+        tramo estación -> destino después de recargar). Mismas cuentas que
+        consume_segment; no modifica el estado de la moto. Devuelve None si
+        los segmentos terminan antes de cruzarlo.
+        """
+        soc = soc_inicial
+        for s, segment in enumerate(segmentos):
+            if len(segment) == 0:
+                continue
+            _, consumo_kwh, _ = self._consumo(segment, 0, len(segment))
+            soc_tramo = np.subtract.accumulate(np.concatenate(([soc], consumo_kwh)))[1:]
+            np.maximum(soc_tramo, 0.0, out=soc_tramo)
+            if s >= sin_revisar:
+                bajo_umbral = soc_tramo < self.umbral_energia
+                if bajo_umbral.any():
+                    return s, int(np.argmax(bajo_umbral))
+            soc = float(soc_tramo[-1])
+        return None
+
+    def consume_segment(self):
+        """
+        Calcula fuerzas, potencias y consumos de todos los puntos restantes
+        del segmento actual con operaciones vectorizadas, y actualiza la batería
+        y los acumulados de consumo.
 
-        p_eb = p_eb * self.factor_correccion
-        if p_eb < 0:
-            p_eb = 0
+        Si la batería cae por debajo de umbral_energia, solo se consume hasta
+        ese punto (inclusive) y self.idx_ruta queda apuntando a él.
+        Sincronizado con calcular_soc, calcular_potencia_por_punto y calcular_consumo_y_emisiones
 
-        # Parte combustión
-        p_cn = p_m * self.hybrid_cont / 0.2
+        Devuelve True si la batería cruzó el umbral, False si se consumió
+        el segmento completo.
+        """
+        segment = self.route_data[self.idx]
 
-        if p_cn <= 0:
-            p_cn = 0
+        inicio = self.idx_ruta
+        fin = len(segment)
+        if inicio >= fin:
+            return False  # fin de este segmento
 
-        # Cálculo de delta_t 
-        if self.idx_ruta == 0:
-            # Primer punto
-            if "ts" in segment and len(segment["ts"]) > 0:
-                # Si hay timestamps, usar 1/3600 horas como en calcular_soc
-                delta_t_horas = 1.0 / 3600.0
-            else:
-                # Si hay times, usar el primer valor o 1 segundo
-                delta_t = segment["times"][0] if segment["times"][0] > 0 else 1.0
-                delta_t_horas = delta_t / 3600.0
-        else:
-            if "ts" in segment and len(segment["ts"]) > self.idx_ruta:
-                if segment["ts"][self.idx_ruta] > segment["ts"][self.idx_ruta - 1]:
-                    delta_t_ms = segment["ts"][self.idx_ruta] - segment["ts"][self.idx_ruta - 1]
-                    delta_t_horas = delta_t_ms / 1000.0 / 3600.0
-                else:
-                    delta_t_horas = 1.0 / 3600.0
-            else:
-                delta_t = max(
-                    segment["times"][self.idx_ruta] - segment["times"][self.idx_ruta - 1],
-                    0.1
-                )
-                delta_t_horas = delta_t / 3600.0
+        potencia_kw, consumo_kwh, pcn_kwh = self._consumo(segment, inicio, fin)
 
-        # Consumos en este paso (kWh)
-        potencia_kw = p_eb / 1000.0
-        consumo_wh = potencia_kw * delta_t_horas * 1000  # en Wh
-        self.pow_consumption = consumo_wh / 1000  # convertir a kWh
-        
-        # Consumo de combustión
-        self.pcn_consumption = (p_cn / 1000.0) * delta_t_horas
+        # SoC después de cada paso, restando en el mismo orden que paso a paso.
+        # El consumo nunca es negativo, así que recortar en 0 al final equivale
+        # a recortarlo en cada paso.
+        soc = np.subtract.accumulate(np.concatenate(([self.estado_bateria], consumo_kwh)))[1:]
+        np.maximum(soc, 0.0, out=soc)
+
+        # Primer punto donde la batería queda por debajo del umbral
+        cruza = False
+        n = fin - inicio
+        if not self.en_carga and not self.historial_carga[-1]:
+            bajo_umbral = soc < self.umbral_energia
+            if bajo_umbral.any():
+                n = int(np.argmax(bajo_umbral)) + 1
+                cruza = True
+
+        self.pow_consumption = float(consumo_kwh[n - 1])
+        self.pcn_consumption = float(pcn_kwh[n - 1])
 
         # Acumular consumos totales
-        self.total_electric_kwh += self.pow_consumption
-        self.total_combustion_kwh += self.pcn_consumption
+        self.total_electric_kwh = float(
+            np.add.accumulate(np.concatenate(([self.total_electric_kwh], consumo_kwh[:n])))[-1]
+        )
+        self.total_combustion_kwh = float(
+            np.add.accumulate(np.concatenate(([self.total_combustion_kwh], pcn_kwh[:n])))[-1]
+        )
 
-        # Actualización del SoC 
-        self.estado_bateria -= consumo_wh / 1000  # convertir Wh a kWh
-        if self.estado_bateria < 0:
-            self.estado_bateria = 0.0
-        
-        self.soc_history.append(self.estado_bateria)
+        self.estado_bateria = float(soc[n - 1])
+        self._soc_chunks.append(soc[:n])
 
         # Guardar potencia (kW) y posición
-        self.power.append(potencia_kw)
-        self.positions.append(segment["coords"][self.idx_ruta])
+        self._power_chunks.append(potencia_kw[:n])
+        self._position_chunks.append(segment.coords[inicio:inicio + n])
+
+        self.idx_ruta = inicio + n - 1
+        return cruza
 
-        return True
-    
     def avanzar_paso(self):
         """
-        Avanza un paso de simulación. Devuelve:
+        Avanza la simulación hasta el final del segmento actual o hasta
+        que la batería cruce el umbral de recarga. Devuelve:
         0 -> fin de la ruta
         1 -> continuar
         3 -> batería baja, hay que recargar/rutear a estación
         """
-        # 1) Consumir energía en este paso
-        if not self.consume_step():
-            self.historial_carga.append(self.en_carga)
-            # Fin del segmento actual
-            self.duration += self.route_data[self.idx]["duration"]
-            self.distance += self.route_data[self.idx]["distance"]
-
-            self.idx += 1
-            self.idx_ruta = 0
+        # 1) Consumir energía del segmento y revisar batería
+        if self.consume_segment():
+            self.en_carga = True
+            return 3  # señal: batería baja, toca recargar
 
-            # ¿se acabaron todos los segmentos?
-            if self.idx >= len(self.route_data):
-                return 0
+        self.historial_carga.append(self.en_carga)
+        # Fin del segmento actual
+        self.duration += self.route_data[self.idx].duration
+        self.distance += self.route_data[self.idx].distance
 
-            # Si estaba en carga al final del segmento, completar la carga
-            if self.en_carga:
-                self.cargar()
+        self.idx += 1
+        self.idx_ruta = 0
 
-            return 1
+        # ¿se acabaron todos los segmentos?
+        if self.idx >= len(self.route_data):
+            return 0
 
-        # 2) Revisar batería
-        if self.estado_bateria < self.umbral_energia and not self.en_carga and not self.historial_carga[-1]:
-            self.en_carga = True
-            return 3  # señal: batería baja, toca recargar
+        # Si estaba en carga al final del segmento, completar la carga
+        if self.en_carga:
+            self.cargar()
 
-        # 3) Avanzar al siguiente índice dentro del segmento
-        self.idx_ruta += 1
-        return 1
\ No newline at end of file
+        return 1
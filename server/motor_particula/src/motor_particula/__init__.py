@@ -0,0 +1,31 @@
+"""
+Motor de física del modelo de partícula, compartido por el servidor
+(moto.py, HybridBikeConsumptionModel.particle_model) y los modelos de
+simulación (procesar_rutas, telemetry, calcular_costo_viaje_aleatorio,
+Modelo_moto). Cada uno pasa su VehicleSpec con su calibración.
+TablaPotencia (tabla.py) es el modo tabulado, con cota de error.
+
+Desde server/ se importa directamente; en otros entornos se instala con
+    pip install server/motor_particula
+"""
+from motor_particula.nucleo import (
+    fuerzas, fuerzas_kmh, pasos_tiempo, potencias, potencias_kmh,
+)
+from motor_particula.spec import (
+    CALIBRACION_SERVIDOR, CALIBRACION_TELEMETRIA, SPEC_TELEMETRIA, VehicleSpec,
+)
+from motor_particula.tabla import TablaPotencia, tabla_para
+
+__all__ = [
+    "VehicleSpec",
+    "CALIBRACION_SERVIDOR",
+    "CALIBRACION_TELEMETRIA",
+    "SPEC_TELEMETRIA",
+    "fuerzas",
+    "fuerzas_kmh",
+    "potencias",
+    "potencias_kmh",
+    "pasos_tiempo",
+    "TablaPotencia",
+    "tabla_para",
+]
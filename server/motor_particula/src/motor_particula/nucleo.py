@@ -0,0 +1,68 @@
+"""
+Núcleo vectorizado del modelo de partícula: fuerzas y potencias de todos
+los puntos de un perfil a la vez, un punto por segundo.
+
+Trabaja en unidades SI (velocidad en m/s, pendiente en radianes); las
+funciones *_kmh reciben el perfil como lo entregan rutas y telemetría
+(km/h y grados).
+"""
+import math
+
+import numpy as np
+
+
+def fuerzas(vel, theta, spec, v_previa=0.0):
+    """
+    Fuerzas [N] en cada punto: (aerodinámica, rodadura, gravedad, inercia).
+    La inercia usa la diferencia con la velocidad del punto anterior
+    (v_previa para el primero) con dt = 1 s.
+    """
+    vel = np.asarray(vel, dtype=float)
+    theta = np.asarray(theta, dtype=float)
+    faero = 0.5 * spec.rho * spec.a * spec.cd * (vel ** 2)
+    froll = spec.g * spec.m * spec.crr * np.cos(theta)
+    fg = spec.g * spec.m * np.sin(theta)
+    f_inertia = spec.m * np.diff(vel, prepend=v_previa)
+    return faero, froll, fg, f_inertia
+
+
+def potencias(vel, theta, hybrid_cont, spec, v_previa=0.0):
+    """Potencia eléctrica y de combustión [W] en cada punto (ver VehicleSpec)."""
+    faero, froll, fg, f_inertia = fuerzas(vel, theta, spec, v_previa)
+    fres = faero + froll + fg + f_inertia
+
+    vel = np.asarray(vel, dtype=float)
+    p_m = (fres * spec.rw) * (vel / spec.rw)
+    p_eb = p_m * (1 - hybrid_cont) / spec.eficiencia_tren * spec.factor_correccion
+    p_cn = p_m * hybrid_cont / spec.eficiencia_cn * spec.factor_correccion_cn
+    if spec.recortar_electrica:
+        p_eb = np.maximum(p_eb, 0.0)
+    return p_eb, np.maximum(p_cn, 0.0)
+
+
+def _a_si(speeds, slopes):
+    vel = np.asarray(speeds, dtype=float) / 3.6
+    theta = np.asarray(slopes, dtype=float) * math.pi / 180
+    return vel, theta
+
+
+def fuerzas_kmh(speeds, slopes, spec):
+    """fuerzas() con velocidades en km/h y pendientes en grados."""
+    return fuerzas(*_a_si(speeds, slopes), spec)
+
+
+def potencias_kmh(speeds, slopes, hybrid_cont, spec):
+    """potencias() con velocidades en km/h y pendientes en grados."""
+    return potencias(*_a_si(speeds, slopes), hybrid_cont, spec)
+
+
+def pasos_tiempo(tiempos):
+    """
+    Duración [s] asignada a cada punto: tiempos[0] para el primero (1 s si
+    no es positivo) y la diferencia con el anterior, mínimo 0.1 s, para el resto.
+    """
+    tiempos = np.asarray(tiempos, dtype=float)
+    delta_t = np.maximum(np.diff(tiempos, prepend=0.0), 0.1)
+    if len(tiempos):
+        delta_t[0] = tiempos[0] if tiempos[0] > 0 else 1.0
+    return delta_t
@@ -0,0 +1,73 @@
+"""
+Especificación del vehículo para el modelo de partícula.
+
+Reúne en un solo objeto los parámetros físicos (masa, área frontal,
+coeficientes de arrastre y rodadura, radio de rueda, ambiente) y los de
+calibración del tren motriz, que hoy difieren entre el servidor y los
+modelos de simulación.
+"""
+
+
+class VehicleSpec:
+    """
+    Parámetros del modelo de partícula.
+
+    m [kg], a [m²], cd, crr, rho [kg/m³], g [m/s²], rw [m]
+    eficiencia_tren / factor_correccion: potencia eléctrica =
+        p_m * (1 - hybrid_cont) / eficiencia_tren * factor_correccion
+    eficiencia_cn / factor_correccion_cn: lo mismo para combustión
+    recortar_electrica: si la potencia eléctrica negativa (frenada) se
+        recorta a cero; la de combustión se recorta siempre
+    """
+
+    __slots__ = (
+        "m", "a", "cd", "crr", "rho", "g", "rw",
+        "eficiencia_tren", "factor_correccion",
+        "eficiencia_cn", "factor_correccion_cn", "recortar_electrica",
+    )
+
+    def __init__(self, m=140.0, a=0.74, cd=0.3, crr=0.01, rho=1.225, g=9.81, rw=0.3,
+                 eficiencia_tren=0.85, factor_correccion=1.0,
+                 eficiencia_cn=0.2, factor_correccion_cn=1.0, recortar_electrica=True):
+        self.m = m
+        self.a = a
+        self.cd = cd
+        self.crr = crr
+        self.rho = rho
+        self.g = g
+        self.rw = rw
+        self.eficiencia_tren = eficiencia_tren
+        self.factor_correccion = factor_correccion
+        self.eficiencia_cn = eficiencia_cn
+        self.factor_correccion_cn = factor_correccion_cn
+        self.recortar_electrica = recortar_electrica
+
+    @classmethod
+    def desde_hev(cls, hev, **calibracion):
+        """Spec con la física de un HEV de HybridBikeConsumptionModel.parameters_*."""
+        return cls(
+            m=hev.Chassis.m, a=hev.Chassis.a, cd=hev.Chassis.cd, crr=hev.Chassis.crr,
+            rho=hev.Ambient.rho, g=hev.Ambient.g, rw=hev.Wheel.rw,
+            **calibracion,
+        )
+
+    def con(self, **cambios):
+        """Copia con algunos parámetros cambiados."""
+        valores = {k: getattr(self, k) for k in self.__slots__}
+        valores.update(cambios)
+        return VehicleSpec(**valores)
+
+    def __repr__(self):
+        valores = ", ".join(f"{k}={getattr(self, k)!r}" for k in self.__slots__)
+        return f"VehicleSpec({valores})"
+
+
+# Calibración con los 1708 puntos de telemetría real (telemetry.py):
+# eficiencia 85 % y factor 1.617 (potencia real / potencia modelo)
+CALIBRACION_TELEMETRIA = {"eficiencia_tren": 0.85, "factor_correccion": 1.617}
+
+# Calibración usada por el simulador del servidor (moto.py)
+CALIBRACION_SERVIDOR = {"eficiencia_tren": 0.95, "factor_correccion": 0.959}
+
+# Moto eléctrica de referencia de telemetry.py y Modelo_moto.py
+SPEC_TELEMETRIA = VehicleSpec(m=140.0, a=0.74, cd=0.3, crr=0.01, **CALIBRACION_TELEMETRIA)
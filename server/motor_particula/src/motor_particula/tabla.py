@@ -0,0 +1,138 @@
+"""
+Modo tabulado del modelo de partícula.
+
+Con la física del vehículo fija, la potencia mecánica en cada punto es
+
+    p_m = v * (k * v² + m * Δv + g * m * (crr * cos θ + sin θ)),  k = ½ ρ a cd
+
+es decir, cúbica en v, afín en Δv y trigonométrica solo en θ. La grilla
+(v, Δv, θ) se reduce por eso a una tabla en θ: interpolar en v o en Δv
+solo agregaría error (y en numpy, juntar las 4 u 8 esquinas de una celda
+cuesta más que el coseno y el seno que se ahorran). La tabla guarda el
+término de pendiente crr * cos θ + sin θ, que solo depende de crr, y los
+perfiles se evalúan con una búsqueda + interpolación lineal (o el punto
+más cercano) en lugar de np.cos / np.sin.
+
+Los puntos con |θ| > theta_max se calculan con la fórmula analítica.
+
+Uso:
+    from motor_particula import SPEC_TELEMETRIA, tabla_para
+    tabla = tabla_para(SPEC_TELEMETRIA)
+    p_eb, p_cn = tabla.potencias_kmh(speeds, slopes, hybrid_cont)
+    tabla.cota_error(hybrid_cont)  # W, máximo respecto a potencias_kmh
+"""
+import math
+
+import numpy as np
+
+from motor_particula.nucleo import potencias
+
+MODOS = ("lineal", "cercano")
+
+
+class TablaPotencia:
+    """Término de pendiente tabulado para un VehicleSpec."""
+
+    def __init__(self, spec, theta_max=math.radians(30), puntos=4097, modo="lineal",
+                 v_max=120 / 3.6):
+        if modo not in MODOS:
+            raise ValueError(f"modo debe ser uno de {MODOS}, no {modo!r}")
+        self.spec = spec
+        self.modo = modo
+        self.theta_max = theta_max
+        self.v_max = v_max
+        self.theta = np.linspace(-theta_max, theta_max, puntos)
+        self.paso = self.theta[1] - self.theta[0]
+        self.pendiente = spec.crr * np.cos(self.theta) + np.sin(self.theta)
+        # Un valor repetido al final: el índice superior nunca se sale
+        self._pendiente = np.append(self.pendiente, self.pendiente[-1])
+
+    def termino_pendiente(self, theta):
+        """crr * cos θ + sin θ tabulado; los puntos fuera de la tabla van exactos."""
+        theta = np.asarray(theta, dtype=float)
+        x = (theta + self.theta_max) / self.paso
+        fuera = (x < 0) | (x > len(self.theta) - 1)
+        x = np.clip(x, 0, len(self.theta) - 1)
+
+        if self.modo == "cercano":
+            h = self._pendiente[np.rint(x).astype(np.intp)]
+        else:
+            i = x.astype(np.intp)
+            t = x - i
+            h0 = self._pendiente[i]
+            h = h0 + (self._pendiente[i + 1] - h0) * t
+
+        if fuera.any():
+            theta_f = theta[fuera]
+            h[fuera] = self.spec.crr * np.cos(theta_f) + np.sin(theta_f)
+        return h
+
+    def potencias(self, vel, theta, hybrid_cont, v_previa=0.0):
+        """Igual que nucleo.potencias pero con el término de pendiente tabulado."""
+        spec = self.spec
+        vel = np.asarray(vel, dtype=float)
+        h = self.termino_pendiente(theta)
+
+        fres = (0.5 * spec.rho * spec.a * spec.cd * (vel ** 2)
+                + spec.g * spec.m * h
+                + spec.m * np.diff(vel, prepend=v_previa))
+        p_m = fres * vel
+        p_eb = p_m * (1 - hybrid_cont) / spec.eficiencia_tren * spec.factor_correccion
+        p_cn = p_m * hybrid_cont / spec.eficiencia_cn * spec.factor_correccion_cn
+        if spec.recortar_electrica:
+            p_eb = np.maximum(p_eb, 0.0)
+        return p_eb, np.maximum(p_cn, 0.0)
+
+    def potencias_kmh(self, speeds, slopes, hybrid_cont):
+        """potencias() con velocidades en km/h y pendientes en grados."""
+        vel = np.asarray(speeds, dtype=float) / 3.6
+        theta = np.asarray(slopes, dtype=float) * math.pi / 180
+        return self.potencias(vel, theta, hybrid_cont)
+
+    def cota_pendiente(self):
+        """Error máximo del término de pendiente tabulado (adimensional)."""
+        crr = self.spec.crr
+        if self.modo == "cercano":
+            # |h'| = |cos θ - crr sin θ| <= sqrt(1 + crr²), a lo sumo medio paso
+            return self.paso / 2 * math.sqrt(1 + crr ** 2)
+        # Interpolación lineal: h² / 8 * max|h''|, |h''| <= crr + sin θ_max
+        return self.paso ** 2 / 8 * (crr + math.sin(self.theta_max))
+
+    def cota_error(self, hybrid_cont, v_max=None):
+        """
+        Cota del error [W] respecto a la fórmula analítica, para velocidades
+        hasta v_max [m/s]: (eléctrica, combustión). El recorte a cero no la
+        agranda (max(x, 0) no aumenta distancias).
+        """
+        spec = self.spec
+        v_max = self.v_max if v_max is None else v_max
+        error_mecanica = spec.g * spec.m * v_max * self.cota_pendiente()
+        return (
+            error_mecanica * abs(1 - hybrid_cont) / spec.eficiencia_tren * spec.factor_correccion,
+            error_mecanica * abs(hybrid_cont) / spec.eficiencia_cn * spec.factor_correccion_cn,
+        )
+
+    def error_medido(self, vel, theta, hybrid_cont, v_previa=0.0):
+        """Error máximo [W] observado en un perfil: (eléctrica, combustión)."""
+        exacta = potencias(vel, theta, hybrid_cont, self.spec, v_previa)
+        tabulada = self.potencias(vel, theta, hybrid_cont, v_previa)
+        return tuple(
+            float(np.max(np.abs(t - e))) if len(e) else 0.0
+            for t, e in zip(tabulada, exacta)
+        )
+
+
+# Tablas ya construidas, por física del vehículo y resolución
+_tablas = {}
+
+
+def tabla_para(spec, modo="lineal", puntos=4097, theta_max=math.radians(30)):
+    """
+    Tabla de spec, reutilizada entre llamadas: la búsqueda depende solo de
+    crr, pero la tabla guarda el spec completo para evaluar potencias.
+    """
+    clave = (tuple(getattr(spec, k) for k in spec.__slots__), modo, puntos, theta_max)
+    tabla = _tablas.get(clave)
+    if tabla is None:
+        tabla = _tablas[clave] = TablaPotencia(spec, theta_max, puntos, modo)
+    return tabla
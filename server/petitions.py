@@ -1,6 +1,9 @@
 import httpx, json
 from typing import Any, Dict, List, Tuple
 from fastapi import HTTPException
+from route_cache import route_cache
+from capture import registrar_upstream
+from metrics import etapa
 
 PROFILE_MAP = {
     "driving": "driving-car",
@@ -8,6 +11,9 @@ PROFILE_MAP = {
     "cycling": "cycling-regular",
 }
 
+# Franja de salida usada para las rutas con tráfico de Azure
+AZURE_DEPART_AT = "2025-10-30T" + "08:00:00" + "-05:00"
+
 def _to2d(coords):
     """
     Acepta puntos [lon,lat] o [lon,lat,alt] y devuelve solo [lon,lat].
@@ -58,9 +64,22 @@ async def _fetch_ors_route(
             "weight_factor": float(alt_weight),
         }
 
+    cache_key = route_cache.make_key(
+        "ors", profile_key, coords2d,
+        instructions=data["instructions"],
+        geometry=data["geometry"],
+        options=data["options"],
+        alternative_routes=data.get("alternative_routes"),
+    )
+    cached = await route_cache.get("ors", cache_key)
+    if cached is not None:
+        registrar_upstream("ors", cache_key, cached)
+        return cached
+
     url = f"https://api.openrouteservice.org/v2/directions/driving-car/geojson"
 
-    resp = await client.post(url, headers=headers, json=data)
+    with etapa("ors"):
+        resp = await client.post(url, headers=headers, json=data)
     if resp.status_code >= 400:
         try:
             print("ORS ERROR:", resp.status_code, resp.text[:500])
@@ -80,9 +99,8 @@ async def _fetch_ors_route(
 
     principal = feats[0]
 
-    with open("resources/examples/petition_raw_ors.json","w") as f:
-        json.dump(principal,f,indent=2)
-    
+    registrar_upstream("ors", cache_key, principal)
+    await route_cache.set("ors", cache_key, principal)
     return principal
 
 async def _fecth_alt(
@@ -90,6 +108,12 @@ async def _fecth_alt(
     token: str,
     coords: List[Tuple[float, float]]
 )->List[Tuple[float,float,float]]:
+    cache_key = route_cache.make_key("elevation", "line", coords)
+    cached = await route_cache.get("elevation", cache_key)
+    if cached is not None:
+        registrar_upstream("elevation", cache_key, cached)
+        return cached
+
     url = "https://api.openrouteservice.org/elevation/line"
     headers = {
         "Authorization": token,
@@ -105,10 +129,13 @@ async def _fecth_alt(
         "geometry": geometry_latlng
     }
 
-    response = await client.post(url, headers=headers, json=payload)
+    with etapa("elevation"):
+        response = await client.post(url, headers=headers, json=payload)
     if response.status_code != 200:
         raise Exception(f"Error elevación: {response.text}")
     data = response.json()
+    registrar_upstream("elevation", cache_key, data['geometry']['coordinates'])
+    await route_cache.set("elevation", cache_key, data['geometry']['coordinates'])
     return data['geometry']['coordinates']
 
 async def _fetch_azure_route(
@@ -116,7 +143,14 @@ async def _fetch_azure_route(
     token: str,
     coords: List[Tuple[float, float]]
 ) -> Dict[str, Any]:
-    
+    cache_key = route_cache.make_key(
+        "azure", "driving", coords, traffic=True, departure=AZURE_DEPART_AT
+    )
+    cached = await route_cache.get("azure", cache_key)
+    if cached is not None:
+        registrar_upstream("azure", cache_key, cached)
+        return cached
+
     features = []
     for idx, (lon, lat) in enumerate(coords):
         point_type = "waypoint" if idx in (0, len(coords) - 1) else "viaWaypoint"
@@ -131,8 +165,6 @@ async def _fetch_azure_route(
                 "pointType": point_type
             }
         })
-    date = "2025-10-30T" + "08:00:00" + "-05:00" 
-
     body = {
         "type": "FeatureCollection",
         "features": features,
@@ -140,20 +172,24 @@ async def _fetch_azure_route(
         "routeOutputOptions": ["itinerary","routePath"],
         "maxRouteCount": 1,
         "travelMode": "driving",
-        "departAt": date
+        "departAt": AZURE_DEPART_AT
     }
 
     url = "https://atlas.microsoft.com/route/directions"
     params = {"api-version": "2025-01-01"}
 
-    response = await client.post(
-        url=url,
-        params=params,
-        headers={
-            "Content-Type": "application/json; charset=UTF-8",
-            "subscription-key": token
-        },
-        json=body
-    )
+    with etapa("azure"):
+        response = await client.post(
+            url=url,
+            params=params,
+            headers={
+                "Content-Type": "application/json; charset=UTF-8",
+                "subscription-key": token
+            },
+            json=body
+        )
     response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    data = response.json()
+    registrar_upstream("azure", cache_key, data)
+    await route_cache.set("azure", cache_key, data)
+    return data
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Perfilador por muestreo del ciclo de eventos, opcional.
+
+Un hilo aparte toma cada PROFILE_INTERVAL_MS la pila del hilo del ciclo
+de eventos (donde corren la simulación, manage_segments y la
+serialización) y cuenta cuántas veces aparece cada pila. El resultado
+sale en formato "collapsed" (una pila por línea, marcos separados por
+";" y el número de muestras), que leen flamegraph.pl y speedscope.
+
+Se activa con PROFILE_ENABLED=true o en caliente con PUT /profile; las
+muestras se leen con GET /profile. Con el perfilador apagado no hay
+ningún costo.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() == "true"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+# Marcos que se guardan en pilas muy profundas (los más cercanos a la hoja)
+MAX_PROFUNDIDAD = 128
+
+
+def _marco(frame) -> str:
+    codigo = frame.f_code
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+
+def _en_espera(frame) -> bool:
+    # El ciclo de eventos sin trabajo queda bloqueado en selector.select()
+    return os.path.basename(frame.f_code.co_filename) == "selectors.py"
+
+
+class Perfilador:
+    """Muestreo de la pila de un hilo, acumulado en pilas colapsadas."""
+
+    def __init__(self, intervalo_ms: float = PROFILE_INTERVAL_MS):
+        self.intervalo_ms = intervalo_ms
+        self.pilas: Counter = Counter()
+        self.muestras = 0
+        self.en_espera = 0
+        self._hilo_objetivo: Optional[int] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._detener: Optional[threading.Event] = None
+
+    @property
+    def activo(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def estado(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.activo,
+            "interval_ms": self.intervalo_ms,
+            "samples": self.muestras,
+            "idle_samples": self.en_espera,
+            "stacks": len(self.pilas),
+        }
+
+    def iniciar(self, hilo_objetivo: Optional[int] = None) -> None:
+        """Empieza a muestrear hilo_objetivo (por defecto, el hilo que llama)."""
+        if self.activo:
+            return
+        self._hilo_objetivo = hilo_objetivo or threading.get_ident()
+        # Un evento por hilo: si se reinicia antes de que el anterior
+        # termine, cada uno mira solo su propia señal
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(
+            target=self._muestrear, args=(self._detener, self._hilo_objetivo), name="perfilador", daemon=True
+        )
+        self._hilo.start()
+
+    def detener(self) -> None:
+        """
+        Avisa al hilo que pare, sin esperarlo: se llama desde el ciclo de
+        eventos y el hilo termina solo en menos de un intervalo.
+        """
+        if self._hilo is None:
+            return
+        self._detener.set()
+        self._hilo = None
+        self._detener = None
+
+    def reiniciar(self) -> None:
+        self.pilas = Counter()
+        self.muestras = 0
+        self.en_espera = 0
+
+    def colapsado(self, minimo: int = 1) -> str:
+        """Pilas con al menos `minimo` muestras, de la más a la menos frecuente."""
+        return "".join(
+            f"{pila} {n}\n" for pila, n in self.pilas.most_common() if n >= minimo
+        )
+
+    def _muestrear(self, detener: threading.Event, hilo_objetivo: int) -> None:
+        intervalo = self.intervalo_ms / 1000
+        while not detener.wait(intervalo):
+            frame = sys._current_frames().get(hilo_objetivo)
+            if frame is None or detener.is_set():
+                continue
+            self.muestras += 1
+            if _en_espera(frame):
+                self.en_espera += 1
+                continue
+            marcos = []
+            while frame is not None:
+                marcos.append(_marco(frame))
+                frame = frame.f_back
+            # marcos va de la hoja a la raíz: se cortan los de la raíz
+            self.pilas[";".join(reversed(marcos[:MAX_PROFUNDIDAD]))] += 1
+
+
+perfilador = Perfilador()
@@ -0,0 +1,121 @@
+"""
+Re-ejecuta peticiones capturadas (ver capture.py) contra el simulador,
+sin red: las respuestas de ORS / Azure / elevación salen de la captura.
+
+    python replay.py resources/cache/captures/20251030T130000-ab12cd34.json
+    python replay.py resources/cache/captures --out resultado.json
+
+Compara la salida de cada vehículo con la capturada y termina con
+código 1 si alguna difiere.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+from typing import Any, Dict, List
+
+import httpx
+
+from http_pool import HttpPool
+from main import RoutesRequest, _tareas_flota
+from route_cache import route_cache
+from stations import StationRegistry
+
+
+class _PoolSinRed(HttpPool):
+    """Pool cuyos clientes fallan al instante: todo debe venir de la captura."""
+
+    def client(self, upstream: str) -> httpx.AsyncClient:
+        if upstream not in self._clients:
+            def sin_red(request: httpx.Request):
+                raise httpx.ConnectError(
+                    f"Respuesta de {upstream} ausente en la captura", request=request
+                )
+            self._clients[upstream] = httpx.AsyncClient(transport=httpx.MockTransport(sin_red))
+        return self._clients[upstream]
+
+
+async def _cargar_upstreams(upstream: List[Dict[str, Any]]) -> None:
+    # Solo memoria, sin vencimiento y con espacio para toda la captura
+    route_cache.cache_dir = None
+    route_cache.ttls = {p: math.inf for p in ("ors", "azure", "elevation")}
+    route_cache.max_items = max(route_cache.max_items, len(upstream))
+    for u in upstream:
+        await route_cache.set(u["provider"], u["key"], u["response"])
+
+
+def _comparar(capturada: List[Dict[str, Any]], nueva: List[Dict[str, Any]]) -> List[str]:
+    antes = {r["vehicle_id"]: {k: v for k, v in r.items() if k != "index"} for r in capturada}
+    diferencias = []
+    for r in nueva:
+        previo = antes.get(r["vehicle_id"])
+        if previo is None:
+            diferencias.append(f"{r['vehicle_id']}: no estaba en la captura")
+            continue
+        claves = sorted(k for k in set(previo) | set(r) if previo.get(k) != r.get(k))
+        if claves:
+            diferencias.append(f"{r['vehicle_id']}: difiere en {', '.join(claves)}")
+    return diferencias
+
+
+async def replay(ruta: str) -> Dict[str, Any]:
+    with open(ruta, "r") as f:
+        datos = json.load(f)
+
+    await _cargar_upstreams(datos["upstream"])
+    body = RoutesRequest(**datos["input"])
+    station_index = StationRegistry().get(body.options.city)
+
+    http = _PoolSinRed()
+    try:
+        resultados = await asyncio.gather(*_tareas_flota(body, http, station_index))
+    finally:
+        await http.aclose()
+
+    # Ida y vuelta por JSON para comparar en los mismos tipos que la captura
+    resultados = json.loads(json.dumps(resultados))
+    return {
+        "id": datos.get("id"),
+        "output": resultados,
+        "diferencias": _comparar(datos["output"], resultados),
+    }
+
+
+def _archivos(rutas: List[str]) -> List[str]:
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            archivos += sorted(
+                os.path.join(ruta, n) for n in os.listdir(ruta) if n.endswith(".json")
+            )
+        else:
+            archivos.append(ruta)
+    return archivos
+
+
+async def main(rutas: List[str], salida: str = None) -> int:
+    reportes = []
+    for archivo in _archivos(rutas):
+        reporte = await replay(archivo)
+        reportes.append(reporte)
+        estado = "OK" if not reporte["diferencias"] else "DIFIERE"
+        print(f"{estado} {archivo}")
+        for d in reporte["diferencias"]:
+            print("   ", d)
+
+    if salida:
+        with open(salida, "w") as f:
+            json.dump(reportes, f)
+
+    return 1 if any(r["diferencias"] for r in reportes) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-ejecuta capturas de /routes sin red")
+    parser.add_argument("rutas", nargs="+", help="Archivos de captura o directorios")
+    parser.add_argument("--out", help="Guardar las salidas re-ejecutadas en este JSON")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args.rutas, args.out)))
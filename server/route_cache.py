@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# TTL por proveedor (segundos). Las rutas con tráfico envejecen más rápido
+# que las rutas ORS y las elevaciones prácticamente no cambian.
+DEFAULT_TTLS = {
+    "ors": int(os.getenv("ROUTE_CACHE_TTL_ORS", str(7 * 24 * 3600))),
+    "azure": int(os.getenv("ROUTE_CACHE_TTL_AZURE", str(24 * 3600))),
+    "elevation": int(os.getenv("ROUTE_CACHE_TTL_ELEVATION", str(30 * 24 * 3600))),
+}
+
+
+class RouteCache:
+    """
+    Caché de respuestas de ruteo direccionada por contenido.
+
+    Tiene dos niveles: un LRU en memoria y un directorio en disco
+    (<cache_dir>/<proveedor>/<hash>.json). Los valores se guardan como JSON
+    serializado, así cada acierto devuelve una copia nueva que el llamador
+    puede modificar sin afectar la caché.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str],
+        max_items: int = 512,
+        decimals: int = 5,
+        ttls: Optional[Dict[str, int]] = None,
+    ):
+        self.cache_dir = cache_dir or None
+        self.max_items = max_items
+        self.decimals = decimals
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+
+        self._memoria: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    # =================== LLAVES ===================
+    def make_key(
+        self,
+        provider: str,
+        profile: str,
+        coords: List[List[float]],
+        traffic: bool = False,
+        departure: Optional[str] = None,
+        **extra: Any,
+    ) -> str:
+        """
+        Llave estable a partir del perfil, las coordenadas redondeadas,
+        la bandera de tráfico, la franja de salida y cualquier otro
+        parámetro que cambie la respuesta del proveedor.
+        """
+        contenido = {
+            "provider": provider,
+            "profile": profile,
+            "coords": [[round(float(c), self.decimals) for c in pt] for pt in coords],
+            "traffic": bool(traffic),
+            "departure": departure,
+            "extra": extra,
+        }
+        raw = json.dumps(contenido, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # =================== LECTURA / ESCRITURA ===================
+    async def get(self, provider: str, key: str) -> Optional[Any]:
+        stats = self._stats_de(provider)
+        ttl = self.ttls.get(provider, 0)
+        ahora = time.time()
+
+        entrada = self._memoria.get(key)
+        if entrada is not None:
+            guardado, payload = entrada
+            if ahora - guardado <= ttl:
+                self._memoria.move_to_end(key)
+                stats["memory_hits"] += 1
+                return json.loads(payload)
+            del self._memoria[key]
+
+        if self.cache_dir:
+            leido = await asyncio.to_thread(self._leer_disco, provider, key, ttl, ahora)
+            if leido is not None:
+                guardado, payload = leido
+                self._guardar_memoria(key, guardado, payload)
+                stats["disk_hits"] += 1
+                return json.loads(payload)
+
+        stats["misses"] += 1
+        return None
+
+    async def set(self, provider: str, key: str, value: Any) -> None:
+        payload = json.dumps(value, separators=(",", ":"))
+        guardado = time.time()
+        self._guardar_memoria(key, guardado, payload)
+        if self.cache_dir:
+            await asyncio.to_thread(self._escribir_disco, provider, key, payload)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory_items": len(self._memoria),
+            "disk": bool(self.cache_dir),
+            "providers": {p: dict(s) for p, s in self._stats.items()},
+        }
+
+    # =================== INTERNOS ===================
+    def _stats_de(self, provider: str) -> Dict[str, int]:
+        if provider not in self._stats:
+            self._stats[provider] = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        return self._stats[provider]
+
+    def _guardar_memoria(self, key: str, guardado: float, payload: str) -> None:
+        self._memoria[key] = (guardado, payload)
+        self._memoria.move_to_end(key)
+        while len(self._memoria) > self.max_items:
+            self._memoria.popitem(last=False)
+
+    def _ruta_disco(self, provider: str, key: str) -> str:
+        return os.path.join(self.cache_dir, provider, f"{key}.json")
+
+    def _leer_disco(self, provider: str, key: str, ttl: int, ahora: float):
+        ruta = self._ruta_disco(provider, key)
+        try:
+            guardado = os.path.getmtime(ruta)
+            if ahora - guardado > ttl:
+                os.remove(ruta)
+                return None
+            with open(ruta, "r") as f:
+                return guardado, f.read()
+        except OSError:
+            return None
+
+    def _escribir_disco(self, provider: str, key: str, payload: str) -> None:
+        ruta = self._ruta_disco(provider, key)
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            # Escritura atómica para no dejar archivos a medias entre peticiones concurrentes
+            tmp = f"{ruta}.{os.getpid()}.{id(payload)}.tmp"
+            with open(tmp, "w") as f:
+                f.write(payload)
+            os.replace(tmp, ruta)
+        except OSError as e:
+            print("ROUTE CACHE: no se pudo escribir en disco:", e)
+
+
+route_cache = RouteCache(
+    cache_dir=os.getenv("ROUTE_CACHE_DIR", "resources/cache/routes"),
+    max_items=int(os.getenv("ROUTE_CACHE_SIZE", "512")),
+    decimals=int(os.getenv("ROUTE_CACHE_DECIMALS", "5")),
+)
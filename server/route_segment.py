@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class RouteSegment:
+    """
+    Tramo de ruta en formato columnar: cada atributo es un arreglo
+    contiguo de float64 en lugar de listas de listas de Python.
+
+    coords: (n, 3) con [lng, lat, alt]
+    speeds: (n,) en m/s
+    slopes: (n,) en grados
+    times:  (n,) en segundos desde el inicio del tramo
+    ts:     (n,) timestamps en ms, opcional
+    """
+
+    __slots__ = ("coords", "speeds", "slopes", "times", "ts", "distance", "duration")
+
+    def __init__(self, coords, speeds, slopes, times, distance=0.0, duration=0.0, ts=None):
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        self.speeds = np.asarray(speeds, dtype=float)
+        self.slopes = np.asarray(slopes, dtype=float)
+        self.times = np.asarray(times, dtype=float)
+        self.ts = None if ts is None else np.asarray(ts, dtype=float)
+        self.distance = distance
+        self.duration = duration
+
+    def __len__(self):
+        return len(self.coords)
+
+    def truncar(self, fin):
+        """
+        Tramo con solo los primeros `fin` puntos. Devuelve vistas sobre
+        los mismos buffers, sin copiar datos.
+        """
+        return RouteSegment(
+            self.coords[:fin],
+            self.speeds[:fin],
+            self.slopes[:fin],
+            self.times[:fin],
+            distance=self.distance,
+            duration=self.duration,
+            ts=None if self.ts is None else self.ts[:fin],
+        )
+
+    def interpolar(self, puntos_intermedios=10):
+        """
+        Tramo nuevo con `puntos_intermedios` puntos interpolados
+        linealmente entre cada par de puntos originales.
+        """
+        n_original = len(self)
+        if n_original < 2:
+            return self
+        n_nuevo = n_original + (n_original - 1) * puntos_intermedios
+
+        x_original = np.arange(n_original)
+        x_nuevo = np.linspace(0, n_original - 1, n_nuevo)
+
+        coords = np.empty((n_nuevo, 3))
+        for i in range(3):
+            coords[:, i] = np.interp(x_nuevo, x_original, self.coords[:, i])
+
+        return RouteSegment(
+            coords,
+            np.interp(x_nuevo, x_original, self.speeds),
+            np.interp(x_nuevo, x_original, self.slopes),
+            np.interp(x_nuevo, x_original, self.times),
+            distance=self.distance,
+            duration=self.duration,
+        )
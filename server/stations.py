@@ -0,0 +1,191 @@
+import json
+import math
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi import Request
+
+from geo import RADIO_TIERRA_M, haversine_m, vincenty_m
+
+ESTACIONES_DIR = "resources/data/estaciones"
+ARCHIVOS_ESTACIONES = {
+    "amva": "estaciones_amva.json",
+    "bog": "estaciones_bog.json",
+    "med": "estaciones_med.json",
+}
+
+# Diferencia máxima entre haversine (esfera) y geodesic (elipsoide WGS84).
+# Los candidatos dentro de este margen se desempatan sobre el elipsoide.
+MARGEN_ESFERA = 0.012
+
+
+class StationIndex:
+    """
+    Índice espacial de estaciones de carga sobre una grilla de celdas
+    lon/lat. Responde cuál estación minimiza el desvío
+    actual -> estación -> destino sin recorrer todas las estaciones.
+    """
+
+    def __init__(self, estaciones: Dict[str, Any], cell_deg: float = 0.05):
+        self.estaciones = estaciones
+        self.cell_deg = cell_deg
+
+        coords = np.asarray(estaciones["coords"], dtype=float).reshape(-1, 2)
+        self.lon = coords[:, 0]
+        self.lat = coords[:, 1]
+
+        celdas = np.floor(coords / cell_deg).astype(int)
+        self._buckets: Dict[tuple, np.ndarray] = {}
+        if len(coords):
+            orden = np.lexsort((celdas[:, 1], celdas[:, 0]))
+            claves, inicios = np.unique(celdas[orden], axis=0, return_index=True)
+            for clave, idx in zip(claves, np.split(orden, inicios[1:])):
+                self._buckets[(int(clave[0]), int(clave[1]))] = idx
+
+            self._cmin = celdas.min(axis=0)
+            self._cmax = celdas.max(axis=0)
+            # Lado mínimo de una celda en metros (el de longitud se encoge con la latitud)
+            lat_max = min(np.abs(coords[:, 1]).max() + cell_deg, 89.0)
+            self._cell_m = (
+                math.radians(cell_deg) * RADIO_TIERRA_M * math.cos(math.radians(lat_max))
+            )
+
+    def __len__(self) -> int:
+        return len(self.lon)
+
+    def mejor_desvio(self, current_pos: List[float], destiny: List[float]) -> int:
+        """
+        Índice de la estación que minimiza
+        geodesic(actual, estación) + geodesic(estación, destino).
+        """
+        idx, costo = self._candidatos(current_pos, destiny, 1)
+        mejor = float(costo.min())
+
+        # Desempate sobre el elipsoide entre los candidatos casi óptimos
+        cercanos = np.unique(idx[costo <= mejor * (1 + MARGEN_ESFERA)])
+        if len(cercanos) == 1:
+            return int(cercanos[0])
+
+        # Ambos tramos (actual -> estación y estación -> destino) en una sola llamada
+        lon_p, lat_p = current_pos[0], current_pos[1]
+        lon_d, lat_d = destiny[0], destiny[1]
+        n = len(cercanos)
+        tramos = vincenty_m(
+            np.concatenate((np.full(n, lon_p), self.lon[cercanos])),
+            np.concatenate((np.full(n, lat_p), self.lat[cercanos])),
+            np.concatenate((self.lon[cercanos], np.full(n, lon_d))),
+            np.concatenate((self.lat[cercanos], np.full(n, lat_d))),
+        )
+        return int(cercanos[np.argmin(tramos[:n] + tramos[n:])])
+
+    def mejores_desvios(self, current_pos: List[float], destiny: List[float], k: int) -> List[int]:
+        """
+        Las k estaciones con menor desvío: primero la de mejor_desvio y
+        luego las demás de menor a mayor desvío sobre la esfera.
+        """
+        mejor = self.mejor_desvio(current_pos, destiny)
+        idx, costo = self._candidatos(current_pos, destiny, k)
+        idx, primero = np.unique(idx, return_index=True)
+        orden = idx[np.argsort(costo[primero], kind="stable")]
+        return [mejor] + [int(i) for i in orden if i != mejor][:k - 1]
+
+    def _candidatos(self, current_pos: List[float], destiny: List[float], k: int):
+        """
+        Estaciones revisadas y su desvío haversine, hasta asegurar que
+        incluyen las k mejores (con el margen de MARGEN_ESFERA).
+
+        Recorre anillos de celdas alrededor del punto medio del viaje:
+        una estación a distancia r del punto medio tiene un desvío de al
+        menos 2r - d(actual, destino), así que la búsqueda se detiene
+        cuando ese límite supera al k-ésimo mejor desvío encontrado.
+        """
+        if len(self) == 0:
+            raise ValueError("No hay estaciones cargadas")
+
+        lon_p, lat_p = current_pos[0], current_pos[1]
+        lon_d, lat_d = destiny[0], destiny[1]
+        directo = float(haversine_m(lon_p, lat_p, lon_d, lat_d))
+
+        medio = ((current_pos[0] + destiny[0]) / 2, (current_pos[1] + destiny[1]) / 2)
+        cx = math.floor(medio[0] / self.cell_deg)
+        cy = math.floor(medio[1] / self.cell_deg)
+        max_anillo = int(max(
+            abs(cx - self._cmin[0]), abs(cx - self._cmax[0]),
+            abs(cy - self._cmin[1]), abs(cy - self._cmax[1]),
+        ))
+
+        candidatos = []
+        costos = []
+        kesimo = math.inf
+        for anillo in range(max_anillo + 1):
+            # Las estaciones del anillo o más allá están al menos a anillo - 1 celdas del punto medio
+            if 2 * (anillo - 1) * self._cell_m * 0.9 - directo > kesimo * (1 + MARGEN_ESFERA):
+                break
+
+            if (2 * anillo + 1) ** 2 > len(self):
+                # Ya hay más celdas que estaciones: se evalúan todas de una vez
+                idx = np.arange(len(self))
+            else:
+                idx = self._anillo(cx, cy, anillo)
+                if idx is None:
+                    continue
+
+            costo = (
+                haversine_m(lon_p, lat_p, self.lon[idx], self.lat[idx])
+                + haversine_m(self.lon[idx], self.lat[idx], lon_d, lat_d)
+            )
+            candidatos.append(idx)
+            costos.append(costo)
+            if len(idx) == len(self):
+                break
+            todos = np.concatenate(costos)
+            if len(todos) >= k:
+                kesimo = float(np.partition(todos, k - 1)[k - 1])
+
+        return np.concatenate(candidatos), np.concatenate(costos)
+
+    def _anillo(self, cx: int, cy: int, k: int):
+        if k == 0:
+            celdas = [(cx, cy)]
+        else:
+            celdas = [(cx + dx, cy + dy) for dx in range(-k, k + 1) for dy in (-k, k)]
+            celdas += [(cx + dx, cy + dy) for dx in (-k, k) for dy in range(-k + 1, k)]
+
+        idx = [self._buckets[c] for c in celdas if c in self._buckets]
+        if not idx:
+            return None
+        return np.concatenate(idx)
+
+
+class StationRegistry:
+    """
+    Estaciones por ciudad cargadas una sola vez en índices espaciales.
+    Si el JSON de una ciudad cambia en disco, se recarga en la siguiente consulta.
+    """
+
+    def __init__(self, directorio: str = ESTACIONES_DIR):
+        self.directorio = directorio
+        self._indices: Dict[str, StationIndex] = {}
+        self._mtimes: Dict[str, float] = {}
+
+    def cargar_todas(self) -> None:
+        for ciudad in ARCHIVOS_ESTACIONES:
+            self.get(ciudad)
+
+    def get(self, ciudad: str) -> StationIndex:
+        if ciudad not in ARCHIVOS_ESTACIONES:
+            raise Exception("Imposible cargar las estaciones")
+
+        ruta = os.path.join(self.directorio, ARCHIVOS_ESTACIONES[ciudad])
+        mtime = os.path.getmtime(ruta)
+        if self._mtimes.get(ciudad) != mtime:
+            with open(ruta, "r") as f:
+                self._indices[ciudad] = StationIndex(json.load(f))
+            self._mtimes[ciudad] = mtime
+        return self._indices[ciudad]
+
+
+def get_stations(request: Request) -> StationRegistry:
+    """Dependencia de FastAPI que entrega el registro creado en el lifespan."""
+    return request.app.state.stations
@@ -0,0 +1,14 @@
+"""
+Pruebas del servidor. Los módulos se importan como en main.py (import
+consume, from HybridBikeConsumptionModel... ), así que server/ va al path,
+junto con server/motor_particula/src si el paquete no está instalado.
+
+    cd server
+    python -m pytest tests
+"""
+import os
+import sys
+
+SERVER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER)
+sys.path.append(os.path.join(SERVER, "motor_particula", "src"))
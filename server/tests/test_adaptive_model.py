@@ -0,0 +1,48 @@
+import pytest
+
+from HybridBikeConsumptionModel.adaptive_model import (
+    TOL_MIN, _coeficientes, bike_model_adaptive, error_energia,
+)
+from HybridBikeConsumptionModel.benchmark import perfil_sintetico, perfil_trayecto
+
+PERFILES = [
+    (perfil_sintetico, 0, 0),
+    (perfil_sintetico, 0.5, 1),
+    (perfil_trayecto, 0, 2),
+    (perfil_trayecto, 0.5, 3),
+]
+
+
+@pytest.mark.parametrize("tol", [1e-3, 1e-4])
+@pytest.mark.parametrize("perfil, hybrid_cont, seed", PERFILES)
+def test_energia_dentro_de_tol(perfil, hybrid_cont, seed, tol):
+    speeds, slopes = perfil(300, seed)
+    assert abs(error_energia(0.8, hybrid_cont, speeds, slopes, tol=tol)) <= tol
+
+
+def test_debajo_de_tol_min_es_bike_model():
+    speeds, slopes = perfil_trayecto(60, 0)
+    assert error_energia(0.8, 0, speeds, slopes, tol=TOL_MIN / 10) == 0
+
+
+def test_frenada_en_bajada_es_bike_model():
+    # Detenida en una bajada bike_model oscila alrededor de v = 0
+    speeds = [0, 10, 20, 20, 10] + [0] * 30
+    slopes = [-5] * len(speeds)
+    assert error_energia(0.8, 0, speeds, slopes) == 0
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9, 0.99])
+def test_coeficientes_como_el_limite_continuo(q):
+    # Formas cerradas de las cuatro etapas con aceleración estable
+    lam, _, _, k_e, *_ = _coeficientes(q)
+    s = 1 - q / 2 + q ** 2 / 6 - q ** 3 / 24
+    assert lam == pytest.approx(s / (1 + q * s))
+    assert k_e == pytest.approx(1 + (3 - q + q ** 2 / 4) / (6 * s))
+
+
+def test_menos_pasos_que_bike_model():
+    speeds, slopes = perfil_trayecto(300, 0)
+    energia, segundos, pasos = bike_model_adaptive(0.8, 0, speeds, slopes, stats=True)
+    assert segundos == 300
+    assert pasos["aceptados"] + pasos["rechazados"] < 300 * 100 / 10
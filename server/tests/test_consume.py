@@ -0,0 +1,84 @@
+"""
+moto_consume con y sin el modo predictivo contra un enrutar falso: los
+desvíos a recarga se piden igual (acceso y tramo por separado), así que
+el resultado es el mismo.
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+import numpy as np
+import pytest
+
+import consume
+from stations import StationIndex
+from utils import manage_segments
+
+RECURSOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources")
+
+PUNTOS = [[-75.60, 6.20], [-75.50, 6.35], [-75.62, 6.30], [-75.55, 6.18], [-75.48, 6.25], [-75.58, 6.33]]
+
+
+def _ruta_ors(coords):
+    """Respuesta de ORS con un segmento por tramo; la geometría depende de toda la petición."""
+    semilla = int(hashlib.md5(json.dumps(coords).encode()).hexdigest()[:8], 16)
+    rng = np.random.default_rng(semilla)
+    geometria, segmentos = [], []
+    for a, b in zip(coords[:-1], coords[1:]):
+        n = int(rng.integers(800, 1200))
+        lon = np.linspace(a[0], b[0], n) + rng.normal(0, 2e-5, n)
+        lat = np.linspace(a[1], b[1], n) + rng.normal(0, 2e-5, n)
+        alt = 1500 + np.cumsum(rng.normal(0, 1.5, n))
+        inicio = len(geometria) - 1 if geometria else 0
+        geometria += np.c_[lon, lat, alt].tolist()[1 if geometria else 0:]
+        internos = rng.choice(np.arange(inicio + 1, len(geometria) - 1), 30, replace=False)
+        cortes = [inicio] + sorted(int(c) for c in internos) + [len(geometria) - 1]
+        pasos = [{"way_points": [i, j], "duration": float(rng.uniform(5, 60)), "distance": float(rng.uniform(30, 400))}
+                 for i, j in zip(cortes[:-1], cortes[1:])]
+        pasos.append({"way_points": [cortes[-1], cortes[-1]], "duration": 0, "distance": 0})
+        segmentos.append({
+            "steps": pasos,
+            "duration": sum(p["duration"] for p in pasos),
+            "distance": sum(p["distance"] for p in pasos),
+        })
+    return {"properties": {"segments": segmentos}, "geometry": {"coordinates": geometria}}
+
+
+@pytest.fixture
+def peticiones(monkeypatch):
+    pedidas = []
+
+    async def enrutar(coords, traffic, ors_token, azure_token, http):
+        pedidas.append(coords)
+        await asyncio.sleep(0.01)
+        return manage_segments(_ruta_ors(coords), False)
+
+    monkeypatch.setattr(consume, "enrutar", enrutar)
+    return pedidas
+
+
+@pytest.fixture
+def estaciones():
+    with open(os.path.join(RECURSOS, "data", "estaciones", "estaciones_med.json")) as f:
+        return json.load(f)
+
+
+def _simular(estaciones, predictive):
+    return asyncio.run(consume.moto_consume(
+        coords=PUNTOS, estaciones=estaciones, nombre="moto", http=None, ors_token="", azure_token="",
+        profile="driving-car", station_index=StationIndex(estaciones), predictive=predictive,
+    ))
+
+
+def test_predictivo_igual_al_secuencial(peticiones, estaciones):
+    secuencial = _simular(estaciones, predictive=False)
+    desvios = [c for c in peticiones if len(c) == 2]
+    assert secuencial["charge_points"]
+    # Después de la ruta original solo se piden accesos y tramos
+    assert all(len(c) == 2 for c in peticiones[1:])
+
+    peticiones.clear()
+    predictivo = _simular(estaciones, predictive=True)
+    assert json.dumps(predictivo) == json.dumps(secuencial)
+    assert all(c in peticiones for c in desvios)
@@ -0,0 +1,212 @@
+"""
+Tolerancia de vincenty_m (geo.py) y de los perfiles de get_vel /
+get_vel_azure (utils.py) contra la versión anterior, que calculaba la
+distancia de cada punto con geopy.distance.geodesic dentro del ciclo.
+
+Las rutas son respuestas reales de ORS y de Azure guardadas en
+Modelos de Simulación/.../petition_raw_*.json.
+"""
+import copy
+import json
+import math
+import os
+
+import numpy as np
+import pytest
+
+geodesic = pytest.importorskip("geopy.distance").geodesic
+
+from geo import vincenty_m  # noqa: E402
+from utils import get_vel, get_vel_azure  # noqa: E402
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PETICIONES = os.path.join(
+    RAIZ, "Modelos de Simulación", "Simulación de gastos de mocoticletas eléctricas",
+    "modelo_motocicleta_electrica",
+)
+
+
+def _cargar(nombre):
+    with open(os.path.join(PETICIONES, nombre)) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def ruta_ors():
+    return _cargar("petition_raw_ors.json")
+
+
+@pytest.fixture
+def rutas_azure():
+    """Cada ruta de Azure con su geometría 3D (la altitud la pone ORS; aquí es sintética)."""
+    rutas = []
+    for ruta in _cargar("petition_raw_azure.json"):
+        linea = ruta["features"][-1]["geometry"]["coordinates"][0]
+        elevacion = [[lng, lat, 1500 + 25 * math.sin(i / 6)] for i, (lng, lat) in enumerate(linea)]
+        rutas.append((ruta["features"], elevacion))
+    return rutas
+
+
+def _get_vel_original(steps, elevation_data):
+    route = {"coords": [], "speeds": [], "slopes": [], "times": []}
+    total_time = 0
+    for step in steps:
+        start_idx, end_idx = step["way_points"]
+        step_duration = step["duration"]
+        step_distance = step["distance"]
+        num_points = end_idx - start_idx
+        if num_points <= 0:
+            continue
+        duration_per_point = step_duration / num_points
+        distance_per_point = step_distance / num_points
+        for i in range(num_points):
+            idx = start_idx + i
+            if idx >= len(elevation_data):
+                break
+            lng, lat, alt = elevation_data[idx]
+            if len(route["coords"]) > 0:
+                prev_lng, prev_lat, prev_alt = route["coords"][-1]
+            else:
+                prev_lng, prev_lat, prev_alt = lng, lat, alt
+            horiz_dist = geodesic((prev_lat, prev_lng), (lat, lng)).meters
+            delta_alt = alt - prev_alt
+            slope_deg = math.degrees(math.atan2(delta_alt, horiz_dist)) if horiz_dist != 0 else 0
+            speed_ms = (distance_per_point / duration_per_point) if duration_per_point != 0 else 0
+            route["coords"].append([lng, lat, alt])
+            route["speeds"].append(round(speed_ms, 2))
+            route["slopes"].append(round(slope_deg, 2))
+            route["times"].append(round(total_time, 2))
+            total_time += duration_per_point
+            if idx == len(elevation_data)-2:
+                lng, lat, alt = elevation_data[-1]
+                delta_alt = alt - prev_alt
+                horiz_dist = geodesic((prev_lat, prev_lng), (lat, lng)).meters
+                slope_deg = math.degrees(math.atan2(delta_alt, horiz_dist)) if horiz_dist != 0 else 0
+                route["coords"].append([lng, lat, alt])
+                route["speeds"].append(round(speed_ms, 2))
+                route["slopes"].append(round(slope_deg, 2))
+                route["times"].append(round(total_time, 2))
+    return route
+
+
+def _get_vel_azure_original(features, elevation_data):
+    route = {"coords": [], "speeds": [], "slopes": [], "times": []}
+    total_time = 0
+    for feature in features:
+        props = feature["properties"]
+        for step in props.get("steps", []):
+            start_idx, end_idx = step["routePathRange"]["range"]
+            step_duration = props.get("durationInSeconds", 0)
+            step_distance = props.get("distanceInMeters", 0)
+            num_points = end_idx - start_idx
+            if num_points <= 0:
+                continue
+            duration_per_point = step_duration / num_points
+            distance_per_point = step_distance / num_points
+            for i in range(num_points):
+                idx = start_idx + i
+                lng, lat, alt = elevation_data[idx]
+                if len(route["coords"]) > 0:
+                    prev_lng, prev_lat, prev_alt = route["coords"][-1]
+                else:
+                    prev_lng, prev_lat, prev_alt = lng, lat, alt
+                horiz_dist = geodesic((prev_lat, prev_lng), (lat, lng)).meters
+                delta_alt = alt - prev_alt
+                slope_deg = math.degrees(math.atan2(delta_alt, horiz_dist)) if horiz_dist != 0 else 0
+                speed_ms = (distance_per_point / duration_per_point) if duration_per_point != 0 else 0
+                route["coords"].append([lng, lat, alt])
+                route["speeds"].append(round(speed_ms, 2))
+                route["slopes"].append(round(slope_deg, 2))
+                route["times"].append(round(total_time, 2))
+                total_time += duration_per_point
+                if idx == len(elevation_data)-2:
+                    lng, lat, alt = elevation_data[-1]
+                    delta_alt = alt - prev_alt
+                    horiz_dist = geodesic((prev_lat, prev_lng), (lat, lng)).meters
+                    slope_deg = math.degrees(math.atan2(delta_alt, horiz_dist)) if horiz_dist != 0 else 0
+                    route["coords"].append([lng, lat, alt])
+                    route["speeds"].append(round((distance_per_point / duration_per_point), 2))
+                    route["slopes"].append(round(slope_deg, 2))
+                    route["times"].append(round(total_time, 2))
+    return route
+
+
+def _comparar(segmento, esperado):
+    np.testing.assert_array_equal(segmento.coords, np.asarray(esperado["coords"]).reshape(-1, 3))
+    np.testing.assert_allclose(segmento.speeds, esperado["speeds"], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(segmento.times, esperado["times"], rtol=0, atol=1e-9)
+    # Una diferencia submilimétrica en la distancia puede mover el redondeo
+    # a 2 decimales de la pendiente en una unidad
+    np.testing.assert_allclose(segmento.slopes, esperado["slopes"], rtol=0, atol=0.01 + 1e-9)
+
+
+def _con_repetidos(ruta, indices):
+    """Copia de la ruta con el punto i en la misma posición que el i - 1 (paso de longitud 0)."""
+    ruta = copy.deepcopy(ruta)
+    coords = ruta["geometry"]["coordinates"]
+    for i in indices:
+        coords[i][0], coords[i][1] = coords[i - 1][0], coords[i - 1][1]
+    return ruta
+
+
+def test_vincenty_como_geodesic_en_la_ruta(ruta_ors):
+    coords = np.asarray(ruta_ors["geometry"]["coordinates"])
+    a, b = coords[:-1], coords[1:]
+    distancias = vincenty_m(a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+    esperado = [geodesic((p[1], p[0]), (q[1], q[0])).meters for p, q in zip(a, b)]
+    np.testing.assert_allclose(distancias, esperado, rtol=0, atol=1e-3)
+
+
+def test_vincenty_como_geodesic_lejos_y_cerca():
+    rng = np.random.default_rng(0)
+    lon1, lat1 = rng.uniform(-180, 180, 500), rng.uniform(-80, 80, 500)
+    # De milímetros a miles de kilómetros, sin llegar a puntos casi antípodas
+    escala = 10.0 ** rng.uniform(-8, 1.5, 500)
+    lon2 = lon1 + escala * rng.uniform(-1, 1, 500)
+    lat2 = np.clip(lat1 + escala * rng.uniform(-1, 1, 500), -89, 89)
+    distancias = vincenty_m(lon1, lat1, lon2, lat2)
+    esperado = [geodesic((la1, lo1), (la2, lo2)).meters
+                for lo1, la1, lo2, la2 in zip(lon1, lat1, lon2, lat2)]
+    np.testing.assert_allclose(distancias, esperado, rtol=1e-9, atol=1e-3)
+
+
+def test_vincenty_mismo_punto():
+    assert vincenty_m(-75.57, 6.22, -75.57, 6.22) == 0
+    np.testing.assert_array_equal(vincenty_m([0.0, 10.0], [0.0, 5.0], [0.0, 10.0], [0.0, 5.0]), [0, 0])
+
+
+def test_get_vel_ruta_ors(ruta_ors):
+    coords = ruta_ors["geometry"]["coordinates"]
+    segmentos = ruta_ors["properties"]["segments"]
+    # El último segmento pasa por el penúltimo punto (se agrega el último)
+    # y los dos terminan en un paso sin puntos
+    assert any(s["way_points"][0] == len(coords) - 2 for s in segmentos[-1]["steps"])
+    assert all(s["steps"][-1]["way_points"][0] == s["steps"][-1]["way_points"][1] for s in segmentos)
+    for segmento in segmentos:
+        resultado = get_vel(segmento["steps"], coords)
+        _comparar(resultado, _get_vel_original(segmento["steps"], coords))
+    assert resultado.coords[-1].tolist() == coords[-1]
+
+
+def test_get_vel_puntos_repetidos(ruta_ors):
+    # Pasos de longitud 0 en medio y entre el penúltimo y el último punto
+    ruta = _con_repetidos(ruta_ors, [5, 30, 31, len(ruta_ors["geometry"]["coordinates"]) - 1])
+    coords = ruta["geometry"]["coordinates"]
+    for segmento in ruta["properties"]["segments"]:
+        _comparar(get_vel(segmento["steps"], coords), _get_vel_original(segmento["steps"], coords))
+
+
+def test_get_vel_pasos_sin_duracion(ruta_ors):
+    ruta = copy.deepcopy(ruta_ors)
+    steps = ruta["properties"]["segments"][1]["steps"]
+    steps[1]["duration"] = 0
+    steps[-2]["duration"] = 0
+    coords = ruta["geometry"]["coordinates"]
+    resultado = get_vel(steps, coords)
+    _comparar(resultado, _get_vel_original(steps, coords))
+    assert (resultado.speeds == 0).any()
+
+
+def test_get_vel_azure(rutas_azure):
+    for features, elevacion in rutas_azure:
+        _comparar(get_vel_azure(features, elevacion), _get_vel_azure_original(features, elevacion))
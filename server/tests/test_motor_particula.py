@@ -0,0 +1,263 @@
+"""
+Paridad del núcleo vectorizado (motor_particula) y de los modelos que lo
+usan contra los ciclos punto a punto que reemplazó.
+
+_potencias_original y _pasos_original son los ciclos de la versión
+anterior: todos los modelos repetían el mismo balance de fuerzas y solo
+cambiaban las constantes, que se pasan como argumentos.
+"""
+import importlib
+import math
+import os
+import sys
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+from motor_particula import SPEC_TELEMETRIA, VehicleSpec, pasos_tiempo, potencias_kmh
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SIMULACION = os.path.join(
+    RAIZ, "Modelos de Simulación", "Simulación de gastos de mocoticletas eléctricas",
+    "modelo_motocicleta_electrica",
+)
+ESTACIONES = os.path.join(RAIZ, "Modelos de Simulación", "Modelo de ubicación de estaciones de carga")
+SERVIDOR = os.path.join(RAIZ, "server")
+
+PAQUETE = "HybridBikeConsumptionModel"
+
+
+def _potencias_original(speeds, slopes, hybrid_cont, m, a, cd, crr, rho=1.225, g=9.81, rw=0.3,
+                        eficiencia=0.85, factor=1.0, eficiencia_cn=0.2, factor_cn=1.0,
+                        recortar=True):
+    """Potencias eléctrica y de combustión [W] punto a punto, como antes."""
+    last_vel = 0
+    p_ebs, p_cns = [], []
+    for i in range(len(speeds)):
+        vel = speeds[i] / 3.6
+        theta = slopes[i] * math.pi / 180
+        faero = 0.5 * rho * a * cd * (vel ** 2)
+        froll = g * m * crr * np.cos(theta)
+        fg = g * m * np.sin(theta)
+        delta_v = vel - last_vel
+        f_inertia = m * delta_v / 1
+        fres = faero + froll + fg + f_inertia
+        p_m = (fres * rw) * (vel / rw)
+        p_eb = p_m * (1 - hybrid_cont) / eficiencia
+        p_eb = p_eb * factor
+        if recortar and p_eb < 0:
+            p_eb = 0
+        p_cn = p_m * hybrid_cont / eficiencia_cn
+        p_cn = p_cn * factor_cn
+        if p_cn <= 0:
+            p_cn = 0
+        last_vel = vel
+        p_ebs.append(p_eb)
+        p_cns.append(p_cn)
+    return p_ebs, p_cns
+
+
+def _pasos_original(tiempos):
+    pasos = []
+    for i in range(len(tiempos)):
+        if i == 0:
+            delta_t = tiempos[0] if tiempos[0] > 0 else 1.0
+        else:
+            delta_t = max(tiempos[i] - tiempos[i-1], 0.1)
+        pasos.append(delta_t)
+    return pasos
+
+
+def _perfil(seed, n=600, t0=0.0):
+    """Velocidades [km/h], pendientes [grados] y tiempos [s] aleatorios."""
+    rng = np.random.default_rng(seed)
+    speeds = np.clip(np.cumsum(rng.normal(0, 6, n)) + 30, 0, 90)
+    speeds[rng.random(n) < 0.05] = 0
+    slopes = rng.uniform(-12, 12, n)
+    # Pasos irregulares, con tiempos repetidos y hacia atrás (paso mínimo 0.1 s)
+    pasos = rng.choice([0.0, 0.5, 1.0, 1.0, 2.0, -1.0], n - 1)
+    tiempos = t0 + np.concatenate([[0.0], np.cumsum(pasos)])
+    return speeds.tolist(), slopes.tolist(), tiempos.tolist()
+
+
+def _igual(actual, esperado):
+    np.testing.assert_allclose(actual, esperado, rtol=1e-9, atol=1e-9)
+
+
+@contextmanager
+def _carpeta(carpeta):
+    """
+    Importa con carpeta al frente del path: cada carpeta de modelos trae su
+    propio paquete HybridBikeConsumptionModel, que se importa también
+    dentro de las funciones, así que las llamadas van dentro del bloque.
+    """
+    def propios():
+        return [k for k in sys.modules if k == PAQUETE or k.startswith(PAQUETE + ".")]
+
+    guardados = {k: sys.modules.pop(k) for k in propios()}
+    sys.path.insert(0, carpeta)
+    try:
+        yield
+    finally:
+        sys.path.remove(carpeta)
+        for k in propios():
+            del sys.modules[k]
+        sys.modules.update(guardados)
+
+
+def _hev(hybrid_cont):
+    nombre = "parameters_electric" if hybrid_cont == 0 else "parameters_hybrid"
+    return importlib.import_module(f"{PAQUETE}.{nombre}").HEV()
+
+
+def _fisica(hev):
+    return dict(m=hev.Chassis.m, a=hev.Chassis.a, cd=hev.Chassis.cd, crr=hev.Chassis.crr,
+                rho=hev.Ambient.rho, g=hev.Ambient.g, rw=hev.Wheel.rw)
+
+
+@pytest.mark.parametrize("hybrid_cont", [0, 0.3, 1])
+@pytest.mark.parametrize("seed", range(3))
+def test_potencias_como_el_ciclo(hybrid_cont, seed):
+    speeds, slopes, _ = _perfil(seed)
+    spec = SPEC_TELEMETRIA.con(factor_correccion_cn=1.8)
+    p_eb, p_cn = potencias_kmh(speeds, slopes, hybrid_cont, spec)
+    esperado_eb, esperado_cn = _potencias_original(
+        speeds, slopes, hybrid_cont, m=140, a=0.74, cd=0.3, crr=0.01,
+        eficiencia=0.85, factor=1.617, factor_cn=1.8,
+    )
+    _igual(p_eb, esperado_eb)
+    _igual(p_cn, esperado_cn)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_potencias_sin_recorte(seed):
+    speeds, slopes, _ = _perfil(seed)
+    spec = VehicleSpec(eficiencia_tren=0.7, recortar_electrica=False)
+    p_eb, _ = potencias_kmh(speeds, slopes, 0, spec)
+    esperado, _ = _potencias_original(
+        speeds, slopes, 0, m=140, a=0.74, cd=0.3, crr=0.01, eficiencia=0.7, recortar=False,
+    )
+    assert min(esperado) < 0
+    _igual(p_eb, esperado)
+
+
+@pytest.mark.parametrize("t0", [-2.0, 0.0, 3.5])
+def test_pasos_tiempo_como_el_ciclo(t0):
+    _, _, tiempos = _perfil(7, t0=t0)
+    pasos = pasos_tiempo(tiempos)
+    assert pasos[0] == (t0 if t0 > 0 else 1.0)
+    _igual(pasos, _pasos_original(tiempos))
+
+
+def test_pasos_tiempo_vacio():
+    assert len(pasos_tiempo([])) == 0
+
+
+@pytest.mark.parametrize("hybrid_cont", [0, 1])
+def test_particle_model_servidor(hybrid_cont):
+    speeds, slopes, _ = _perfil(11)
+    with _carpeta(SERVIDOR):
+        from HybridBikeConsumptionModel.particle_model import bike_model_particle
+        energia, segundos = bike_model_particle(hybrid_cont, speeds, slopes)
+        esperado, _ = _potencias_original(
+            speeds, slopes, hybrid_cont, **_fisica(_hev(hybrid_cont)), eficiencia=0.7, recortar=False,
+        )
+    assert segundos == len(speeds)
+    _igual(energia, sum(esperado) / 3600)
+
+
+@pytest.mark.parametrize("hybrid_cont", [0, 1])
+def test_particle_model_simulacion(hybrid_cont):
+    speeds, slopes, _ = _perfil(12)
+    with _carpeta(SIMULACION):
+        from HybridBikeConsumptionModel.particle_model import bike_model_particle
+        energia, segundos = bike_model_particle(hybrid_cont, speeds, slopes)
+        esperado, _ = _potencias_original(
+            speeds, slopes, hybrid_cont, **_fisica(_hev(hybrid_cont)), eficiencia=0.7, recortar=False,
+        )
+    assert segundos == len(speeds)
+    _igual(energia, sum(esperado) / 3600)
+
+
+@pytest.mark.parametrize("vehicle_params", [
+    None,
+    {"chassis": {"m": 95, "cd": 0.45, "a": 0.6, "crr": 0.015}, "ambient": {"rho": 1.1}, "wheel": {"rw": 0.28}},
+])
+@pytest.mark.parametrize("hybrid_cont", [0, 0.5])
+def test_modelo_moto(vehicle_params, hybrid_cont):
+    speeds, slopes, _ = _perfil(13)
+    with _carpeta(ESTACIONES):
+        from HybridBikeConsumptionModel.Modelo_moto import bike_model_particle
+        bateria, combus, combus2, e_total = bike_model_particle(hybrid_cont, speeds, slopes, vehicle_params)
+
+    params = vehicle_params or {}
+    p_eb, p_cn = _potencias_original(
+        speeds, slopes, hybrid_cont,
+        m=params.get("chassis", {}).get("m", 140.0), a=params.get("chassis", {}).get("a", 0.74),
+        cd=params.get("chassis", {}).get("cd", 0.3), crr=params.get("chassis", {}).get("crr", 0.01),
+        rho=params.get("ambient", {}).get("rho", 1.225), g=params.get("ambient", {}).get("g", 9.81),
+        rw=params.get("wheel", {}).get("rw", 0.3),
+        eficiencia=0.85, factor=1.617,
+    )
+    # Ciclo anterior: batería de 3700 Wh descontada paso a paso, sin bajar de 0
+    esperado_bateria = 3700
+    for p in p_eb:
+        esperado_bateria = max(esperado_bateria - p / 3600, 0)
+    _igual(bateria, esperado_bateria)
+    _igual(combus, [p / 3600 / 36718.50158230244 for p in p_cn])
+    _igual(combus2, [p / 3600 for p in p_cn])
+    _igual(e_total, [(e + c) / 3600 for e, c in zip(p_eb, p_cn)])
+
+
+@pytest.mark.parametrize("hybrid_cont", [0, 1])
+def test_procesar_rutas(hybrid_cont):
+    pytest.importorskip("folium")
+    speeds, slopes, tiempos = _perfil(14, t0=-1.0)
+    with _carpeta(SIMULACION):
+        procesar_rutas = importlib.import_module("procesar_rutas")
+        totales = procesar_rutas.consum(speeds, slopes, tiempos, hybrid_cont)
+        por_punto = procesar_rutas.calcular_consumo_por_punto(speeds, slopes, tiempos, hybrid_cont)
+        potencia = procesar_rutas.calcular_potencia_por_punto(speeds, slopes, hybrid_cont)
+        p_eb, p_cn = _potencias_original(
+            speeds, slopes, hybrid_cont, **_fisica(_hev(hybrid_cont)),
+            eficiencia=0.85, factor=1.617, factor_cn=1.8,
+        )
+    sys.modules.pop("procesar_rutas")
+
+    pasos = _pasos_original(tiempos)
+    _igual(totales[0], sum(e / 1000 * dt / 3600 for e, dt in zip(p_eb, pasos)))
+    _igual(totales[1], sum(c / 1000 * dt / 3600 for c, dt in zip(p_cn, pasos)))
+    distancia_km = sum(v / 3.6 * dt for v, dt in zip(speeds, pasos)) / 1000
+    _igual(totales[3], 70 * distancia_km / 1000)
+    _igual(por_punto, [e / 1000 * dt / 3600 for e, dt in zip(p_eb, pasos)])
+    _igual(potencia, [e / 1000 for e in p_eb])
+
+
+@pytest.mark.parametrize("hybrid_cont", [0, 0.5])
+def test_telemetry(hybrid_cont):
+    pytest.importorskip("folium")
+    pytest.importorskip("scipy")
+    speeds, slopes, tiempos = _perfil(15, t0=2.0)
+    params = {"m": 120, "cd": 0.35, "a": 0.7, "crr": 0.012, "factor_correccion": 1.4, "eficiencia_tren": 0.8}
+    with _carpeta(SIMULACION):
+        telemetry = importlib.import_module("telemetry")
+        for p in (None, params):
+            potencia, combustion = telemetry.calcular_potencia_por_punto(speeds, slopes, hybrid_cont, p)
+            p = p or {"m": 140, "cd": 0.3, "a": 0.74, "crr": 0.01, "factor_correccion": 1.617,
+                      "eficiencia_tren": 0.85}
+            p_eb, p_cn = _potencias_original(
+                speeds, slopes, hybrid_cont, m=p["m"], a=p["a"], cd=p["cd"], crr=p["crr"],
+                eficiencia=p["eficiencia_tren"], factor=p["factor_correccion"],
+            )
+            _igual(potencia, [e / 1000 for e in p_eb])
+            _igual(combustion, [c / 1000 for c in p_cn])
+
+        potencia_w = [e * 1000 for e in potencia]
+        resumen = telemetry.calcular_consumo_y_emisiones(potencia_w, combustion, tiempos, speeds)
+    sys.modules.pop("telemetry")
+
+    pasos = _pasos_original(tiempos)
+    _igual(resumen["consumo_electrico_kwh"], sum(e / 1000 * dt / 3600 for e, dt in zip(potencia_w, pasos)))
+    _igual(resumen["consumo_combustion_kwh"], sum(c * dt / 3600 for c, dt in zip(combustion, pasos)))
+    _igual(resumen["distancia_km"], sum(v / 3.6 * dt for v, dt in zip(speeds, pasos)) / 1000)
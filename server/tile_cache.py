@@ -0,0 +1,283 @@
+"""
+Caché en disco de los tiles Carto/OSM que sirve el proxy de /tiles.
+
+Los tiles se guardan como <dir>/<proveedor>/<z>/<x>/<y>.png junto a un
+<y>.png.json con el ETag / Last-Modified del upstream. Al vencer se
+revalidan con If-None-Match / If-Modified-Since, y si el upstream no
+responde se sirve la copia vieja (útil para demos sin red).
+
+Pre-cargar los tiles de una ciudad:
+
+    python tile_cache.py --city med --zoom 12-16
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import httpx
+from fastapi import Request
+
+TILE_CACHE_DIR = os.getenv("TILE_CACHE_DIR", "resources/cache/tiles")
+TILE_CACHE_MAX_MB = int(os.getenv("TILE_CACHE_MAX_MB", "512"))
+TILE_CACHE_MAX_AGE = int(os.getenv("TILE_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+CARTO_SUBDOMAINS = ["a", "b", "c", "d"]
+
+# Bounding boxes (lon_min, lat_min, lon_max, lat_max) de cada ciudad del mapa
+CITY_BBOX = {
+    "med": (-75.72, 6.15, -75.47, 6.37),
+    "bog": (-74.23, 4.46, -73.99, 4.84),
+    "amva": (-75.72, 6.00, -75.30, 6.48),
+}
+
+
+def tile_url(provider: str, z: int, x: int, y: str) -> str:
+    """URL upstream de un tile. En Carto, y puede traer el sufijo @2x."""
+    if provider == "carto":
+        s = CARTO_SUBDOMAINS[(x + z) % len(CARTO_SUBDOMAINS)]
+        return f"https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png"
+    if provider == "osm":
+        return f"https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+    raise ValueError(f"Proveedor de tiles desconocido: {provider}")
+
+
+class TileCache:
+    """
+    Almacén de tiles en disco con expulsión LRU por tamaño total y
+    coalescencia de peticiones: varias peticiones concurrentes por el
+    mismo tile ausente comparten una sola descarga.
+    """
+
+    def __init__(self, root: str, max_bytes: int, max_age: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # ruta -> bytes
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._cargar_indice()
+
+    # =================== API ===================
+    async def get(
+        self, provider: str, z: int, x: int, y: str, client: httpx.AsyncClient
+    ) -> Tuple[int, bytes]:
+        """
+        Devuelve (status_code, contenido) del tile. Lanza httpx.RequestError
+        solo si el upstream falla y no hay copia local.
+        """
+        ruta = os.path.join(self.root, provider, str(z), str(x), f"{y}.png")
+
+        entrada = await asyncio.to_thread(self._leer, ruta)
+        if entrada is not None:
+            contenido, meta = entrada
+            if time.time() - meta.get("fetched_at", 0) <= self.max_age:
+                self._tocar(ruta)
+                return 200, contenido
+
+        tarea = self._inflight.get(ruta)
+        if tarea is None:
+            tarea = asyncio.ensure_future(
+                self._descargar(ruta, tile_url(provider, z, x, y), client, entrada)
+            )
+            self._inflight[ruta] = tarea
+            tarea.add_done_callback(lambda _: self._inflight.pop(ruta, None))
+
+        # shield: si un cliente cancela, la descarga compartida sigue
+        return await asyncio.shield(tarea)
+
+    # =================== DESCARGA ===================
+    async def _descargar(self, ruta, url, client, entrada) -> Tuple[int, bytes]:
+        headers = {}
+        if entrada is not None:
+            meta = entrada[1]
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            r = await client.get(url, headers=headers)
+        except httpx.RequestError:
+            if entrada is not None:
+                return 200, entrada[0]
+            raise
+
+        if r.status_code == 304 and entrada is not None:
+            contenido, meta = entrada
+            meta["fetched_at"] = time.time()
+            await asyncio.to_thread(self._escribir_meta, ruta, meta)
+            self._tocar(ruta)
+            return 200, contenido
+
+        if r.status_code == 200:
+            meta = {
+                "etag": r.headers.get("etag"),
+                "last_modified": r.headers.get("last-modified"),
+                "fetched_at": time.time(),
+            }
+            if await asyncio.to_thread(self._escribir, ruta, r.content, meta):
+                self._registrar(ruta, len(r.content))
+            return 200, r.content
+
+        # Upstream caído: mejor una copia vieja que un error
+        if r.status_code >= 500 and entrada is not None:
+            return 200, entrada[0]
+
+        return r.status_code, b""
+
+    # =================== DISCO ===================
+    def _cargar_indice(self) -> None:
+        archivos = []
+        for carpeta, _, nombres in os.walk(self.root):
+            for nombre in nombres:
+                if nombre.endswith(".png"):
+                    ruta = os.path.join(carpeta, nombre)
+                    try:
+                        st = os.stat(ruta)
+                    except OSError:
+                        continue
+                    archivos.append((st.st_mtime, ruta, st.st_size))
+
+        # Más viejo primero, como en el LRU
+        for _, ruta, size in sorted(archivos):
+            self._index[ruta] = size
+            self._bytes += size
+
+    def _leer(self, ruta: str) -> Optional[Tuple[bytes, dict]]:
+        try:
+            with open(ruta, "rb") as f:
+                contenido = f.read()
+        except OSError:
+            return None
+        try:
+            with open(f"{ruta}.json", "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        return contenido, meta
+
+    def _escribir_meta(self, ruta: str, meta: dict) -> None:
+        tmp = f"{ruta}.json.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, f"{ruta}.json")
+        except OSError as e:
+            print("TILE CACHE: no se pudo escribir en disco:", e)
+
+    def _escribir(self, ruta: str, contenido: bytes, meta: dict) -> bool:
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            tmp = f"{ruta}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(contenido)
+            os.replace(tmp, ruta)
+        except OSError as e:
+            print("TILE CACHE: no se pudo escribir en disco:", e)
+            return False
+        self._escribir_meta(ruta, meta)
+        return True
+
+    def _registrar(self, ruta: str, size: int) -> None:
+        self._bytes += size - self._index.pop(ruta, 0)
+        self._index[ruta] = size
+        self._expulsar()
+
+    def _tocar(self, ruta: str) -> None:
+        if ruta in self._index:
+            self._index.move_to_end(ruta)
+
+    def _expulsar(self) -> None:
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            ruta, size = self._index.popitem(last=False)
+            self._bytes -= size
+            for archivo in (ruta, f"{ruta}.json"):
+                try:
+                    os.remove(archivo)
+                except OSError:
+                    pass
+
+
+def get_tiles(request: Request) -> TileCache:
+    """Dependencia de FastAPI que entrega la caché creada en el lifespan."""
+    return request.app.state.tiles
+
+
+# =================== PRE-CARGA (CLI) ===================
+def _lonlat_a_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    n = 2 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_bbox(bbox, z: int):
+    lon_min, lat_min, lon_max, lat_max = bbox
+    x0, y0 = _lonlat_a_tile(lon_min, lat_max, z)
+    x1, y1 = _lonlat_a_tile(lon_max, lat_min, z)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield x, y
+
+
+async def seed(cities, zooms, provider: str, retina: bool, concurrency: int):
+    cache = TileCache(TILE_CACHE_DIR, TILE_CACHE_MAX_MB * 1024 * 1024, TILE_CACHE_MAX_AGE)
+    sufijo = "@2x" if retina and provider == "carto" else ""
+    tiles = [
+        (z, x, f"{y}{sufijo}")
+        for city in cities
+        for z in zooms
+        for x, y in tiles_bbox(CITY_BBOX[city], z)
+    ]
+    print(f"Pre-cargando {len(tiles)} tiles de {provider} para {', '.join(cities)}")
+
+    semaforo = asyncio.Semaphore(concurrency)
+    fallidos = 0
+
+    async def bajar(client, z, x, y):
+        nonlocal fallidos
+        async with semaforo:
+            try:
+                status, _ = await cache.get(provider, z, x, y, client)
+            except httpx.RequestError:
+                status = None
+            if status != 200:
+                fallidos += 1
+
+    async with httpx.AsyncClient(timeout=20) as client:
+        await asyncio.gather(*(bajar(client, z, x, y) for z, x, y in tiles))
+
+    print(f"Listo: {len(tiles) - fallidos} tiles en caché, {fallidos} fallidos")
+
+
+def _rango_zoom(texto: str):
+    if "-" in texto:
+        ini, fin = texto.split("-", 1)
+        return list(range(int(ini), int(fin) + 1))
+    return [int(texto)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-carga tiles en la caché local del proxy")
+    parser.add_argument("--city", choices=sorted(CITY_BBOX), action="append",
+                        help="Ciudad a pre-cargar (repetible). Por defecto todas.")
+    parser.add_argument("--zoom", default="11-15", help="Zoom o rango de zooms, ej. 12-16")
+    parser.add_argument("--provider", choices=["carto", "osm"], default="carto")
+    parser.add_argument("--retina", action="store_true", help="Tiles @2x (solo Carto)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    asyncio.run(seed(
+        cities=args.city or sorted(CITY_BBOX),
+        zooms=_rango_zoom(args.zoom),
+        provider=args.provider,
+        retina=args.retina,
+        concurrency=args.concurrency,
+    ))
@@ -1,7 +1,8 @@
 import numpy as np
 import math
 from openrouteservice import convert
-from geopy.distance import geodesic
+from geo import vincenty_m
+from route_segment import RouteSegment
 import matplotlib.pyplot as plt 
 import json
 # import io
@@ -9,29 +10,6 @@ import json
 # import selenium
 # import folium
 
-def preprocesar_vectores(velocidades, pendientes, tiempos, coordenadas, puntos_intermedios=10):
-    n_original = len(velocidades)
-    if(n_original < 2):
-        return velocidades, pendientes, tiempos, coordenadas
-    n_nuevo = n_original + (n_original - 1) * puntos_intermedios
-    
-    x_original = np.arange(n_original)
-    x_nuevo = np.linspace(0, n_original - 1, n_nuevo)
-    
-    velocidades_interp = np.interp(x_nuevo, x_original, velocidades).tolist()
-    pendientes_interp = np.interp(x_nuevo, x_original, pendientes).tolist()
-    tiempos_interp = np.interp(x_nuevo, x_original, tiempos).tolist()
-    
-    coords_interp = []
-    for i in range(3):
-        valores = [coord[i] for coord in coordenadas]
-        valores_interp = np.interp(x_nuevo, x_original, valores)
-        coords_interp.append(valores_interp.tolist())
-    
-    coordenadas_interp = [[coords_interp[0][i], coords_interp[1][i], coords_interp[2][i]] for i in range(n_nuevo)]
-    
-    return velocidades_interp, pendientes_interp, tiempos_interp, coordenadas_interp
-
 def manage_segments(rutas, traffic, elevation=None):
     rutas_moto = []
 
@@ -39,31 +17,17 @@ def manage_segments(rutas, traffic, elevation=None):
         rutas = rutas["features"]
 
         data = get_vel_azure(rutas, elevation)
-        data["distance"] = rutas[-1]["properties"]["distanceInMeters"]
-        data["duration"] = rutas[-1]["properties"]["durationInSeconds"]
-
-        vel_interp, pend_interp, time_interp, coords_interp = preprocesar_vectores(
-                data["speeds"], data["slopes"], data["times"], data["coords"], puntos_intermedios=2)
-        data["speeds"] = vel_interp
-        data["slopes"] = pend_interp
-        data["times"] = time_interp
-        data["coords"] = coords_interp
+        data.distance = rutas[-1]["properties"]["distanceInMeters"]
+        data.duration = rutas[-1]["properties"]["durationInSeconds"]
 
-        rutas_moto = data
+        rutas_moto = data.interpolar(puntos_intermedios=2)
     else:
         for segment in rutas["properties"]["segments"]:
             data = get_vel(segment["steps"], rutas["geometry"]["coordinates"])
 
-            data["duration"] = segment["duration"]
-            data["distance"] = segment["distance"]
-            vel_interp, pend_interp, time_interp, coords_interp = preprocesar_vectores(
-                data["speeds"], data["slopes"], data["times"], data["coords"], puntos_intermedios=2)
-
-            data["speeds"] = vel_interp
-            data["slopes"] = pend_interp
-            data["times"] = time_interp
-            data["coords"] = coords_interp
-            rutas_moto.append(data)
+            data.duration = segment["duration"]
+            data.distance = segment["distance"]
+            rutas_moto.append(data.interpolar(puntos_intermedios=2))
     return rutas_moto
 
 def calcular_consumo_y_emisiones(potencia_electrica_w, potencia_combustion_kw, tiempos, speeds):
@@ -118,17 +82,54 @@ def calcular_consumo_y_emisiones(potencia_electrica_w, potencia_combustion_kw, t
         'factor_emision_combustion': factor_emision_combustion_gco2_km
     }
 
+def _pendientes(prev, coords):
+    """
+    Pendiente (grados) entre cada punto y su anterior, con la distancia
+    horizontal geodésica calculada de forma vectorizada.
+    """
+    horiz_dist = vincenty_m(prev[:, 0], prev[:, 1], coords[:, 0], coords[:, 1])
+    delta_alt = coords[:, 2] - prev[:, 2]
+    slope_deg = np.degrees(np.arctan2(delta_alt, horiz_dist))
+    return np.where(horiz_dist != 0, slope_deg, 0.0)
+
+def _perfil_ruta(idx, duracion, distancia, elevation_data):
+    """
+    Construye el RouteSegment (coords/speeds/slopes/times) a partir de los
+    índices de los puntos recorridos y la duración/distancia de cada uno.
+    """
+    if len(idx) == 0:
+        return RouteSegment(np.empty((0, 3)), [], [], [])
+
+    puntos = np.asarray(elevation_data, dtype=float).reshape(-1, 3)
+    coords = puntos[idx]
+
+    speeds = np.divide(distancia, duracion, out=np.zeros_like(distancia), where=duracion != 0)
+    tiempo_fin = np.cumsum(duracion)
+    times = np.concatenate(([0.0], tiempo_fin[:-1]))
+
+    prev = np.concatenate((coords[:1], coords[:-1]))
+    slopes = _pendientes(prev, coords)
+
+    # Al pasar por el penúltimo punto se agrega también el último de la geometría
+    penultimos = np.flatnonzero(idx == len(puntos) - 2)
+    if len(penultimos):
+        ultimo = np.broadcast_to(puntos[-1], (len(penultimos), 3))
+        pos = penultimos + 1
+        slopes = np.insert(slopes, pos, _pendientes(prev[penultimos], ultimo))
+        coords = np.insert(coords, pos, puntos[-1], axis=0)
+        speeds = np.insert(speeds, pos, speeds[penultimos])
+        times = np.insert(times, pos, tiempo_fin[penultimos])
+
+    return RouteSegment(
+        coords,
+        np.round(speeds, 2),     # m/s
+        np.round(slopes, 2),     # grados
+        np.round(times, 2),
+    )
+
 # Unidades de metros y segundos 
 def get_vel_azure(features,elevation_data):
-    route = {
-        "coords":[],
-        "speeds":[],
-        "slopes":[],
-        "times":[]
-        }
-    
-    total_time = 0
-    total_distance = 0
+    idx, duracion, distancia = [], [], []
 
     for feature in features:
         props = feature["properties"]
@@ -144,60 +145,20 @@ def get_vel_azure(features,elevation_data):
             if num_points <= 0:
                 continue
 
-            duration_per_point = step_duration / num_points
-            distance_per_point = step_distance / num_points
-            
-            for i in range(num_points):
-                idx = start_idx + i
-                
-                lng, lat, alt = elevation_data[idx]
-
-                if len(route["coords"]) > 0:
-                    prev_lng, prev_lat, prev_alt = route["coords"][-1]
-                else:
-                    prev_lng, prev_lat, prev_alt = lng, lat, alt
-
-                horiz_dist = geodesic((prev_lat, prev_lng), (lat, lng)).meters
+            idx.append(np.arange(start_idx, end_idx))
+            duracion.append(np.full(num_points, step_duration / num_points))
+            distancia.append(np.full(num_points, step_distance / num_points))
 
-                delta_alt = alt - prev_alt
+    if not idx:
+        return _perfil_ruta([], None, None, elevation_data)
 
-                slope_deg = math.degrees(math.atan2(delta_alt, horiz_dist)) if horiz_dist != 0 else 0
-
-                speed_ms = (distance_per_point / duration_per_point) if duration_per_point != 0 else 0
-
-                prev_alt = route["coords"][-1][2] if len(route["coords"]) > 0 else alt
-
-                route["coords"].append([lng, lat, alt])
-                route["speeds"].append(round(speed_ms, 2))
-                route["slopes"].append(round(slope_deg, 2))
-                route["times"].append(round(total_time, 2))
-
-                total_time += duration_per_point
-                total_distance += distance_per_point
-
-                if idx == len(elevation_data)-2:
-                    lng, lat, alt = elevation_data[-1]
-                    delta_alt = alt - prev_alt
-                    horiz_dist = geodesic((prev_lat, prev_lng), (lat, lng)).meters
-                    slope_deg = math.degrees(math.atan2(delta_alt, horiz_dist)) if horiz_dist != 0 else 0
-
-                    lng, lat, alt = elevation_data[-1]
-                    route["coords"].append([lng, lat, alt])
-                    route["speeds"].append(round((distance_per_point / duration_per_point), 2))
-                    route["slopes"].append(round(slope_deg, 2))
-                    route["times"].append(round(total_time, 2))
-    return route
+    return _perfil_ruta(
+        np.concatenate(idx), np.concatenate(duracion), np.concatenate(distancia), elevation_data
+    )
 
 def get_vel(steps, elevation_data):
-    route = {
-        "coords": [],      # [lng, lat, alt] format
-        "speeds": [],      # m/s
-        "slopes": [],      # grados  
-        "times": []    
-    }
-
-    total_time = 0
-    total_distance = 0
+    idx, duracion, distancia = [], [], []
+    n_puntos = len(elevation_data)
 
     for step in steps:
         start_idx, end_idx = step["way_points"]
@@ -208,50 +169,19 @@ def get_vel(steps, elevation_data):
         if num_points <= 0:
             continue
 
-        duration_per_point = step_duration / num_points
-        distance_per_point = step_distance / num_points
-
-        for i in range(num_points):
-            idx = start_idx + i
-            
-            if idx >= len(elevation_data):
-                break
-                
-            lng, lat, alt = elevation_data[idx]
-
-            if len(route["coords"]) > 0:
-                prev_lng, prev_lat, prev_alt = route["coords"][-1]
-            else:
-                prev_lng, prev_lat, prev_alt = lng, lat, alt
-
-            horiz_dist = geodesic((prev_lat, prev_lng), (lat, lng)).meters
-
-            delta_alt = alt - prev_alt
-
-            slope_deg = math.degrees(math.atan2(delta_alt, horiz_dist)) if horiz_dist != 0 else 0
-
-            speed_ms = (distance_per_point / duration_per_point) if duration_per_point != 0 else 0
-
-            route["coords"].append([lng, lat, alt])
-            route["speeds"].append(round(speed_ms, 2))
-            route["slopes"].append(round(slope_deg, 2))
-            route["times"].append(round(total_time, 2))
-
-            total_time += duration_per_point
-            total_distance += distance_per_point
+        # Los puntos fuera de la geometría se descartan
+        rango = np.arange(start_idx, min(end_idx, n_puntos))
 
-            if idx == len(elevation_data)-2:
-                lng, lat, alt = elevation_data[-1]
-                delta_alt = alt - prev_alt
-                horiz_dist = geodesic((prev_lat, prev_lng), (lat, lng)).meters
-                slope_deg = math.degrees(math.atan2(delta_alt, horiz_dist)) if horiz_dist != 0 else 0
+        idx.append(rango)
+        duracion.append(np.full(len(rango), step_duration / num_points))
+        distancia.append(np.full(len(rango), step_distance / num_points))
 
-                route["coords"].append([lng, lat, alt])
-                route["speeds"].append(round(speed_ms, 2))
-                route["slopes"].append(round(slope_deg, 2))
-                route["times"].append(round(total_time, 2))
+    if not idx:
+        return _perfil_ruta([], None, None, elevation_data)
 
-    return route
+    return _perfil_ruta(
+        np.concatenate(idx), np.concatenate(duracion), np.concatenate(distancia), elevation_data
+    )
 
 '''
 def mapa(coords, estaciones=[], points=[]):